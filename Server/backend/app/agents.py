@@ -1,60 +1,144 @@
-import random
 import numpy as np
-from collections import defaultdict
 
-ACTIONS = [(0,0), (1,0), (-1,0), (0,1), (0,-1)]
+from .pool import AgentPool, ROLE_CODES
+from .fleet import ROLE_ORDER
+from .learning import ACTIONS, QStore, QTable, N_STATES, encode_state
 
-def zero_q():
-    return np.zeros(len(ACTIONS))
+def _column(name, cast):
+    """Propiedad que lee/escribe la fila del agente en una columna del pool"""
+    def fget(self):
+        return cast(getattr(self._pool, name)[self._row])
+    
+    def fset(self, value):
+        getattr(self._pool, name)[self._row] = value
+    
+    return property(fget, fset)
 
 class FarmAgent:
+    """
+    Vista de un agente sobre una fila de AgentPool. El estado numérico (posición,
+    combustible, carga, contadores, eps, banderas) vive en columnas del pool;
+    aquí quedan la ruta y los hiperparámetros. La Q-table es una vista sobre
+    un QStore (compartido por la flota para actualizar por lotes).
+    """
+    __slots__ = ('_pool', '_row', '_qstore', '_owner', 'id', 'path',
+                 'last_goal_distance', 'alpha', 'gamma', 'eps_min', 'rng')
+    
     def __init__(self, aid, start_pos, role='harvester', barn_pos=(0,0),
-                 alpha=0.5, gamma=0.95, eps=0.4, capacity=10, fuel=100):
+                 alpha=0.5, gamma=0.95, eps=0.4, capacity=10, fuel=100, pool=None, qstore=None,
+                 shared_q=False, rng=None):
+        # Sin pool compartido el agente tiene el suyo propio (una fila)
+        self._pool = pool if pool is not None else AgentPool(1)
+        self._row = self._pool.add(tuple(start_pos), role, tuple(barn_pos), capacity, fuel, eps)
         self.id = aid
-        self.pos = tuple(start_pos)
-        self.role = role
-        self.barn_pos = tuple(barn_pos)
         self.path = []
         
-        # Contadores
-        self.harvested = 0
-        self.planted = 0
-        self.irrigated = 0
-        self.delivered = 0
-        
-        # Capacidad
-        self.max_capacity = capacity
-        self.current_capacity = capacity if role != 'harvester' else 0 # Cosechadores empiezan vacíos
-        
-        # Estado
-        self.is_returning_to_barn = False
-        self.recharge_counter = 0
-        
-        # Combustible
-        self.max_fuel = fuel
-        self.current_fuel = fuel
-        self.fuel_consumed = 0
-        self.fuel_efficiency_score = 0
-        self.low_fuel_warnings = 0
-        self.out_of_fuel_count = 0
-        
-        # Navegación
-        self.current_goal = barn_pos
+        # Navegación (la meta arranca en el granero, ver AgentPool.add)
         self.last_goal_distance = float('inf')
         
         # Q-Learning
-        self.Q = defaultdict(zero_q)
+        self._qstore = qstore if qstore is not None else QStore()
+        # shared_q: una sola tabla por rol dentro del QStore
+        self._owner = self._qstore.role_owner(role) if shared_q else self._qstore.new_owner()
         self.alpha = alpha
         self.gamma = gamma
-        self.eps = eps
         self.eps_min = 0.01
-        
-        # Estadísticas
-        self.steps_taken = 0
-        self.successful_actions = 0
-        self.barn_visits = 0
-        self.total_distance_traveled = 0
-        self.fuel_refills = 0
+        # Generador propio (inyectado desde la semilla de la ejecución)
+        self.rng = rng if rng is not None else np.random.default_rng()
+    
+    @property
+    def pool(self):
+        return self._pool
+    
+    @property
+    def row(self):
+        return self._row
+    
+    @property
+    def Q(self):
+        return QTable(self._qstore, self._owner)
+    
+    @Q.setter
+    def Q(self, mapping):
+        """Sustituye la tabla por el contenido de un dict estado -> valores"""
+        self._qstore.clear_owner(self._owner)
+        self.Q.update(mapping)
+    
+    @property
+    def qstore(self):
+        return self._qstore
+    
+    @property
+    def owner(self):
+        return self._owner
+    
+    @property
+    def pos(self):
+        return (int(self._pool.x[self._row]), int(self._pool.y[self._row]))
+    
+    @pos.setter
+    def pos(self, value):
+        self._pool.x[self._row], self._pool.y[self._row] = value
+    
+    @property
+    def barn_pos(self):
+        return (int(self._pool.barn_x[self._row]), int(self._pool.barn_y[self._row]))
+    
+    @barn_pos.setter
+    def barn_pos(self, value):
+        self._pool.barn_x[self._row], self._pool.barn_y[self._row] = value
+    
+    @property
+    def current_goal(self):
+        return (int(self._pool.goal_x[self._row]), int(self._pool.goal_y[self._row]))
+    
+    @current_goal.setter
+    def current_goal(self, value):
+        self._pool.goal_x[self._row], self._pool.goal_y[self._row] = value
+    
+    @property
+    def role(self):
+        return ROLE_ORDER[self._pool.role_code[self._row]]
+    
+    @role.setter
+    def role(self, value):
+        self._pool.role_code[self._row] = ROLE_CODES[value]
+    
+    # Contadores
+    harvested = _column('harvested', int)
+    planted = _column('planted', int)
+    irrigated = _column('irrigated', int)
+    delivered = _column('delivered', int)
+    
+    # Capacidad
+    max_capacity = _column('max_capacity', int)
+    current_capacity = _column('current_capacity', int)
+    
+    # Estado
+    is_returning_to_barn = _column('is_returning_to_barn', bool)
+    recharge_counter = _column('recharge_counter', int)
+    
+    # Combustible
+    max_fuel = _column('max_fuel', int)
+    current_fuel = _column('current_fuel', float)
+    fuel_consumed = _column('fuel_consumed', float)
+    fuel_efficiency_score = _column('fuel_efficiency_score', float)
+    low_fuel_warnings = _column('low_fuel_warnings', int)
+    out_of_fuel_count = _column('out_of_fuel_count', int)
+    
+    # Exploración
+    eps = _column('eps', float)
+    
+    # Estadísticas
+    steps_taken = _column('steps_taken', int)
+    successful_actions = _column('successful_actions', int)
+    barn_visits = _column('barn_visits', int)
+    total_distance_traveled = _column('total_distance_traveled', int)
+    fuel_refills = _column('fuel_refills', int)
+    
+    # Aprendizaje (con tablas por rol, lo que aporta cada agente)
+    q_updates = _column('q_updates', int)
+    states_discovered = _column('states_discovered', int)
 
     def obs_to_state(self, obs):
         pos = obs['pos']
@@ -166,6 +250,9 @@ class FarmAgent:
             return True # Seguimos en proceso de recarga
         return False
     
+    def refuel(self):
+        self.current_fuel = self.max_fuel
+    
     def use_capacity(self, amount=1):
         # Harvester suma, los demás restan
         if self.role == 'harvester':
@@ -180,39 +267,53 @@ class FarmAgent:
                 return True
         return False
     
+    def path_action(self):
+        """Acción hacia el siguiente paso de la ruta A*, o None sin ruta"""
+        if not self.path:
+            return None
+        next_pos = self.path[0]
+        dx = next_pos[0] - self.pos[0]
+        dy = next_pos[1] - self.pos[1]
+        
+        if dx == 1: return 1
+        if dx == -1: return 2
+        if dy == 1: return 3
+        if dy == -1: return 4
+        return 0
+    
     def choose_action(self, state, training=True):
         self.steps_taken += 1
         
         # 1. Si hay un plan A* activo, seguirlo
-        if hasattr(self, 'path') and self.path:
-            next_pos = self.path[0]
-            dx = next_pos[0] - self.pos[0]
-            dy = next_pos[1] - self.pos[1]
-            
-            if dx == 1: return 1
-            if dx == -1: return 2
-            if dy == 1: return 3
-            if dy == -1: return 4
-            return 0
+        planned = self.path_action()
+        if planned is not None:
+            return planned
 
         # 2. Exploración vs Explotación (Q-Learning)
-        if training and random.random() < self.eps:
-            return random.randrange(len(ACTIONS))
+        if training and self.rng.random() < self.eps:
+            return int(self.rng.integers(len(ACTIONS)))
         
-        if state not in self.Q:
-            return random.randrange(len(ACTIONS))
+        row = self._qstore.row(self._owner * N_STATES + encode_state(state))
+        if row < 0:
+            return int(self.rng.integers(len(ACTIONS)))
             
-        return int(np.argmax(self.Q[state]))
+        return int(np.argmax(self._qstore.q[row]))
     
     def update_q(self, state, action, reward, next_state, done=False):
-        if state not in self.Q: self.Q[state] = np.zeros(len(ACTIONS))
-        if next_state not in self.Q: self.Q[next_state] = np.zeros(len(ACTIONS))
+        store = self._qstore
+        base = self._owner * N_STATES
+        known = len(store)
+        row = store.row(base + encode_state(state), create=True)
+        next_row = store.row(base + encode_state(next_state), create=True)
+        q = store.q
+        self.q_updates += 1
+        self.states_discovered += len(store) - known
         
-        current_q = self.Q[state][action]
-        max_next_q = np.max(self.Q[next_state]) if not done else 0
+        current_q = q[row, action]
+        max_next_q = np.max(q[next_row]) if not done else 0
         target = reward + self.gamma * max_next_q
         
-        self.Q[state][action] = current_q + self.alpha * (target - current_q)
+        q[row, action] = current_q + self.alpha * (target - current_q)
     
     def decay_epsilon(self, decay_rate=0.995):
         self.eps = max(self.eps_min, self.eps * decay_rate)
@@ -233,6 +334,8 @@ class FarmAgent:
             'id': int(self.id),
             'role': str(self.role),
             'states_learned': int(len(self.Q)),
+            'q_updates': int(self.q_updates),
+            'states_discovered': int(self.states_discovered),
             'steps_taken': int(self.steps_taken),
             'harvested': int(self.harvested),
             'planted': int(self.planted),
@@ -1,10 +1,19 @@
 # backend/app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, FileResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional
-from .sim_manager import SimManager
+from typing import Optional, Literal, Any, Dict
+from .engine import create_sim, EngineUnavailable
+from .config import ENGINE_PROCESS, SESSION_MAX_STEPS, SWEEP_KEEP
+from .sweeps import Sweep
+from .jobs import JobQueue
+from .sessions import SessionScheduler, SessionLimitError
+from .instrumentation import PROBE
+from .tracing import TRACER
+from .profiler import profile_thread, DEFAULT_INTERVAL
 import os
+import time
 import numpy as np
 
 # Función helper para convertir tipos numpy a Python nativos
@@ -38,17 +47,48 @@ app.add_middleware(
     allow_headers=['*']
 )
 
-sim = SimManager()
+@app.exception_handler(EngineUnavailable)
+async def engine_unavailable(request: Request, exc: EngineUnavailable):
+    """El motor (ENGINE_PROCESS=1) no contestó: 503 con la orden que expiró"""
+    return JSONResponse(status_code=503, content={'status': 'engine_unavailable', 'detail': str(exc)})
+
+@app.middleware('http')
+async def request_latency(request: Request, call_next):
+    """Latencia por endpoint (sólo si la instrumentación está activa)"""
+    if not PROBE.enabled:
+        return await call_next(request)
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    path = getattr(route, 'path', None) or request.url.path
+    PROBE.observe_request(request.method, path, response.status_code, time.perf_counter() - t0)
+    return response
+
+# Con ENGINE_PROCESS=1 el simulador corre en su propio proceso y `sim` es su fachada
+sim = create_sim(__name__)
+# Las trazas de pasos se graban donde corre el bucle (en modo motor, en su proceso)
+tracer = sim.tracer if ENGINE_PROCESS and sim is not None else TRACER
+# Barridos de hiperparámetros lanzados desde la API (id -> Sweep)
+sweeps = {}
+# Granjas por sesión (POST /sessions), avanzadas por turnos en un pool común
+sessions = SessionScheduler()
+# Trabajos de entrenamiento (POST /train), cada uno en un proceso del pool; el
+# último completado pasa a ser el modelo actual y se carga en la simulación
+jobs = JobQueue(on_promote=lambda job: sim.reload_qs())
 
 # ========== MODELOS PYDANTIC ==========
 
 class TrainRequest(BaseModel):
     episodes: int = 50
     steps_per_episode: int = 500
-    alpha: float = 0.5
-    gamma: float = 0.95
-    eps: float = 0.8
-    eps_decay: float = 0.995
+    alpha: Optional[float] = None
+    gamma: Optional[float] = None
+    eps: Optional[float] = None
+    eps_decay: Optional[float] = None
+    learner: Optional[Literal['q', 'q_lambda']] = None
+    trace_lambda: Optional[float] = None
+    early_stopping: Optional[bool] = None
+    seed: Optional[int] = None
 
 class ParamsUpdate(BaseModel):
     alpha: Optional[float] = None
@@ -60,6 +100,29 @@ class ControlResponse(BaseModel):
     status: str
     detail: Optional[str] = None
 
+class SessionRequest(BaseModel):
+    width: int = 60
+    height: int = 40
+    crop_count: int = 200
+    fleet: Optional[Dict[str, int]] = None
+    seed: Optional[int] = None
+    step_budget: Optional[int] = None
+    steps_per_tick: Optional[int] = None
+    load_q: bool = True
+    run: bool = False
+
+class SweepRequest(BaseModel):
+    space: Dict[str, Any]
+    search: Literal['grid', 'random'] = 'grid'
+    n_trials: Optional[int] = None
+    episodes: int = 20
+    steps_per_episode: int = 400
+    workers: Optional[int] = None
+    seed: int = 0
+    metric: str = 'policy_agreement'
+    early_stopping: bool = True
+    grace_episodes: int = 3
+
 # ========== ENDPOINTS ==========
 
 @app.get('/health')
@@ -73,59 +136,103 @@ def health():
     }
 
 @app.get('/state')
-def state():
+def state(since: Optional[int] = None, encoding: str = 'list'):
     """
     Obtener estado actual de la simulación
     Incluye: grid, agentes, combustible, fase, estadísticas
+    En mapas por bloques, `since` limita el grid a los bloques cambiados desde esa versión
+    encoding=b64 envía el grid como bytes uint8 en base64
     """
-    state_data = sim.get_state()
+    state_data = sim.get_state(since=since, encoding=encoding)
+    # El entrenamiento corre en los trabajos de /train, no en esta simulación
+    state_data['meta']['is_training'] = bool(state_data['meta'].get('is_training')) or jobs.active()
     return convert_numpy_types(state_data)
 
 @app.post('/train')
 def train(req: TrainRequest):
     """
-    Iniciar entrenamiento
+    Encolar un trabajo de entrenamiento
     - episodes: número de episodios
     - steps_per_episode: pasos máximo por episodio
-    - Parámetros de Q-Learning: alpha, gamma, eps
+    - Parámetros de Q-Learning: alpha, gamma, eps, eps_decay
+    - learner: 'q' (un paso) o 'q_lambda' (Q(lambda) de Watkins con trazas)
+    - early_stopping: parar al converger (criterios CONVERGENCE_* de config)
+    Lo que no se indique sale de los parámetros actuales (config y POST /params);
+    sin early_stopping manda CONVERGENCE_WINDOW (0 = no parar nunca)
+    Cada trabajo corre en su proceso con su propia granja y guarda en saved/jobs/<job_id>/;
+    con JOB_PROMOTE al completarse pasa a ser el modelo actual (promote en la respuesta)
     """
-    sim.params['alpha'] = req.alpha
-    sim.params['gamma'] = req.gamma
-    sim.params['eps'] = req.eps
-    sim.params['eps_decay'] = req.eps_decay
-
-    started = sim.start_training(
-        episodes=req.episodes,
-        steps_per_episode=req.steps_per_episode
-    )
+    params = dict(sim.params)
+    for name in ('alpha', 'gamma', 'eps', 'eps_decay', 'learner', 'trace_lambda', 'early_stopping'):
+        if getattr(req, name) is not None:
+            params[name] = getattr(req, name)
+    job = jobs.submit(params, req.episodes, req.steps_per_episode, seed=req.seed)
 
     return {
-        'status': 'started' if started else 'already_running',
+        'status': job.status,
+        'job_id': job.id,
+        'promote': jobs.promote,
+        'qtable_path': job.qtable_path,
         'episodes': req.episodes,
         'steps_per_episode': req.steps_per_episode,
+        'learner': params['learner'],
+        'params': params,
         'fuel_system': 'enabled',
-        'parcels': len(sim.env.parcels)
+        'parcels': sim.parcel_count
     }
 
 @app.post('/stop')
 def stop():
-    """Detener entrenamiento actual"""
-    sim.stop_training()
-    return {'status': 'stopped'}
+    """Detener entrenamiento actual: cancela los trabajos en cola y en marcha"""
+    cancelled = [job.id for job in jobs.cancel_all()]
+    # La simulación de la API no entrena (lo hacen los trabajos): nunca guarda aquí
+    if sim.train_thread is not None and sim.train_thread.is_alive():
+        sim.stop_training(persist=False)
+    return {'status': 'stopped', 'cancelled_jobs': cancelled}
+
+@app.get('/jobs')
+def list_jobs():
+    """Trabajos de entrenamiento con su estado, progreso y throughput"""
+    return {
+        'jobs': [convert_numpy_types(job.summary()) for job in jobs.list()],
+        'stats': jobs.stats()
+    }
+
+@app.get('/jobs/{job_id}')
+def get_job(job_id: str):
+    """Progreso de un trabajo y su último episodio"""
+    job = jobs.get(job_id)
+    if job is None:
+        return {'status': 'not_found', 'job_id': job_id}
+    return convert_numpy_types({**job.summary(), 'last_episode': job.last_episode})
+
+@app.post('/jobs/{job_id}/cancel')
+def cancel_job(job_id: str):
+    """Cancelar un trabajo: en cola no llega a empezar; en marcha para al cerrar el episodio"""
+    job = jobs.cancel(job_id)
+    if job is None:
+        return {'status': 'not_found', 'job_id': job_id}
+    return {'status': job.status, 'job_id': job_id}
+
+@app.post('/jobs/{job_id}/load')
+def load_job(job_id: str):
+    """Hacer de las Q-tables de un trabajo el modelo actual y cargarlas en la simulación"""
+    job = jobs.get(job_id)
+    if job is None:
+        return {'status': 'not_found', 'job_id': job_id}
+    ok = jobs.promote_job(job_id)
+    return {
+        'status': 'loaded' if ok else 'no_file',
+        'job_id': job_id,
+        'path': job.qtable_path
+    }
 
 @app.post('/params')
 def update_params(p: ParamsUpdate):
-    """Actualizar parámetros de Q-Learning"""
-    if p.alpha is not None:
-        sim.params['alpha'] = p.alpha
-    if p.gamma is not None:
-        sim.params['gamma'] = p.gamma
-    if p.eps is not None:
-        sim.params['eps'] = p.eps
-    if p.eps_decay is not None:
-        sim.params['eps_decay'] = p.eps_decay
-
-    return {'status': 'ok', 'params': sim.params}
+    """Actualizar parámetros de Q-Learning (los usan los próximos trabajos de /train)"""
+    values = {name: getattr(p, name) for name in ('alpha', 'gamma', 'eps', 'eps_decay')
+              if getattr(p, name) is not None}
+    return {'status': 'ok', 'params': sim.update_params(values)}
 
 @app.post('/save')
 def save():
@@ -141,7 +248,7 @@ def save():
 @app.post('/load')
 def load():
     """Cargar Q-tables desde disco"""
-    ok = sim.load_qs()
+    ok = sim.reload_qs()
     return {
         'status': 'loaded' if ok else 'no_file',
         'message': 'Modelo cargado exitosamente' if ok else 'Archivo no encontrado'
@@ -153,7 +260,7 @@ def stats():
     Obtener estadísticas de entrenamiento
     Retorna todos los episodios y métricas
     """
-    stats_data = sim.train_stats.copy()
+    stats_data = _train_stats()
     
     # Convertir -inf a un valor JSON válido
     if 'best_reward' in stats_data:
@@ -177,7 +284,7 @@ def run_trained():
     Ejecutar modelo entrenado en tiempo real
     Carga Q-tables y ejecuta agentes en loop infinito
     """
-    if not os.path.exists(sim.QTABLE_PATH):
+    if os.path.exists(sim.QTABLE_PATH):
         sim.load_qs()
 
     started = sim.start_run_trained()
@@ -195,85 +302,157 @@ def stop_trained():
 @app.get('/metrics')
 def metrics():
     """Obtener métricas del entorno actual"""
-    env_metrics = sim.env.get_metrics()
-    
-    # Agregar métricas de combustible
-    agent_fuel_stats = {
-        'avg_fuel_pct': float(sum(a.get_fuel_percentage() for a in sim.agents) / len(sim.agents)),
-        'low_fuel_count': int(sum(1 for a in sim.agents if a.is_fuel_low())),
-        'critical_fuel_count': int(sum(1 for a in sim.agents if a.is_fuel_critical())),
-        'total_fuel_consumed': float(sum(a.fuel_consumed for a in sim.agents)),
-        'avg_fuel_efficiency': float(sum(a.calculate_efficiency_score() for a in sim.agents) / len(sim.agents))
-    }
-    
-    return convert_numpy_types({
-        **env_metrics,
-        'fuel_stats': agent_fuel_stats
-    })
+    return convert_numpy_types(sim.get_fleet_metrics())
+
+@app.get('/metrics/prometheus', response_class=PlainTextResponse)
+def metrics_prometheus():
+    """Histogramas de secciones del bucle y latencias HTTP (formato Prometheus)"""
+    return PlainTextResponse(
+        PROBE.render_prometheus(extra=_probe_snapshots()),
+        media_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+@app.post('/metrics/instrumentation')
+def set_instrumentation(enabled: bool, reset: bool = False):
+    """Activar/desactivar la instrumentación en caliente"""
+    PROBE.set_enabled(enabled)
+    if reset:
+        PROBE.reset()
+    if ENGINE_PROCESS:
+        sim.probe_configure(enabled, reset)
+    jobs.configure_probe(enabled, reset)
+    return {'status': 'ok', 'enabled': PROBE.enabled}
+
+def _probe_snapshots():
+    """Histogramas de los otros procesos que ejecutan pasos (motor y trabajos de /train)"""
+    return ([sim.probe_snapshot()] if ENGINE_PROCESS else []) + jobs.probe_snapshots()
+
+@app.post('/debug/trace')
+def start_trace(steps: int = 500):
+    """
+    Grabar spans de los próximos `steps` pasos (formato Chrome Trace / Perfetto)
+    en la simulación y en cada trabajo de entrenamiento en cola o en marcha
+    """
+    traced_jobs = jobs.start_trace(steps)
+    return {'status': 'tracing', **tracer.start(steps), 'traced_jobs': traced_jobs}
+
+@app.delete('/debug/trace')
+def stop_trace():
+    """Detener la traza en curso y escribir el fichero"""
+    path = tracer.stop()
+    jobs.stop_trace()
+    return {'status': 'stopped', 'path': path, **tracer.status(), 'jobs': jobs.trace_status()}
+
+@app.get('/debug/trace')
+def trace_status():
+    """Estado de la traza (activa, pasos grabados, último fichero), también por trabajo"""
+    return {**tracer.status(), 'jobs': jobs.trace_status()}
+
+@app.get('/debug/trace/file')
+def trace_file(job_id: Optional[str] = None):
+    """Descargar el último fichero de traza (de la simulación o del trabajo `job_id`)"""
+    if job_id is not None:
+        last_path = (jobs.trace_status().get(job_id) or {}).get('last_trace')
+    else:
+        paths = [tracer.last_path] + [t.get('last_trace') for t in jobs.trace_status().values()]
+        paths = [p for p in paths if p and os.path.exists(p)]
+        last_path = max(paths, key=os.path.getmtime, default=None)
+    if not last_path or not os.path.exists(last_path):
+        return {'status': 'no_trace'}
+    return FileResponse(last_path, media_type='application/json',
+                        filename=os.path.basename(last_path))
+
+@app.get('/debug/profile')
+def debug_profile(seconds: float = 5.0, top: int = 20, target: Optional[str] = None,
+                  interval: float = DEFAULT_INTERVAL, format: str = 'json'):
+    """
+    Perfilado por muestreo del hilo de entrenamiento o del modelo entrenado
+    sin interrumpirlo. format=collapsed devuelve texto listo para flamegraph.
+    target: 'train' (un trabajo de /train en marcha), 'trained' o el id de un trabajo.
+    """
+    threads = {'train': sim.train_thread, 'trained': sim.trained_thread}
+    alive = [name for name, t in threads.items() if t is not None and t.is_alive()]
+    running = jobs.running()
+    if target is None:
+        target = alive[0] if alive else ('train' if running else 'trained')
+    if target == 'train' and 'train' not in alive and running:
+        target = running[-1].id
+
+    job = jobs.get(target)
+    if job is not None:
+        # El hilo que entrena vive en el proceso del trabajo: se muestrea allí
+        result = jobs.profile(job.id, seconds, max(0.001, interval), top)
+        if result is None:
+            return {'status': 'no_target', 'detail': f'El trabajo {job.id} no está en marcha'}
+        if format == 'collapsed':
+            return PlainTextResponse(result['collapsed'])
+        return {'status': 'ok', 'target': 'train', 'job_id': job.id, **result}
+
+    if ENGINE_PROCESS and target == 'trained':
+        # El muestreo lee las pilas del propio proceso; el bucle en vivo corre en el motor
+        return {'status': 'unavailable', 'target': 'trained',
+                'detail': 'El modelo entrenado corre en el proceso del motor (ENGINE_PROCESS=1)'}
+    thread = threads.get(target)
+    if thread is None or not thread.is_alive():
+        return {'status': 'no_target', 'detail': 'No hay entrenamiento ni modelo en ejecución'}
+
+    result = profile_thread(thread, seconds, interval=max(0.001, interval), top=top)
+    if format == 'collapsed':
+        return PlainTextResponse(result['collapsed'])
+    return {'status': 'ok', 'target': target, **result}
 
 @app.get('/agents')
 def agents_info():
     """Obtener información detallada de agentes"""
-    agents_data = {
-        'agents': [convert_numpy_types(a.get_stats()) for a in sim.agents],
-        'total_agents': int(len(sim.agents)),
-        'roles': {
-            'planter': int(sum(1 for a in sim.agents if a.role == 'planter')),
-            'harvester': int(sum(1 for a in sim.agents if a.role == 'harvester')),
-            'irrigator': int(sum(1 for a in sim.agents if a.role == 'irrigator'))
-        },
-        'fuel_system': {
-            'enabled': True,
-            'avg_fuel_pct': float(sum(a.get_fuel_percentage() for a in sim.agents) / len(sim.agents)),
-            'refills_total': int(sum(a.fuel_refills for a in sim.agents))
-        }
-    }
-    return convert_numpy_types(agents_data)
+    return convert_numpy_types(sim.get_agents_info())
 
 @app.get('/parcels')
 def parcels_info():
     """Obtener información de las parcelas"""
-    parcels_data = []
-    for i, parcel in enumerate(sim.env.parcels):
-        # Contar cultivos en cada parcela
-        crops_in_parcel = 0
-        for y in range(parcel['y_start'], parcel['y_end']):
-            for x in range(parcel['x_start'], parcel['x_end']):
-                if 0 <= y < sim.env.h and 0 <= x < sim.env.w:
-                    if sim.env.grid[y, x] == 2:  # CROP
-                        crops_in_parcel += 1
-        
-        parcels_data.append({
-            'id': int(i),
-            'name': str(parcel.get('name', f'Parcela {i+1}')),
-            'bounds': {
-                'x_start': int(parcel['x_start']),
-                'x_end': int(parcel['x_end']),
-                'y_start': int(parcel['y_start']),
-                'y_end': int(parcel['y_end'])
-            },
-            'area': int((parcel['x_end'] - parcel['x_start']) * (parcel['y_end'] - parcel['y_start'])),
-            'crops_current': int(crops_in_parcel)
-        })
-    
-    return {
-        'total_parcels': int(len(sim.env.parcels)),
-        'parcels': parcels_data
-    }
+    return convert_numpy_types(sim.get_parcels_info())
+
+def _train_stats():
+    """Estadísticas del último trabajo de /train (o de la simulación si aún no hay trabajos)"""
+    job = jobs.latest()
+    return job.train_stats() if job is not None else sim.get_train_stats()
 
 @app.get('/training-progress')
 def training_progress():
     """
     Obtener progreso detallado del entrenamiento en tiempo real
     """
-    episodes = sim.train_stats.get('episodes', [])
+    job = jobs.latest()
+    if job is not None:
+        # Con trabajos encolados se informa del más reciente
+        summary = job.summary()
+        last_episode = job.last_episode
+        return convert_numpy_types({
+            'is_training': summary['status'] in ('queued', 'running', 'cancelling'),
+            'job_id': job.id,
+            'status': summary['status'],
+            'current_episode': summary['episodes_done'],
+            'total_episodes': summary['episodes'],
+            'progress_pct': summary['progress_pct'],
+            'last_reward': float(summary['last_reward'] or 0),
+            'best_reward': float(summary['best_reward'] or 0),
+            'avg_fuel_efficiency': float(last_episode.get('avg_fuel_efficiency', 0)),
+            'time_saved': float(last_episode.get('time_saved_pct', 0)),
+            'task_complete': summary['task_complete'],
+            'steps_per_sec': summary['steps_per_sec'],
+            'eta_sec': summary['eta_sec'],
+            'stop_reason': summary['stop_reason']
+        })
+
+    train_stats = sim.get_train_stats()
+    episodes = train_stats.get('episodes', [])
     
     if len(episodes) == 0:
         return {
             'is_training': bool(sim.running),
             'current_episode': 0,
             'total_episodes': 0,
-            'progress_pct': 0.0
+            'progress_pct': 0.0,
+            'stop_reason': train_stats.get('stop_reason')
         }
     
     last_episode = episodes[-1] if episodes else {}
@@ -288,10 +467,12 @@ def training_progress():
         'total_episodes': total_ep,
         'progress_pct': float((current_ep / max(1, total_ep)) * 100),
         'last_reward': float(last_episode.get('reward', 0)),
-        'best_reward': float(sim.train_stats.get('best_reward', 0)),
+        'best_reward': float(train_stats.get('best_reward', 0)),
         'avg_fuel_efficiency': float(last_episode.get('avg_fuel_efficiency', 0)),
         'time_saved': float(last_episode.get('time_saved_pct', 0)),
-        'task_complete': bool(last_episode.get('task_complete', False))
+        'task_complete': bool(last_episode.get('task_complete', False)),
+        'stop_reason': train_stats.get('stop_reason'),
+        'convergence': train_stats.get('convergence')
     }
 
 @app.get('/business-metrics')
@@ -299,7 +480,7 @@ def business_metrics():
     """
     Calcular métricas de negocio y ROI
     """
-    episodes = sim.train_stats.get('episodes', [])
+    episodes = _train_stats().get('episodes', [])
     
     if len(episodes) == 0:
         return {'status': 'no_data'}
@@ -340,6 +521,130 @@ def business_metrics():
         'payback_months': float(implementation_cost / max(1, monthly_savings))
     }
 
+# ========== SESIONES ==========
+
+@app.post('/sessions')
+def create_session(req: SessionRequest):
+    """
+    Crear una granja propia para un cliente (su propio SimManager)
+    - carga la política entrenada guardada si load_q
+    - step_budget: pasos totales permitidos (0/None = config SESSION_STEP_BUDGET)
+    - run: empezar a avanzar en los turnos del planificador
+    """
+    kwargs = {'w': req.width, 'h': req.height, 'crop_count': req.crop_count,
+              'fleet': req.fleet, 'seed': req.seed, 'load_q': req.load_q, 'run': req.run}
+    if req.step_budget is not None:
+        kwargs['step_budget'] = req.step_budget
+    if req.steps_per_tick is not None:
+        kwargs['steps_per_tick'] = req.steps_per_tick
+    try:
+        session = sessions.create(**kwargs)
+    except SessionLimitError as e:
+        return {'status': 'full', 'detail': str(e)}
+    return {'status': 'created', **session.summary()}
+
+@app.get('/sessions')
+def list_sessions():
+    """Estado del planificador y resumen de cada sesión"""
+    return {**sessions.stats(), 'items': [s.summary() for s in list(sessions.sessions.values())]}
+
+@app.get('/sessions/{session_id}')
+def session_info(session_id: str):
+    session = sessions.get(session_id)
+    if session is None:
+        return {'status': 'not_found', 'session_id': session_id}
+    return session.summary()
+
+@app.get('/sessions/{session_id}/state')
+def session_state(session_id: str, since: Optional[int] = None, encoding: str = 'list'):
+    """Como /state, pero de la granja de la sesión"""
+    session = sessions.get(session_id)
+    if session is None:
+        return {'status': 'not_found', 'session_id': session_id}
+    return convert_numpy_types(session.sim.get_state(since=since, encoding=encoding))
+
+@app.post('/sessions/{session_id}/run')
+def run_session(session_id: str):
+    """Avanzar la sesión en los turnos del planificador"""
+    session = sessions.run(session_id)
+    if session is None:
+        return {'status': 'not_found', 'session_id': session_id}
+    return session.summary()
+
+@app.post('/sessions/{session_id}/pause')
+def pause_session(session_id: str):
+    session = sessions.pause(session_id)
+    if session is None:
+        return {'status': 'not_found', 'session_id': session_id}
+    return session.summary()
+
+@app.post('/sessions/{session_id}/step')
+def step_session(session_id: str, n: int = Query(1, ge=1, le=SESSION_MAX_STEPS)):
+    """
+    Dar `n` pasos ya (dentro del presupuesto de la sesión); más de
+    SESSION_MAX_STEPS se rechaza (422): para avanzar mucho, /run y los turnos
+    """
+    session = sessions.step(session_id, n)
+    if session is None:
+        return {'status': 'not_found', 'session_id': session_id}
+    return session.summary()
+
+@app.delete('/sessions/{session_id}')
+def delete_session(session_id: str):
+    removed = sessions.remove(session_id)
+    return {'status': 'deleted' if removed else 'not_found', 'session_id': session_id}
+
+# ========== BARRIDOS DE HIPERPARÁMETROS ==========
+
+@app.post('/sweeps')
+def start_sweep(req: SweepRequest):
+    """
+    Lanzar un barrido de hiperparámetros en un pool de procesos
+    - space: {'alpha': [0.1, 0.5], ...} o rangos {'low', 'high', 'log'} en random
+    - cada trial entrena un SimManager independiente con su propia semilla
+    - early_stopping corta los trials por debajo de la mediana tras grace_episodes
+    """
+    try:
+        sweep = Sweep(req.space, search=req.search, n_trials=req.n_trials,
+                      episodes=req.episodes, steps_per_episode=req.steps_per_episode,
+                      workers=req.workers, seed=req.seed, metric=req.metric,
+                      early_stopping=req.early_stopping, grace_episodes=req.grace_episodes)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={'status': 'error', 'detail': str(e)})
+    _prune_sweeps()
+    sweeps[sweep.id] = sweep.start()
+    return {'status': 'started', 'sweep_id': sweep.id,
+            'trials': len(sweep.trials), 'workers': sweep.workers}
+
+def _prune_sweeps(keep=SWEEP_KEEP):
+    """Descarta los barridos terminados más antiguos: quedan `keep` como mucho"""
+    finished = sorted((s for s in sweeps.values() if s.finished_at is not None),
+                      key=lambda s: s.finished_at)
+    for sweep in finished[:max(0, len(finished) - keep)]:
+        sweeps.pop(sweep.id, None)
+
+@app.get('/sweeps')
+def list_sweeps():
+    """Resumen de los barridos (mejor trial hasta ahora de cada uno)"""
+    return convert_numpy_types({'sweeps': [s.summary() for s in sweeps.values()]})
+
+@app.get('/sweeps/{sweep_id}')
+def sweep_results(sweep_id: str):
+    """Tabla de resultados: curvas por trial y ranking del mejor hasta ahora"""
+    sweep = sweeps.get(sweep_id)
+    if sweep is None:
+        return {'status': 'not_found', 'sweep_id': sweep_id}
+    return convert_numpy_types(sweep.snapshot())
+
+@app.post('/sweeps/{sweep_id}/stop')
+def stop_sweep(sweep_id: str):
+    """Cortar todos los trials de un barrido al final de su episodio actual"""
+    sweep = sweeps.get(sweep_id)
+    if sweep is None:
+        return {'status': 'not_found', 'sweep_id': sweep_id}
+    sweep.stop()
+    return {'status': 'stopping', 'sweep_id': sweep_id}
+
 # ========== DOCUMENTACIÓN ==========
 
 if __name__ == '__main__':
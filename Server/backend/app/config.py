@@ -1,9 +1,22 @@
 import os
 
+from .fleet import (
+    DEFAULT_FLEET_SPEC, parse_fleet, default_fleet, fleet_roles, fleet_spawn_positions
+)
+
 BASE_DIR = os.path.dirname(__file__)
 GRID_W = int(os.getenv("GRID_W", 60))
 GRID_H = int(os.getenv("GRID_H", 40))
-N_AGENTS = int(os.getenv("N_AGENTS", 6))
+
+# Flota: rol -> cantidad. FLEET="planter:10,harvester:10,irrigator:10"
+# Si sólo se define N_AGENTS, se reparte entre los tres roles.
+if os.getenv("FLEET"):
+    FLEET = parse_fleet(os.getenv("FLEET"))
+elif os.getenv("N_AGENTS"):
+    FLEET = default_fleet(int(os.getenv("N_AGENTS")))
+else:
+    FLEET = parse_fleet(DEFAULT_FLEET_SPEC)
+N_AGENTS = sum(FLEET.values())
 
 CROP_COUNT = int(os.getenv("CROP_COUNT", 200))
 OBSTACLE_COUNT = int(os.getenv("OBST_COUNT", 30))
@@ -49,32 +62,25 @@ HARVESTER_BARN_POS = (GRID_W - 5, 3)
 IRRIGATOR_BARN_POS = (3, GRID_H - 5)
 MANAGER_POS = (GRID_W - 5, GRID_H - 5)
 
-AGENT_ROLES = [
-    'planter',   
-    'planter',   
-    'harvester', 
-    'harvester', 
-    'irrigator', 
-    'irrigator'  
-]
-
-DEFAULT_ROLES = AGENT_ROLES
-
-AGENT_START_POSITIONS = [
-    (4, 4),                        # Plantador
-    (5, 4),                        
-    (GRID_W - 6, 4),               # Cosechador
-    (GRID_W - 7, 4),               
-    (4, GRID_H - 6),               # Irrigador
-    (5, GRID_H - 6)
-]
-
 ROLE_BARNS = {
     'planter': PLANTER_BARN_POS,
     'harvester': HARVESTER_BARN_POS,
     'irrigator': IRRIGATOR_BARN_POS
 }
 
+AGENT_ROLES = fleet_roles(FLEET)
+
+DEFAULT_ROLES = AGENT_ROLES
+
+# Salidas en anillos alrededor de cada granero (con la flota 2/2/2:
+# (4,4), (5,4), (W-6,4), (W-7,4), (4,H-6), (5,H-6))
+AGENT_START_POSITIONS = fleet_spawn_positions(
+    FLEET, ROLE_BARNS, GRID_W, GRID_H,
+    is_blocked=lambda x, y: any(
+        p['x_start'] <= x < p['x_end'] and p['y_start'] <= y < p['y_end'] for p in PARCELS
+    )
+)
+
 AGENT_COLORS = {
     'planter': '#e74c3c',
     'harvester': '#27ae60',
@@ -120,6 +126,66 @@ ROLE_PARAMS = {
     'irrigator': IRRIGATOR_PARAMS
 }
 
+# Q-tables compartidas por rol (SHARED_Q=1): los agentes de un rol aprenden juntos
+SHARED_Q = os.getenv("SHARED_Q", "0") == "1"
+
+# Experience replay: anillo de transiciones y lote repasado en cada paso (0 = sin replay)
+REPLAY_CAPACITY = int(os.getenv("REPLAY_CAPACITY", 50000))
+REPLAY_BATCH = int(os.getenv("REPLAY_BATCH", 0))
+# Dyna-Q: actualizaciones simuladas con el modelo aprendido por paso (0 = sin planificación)
+PLANNING_STEPS = int(os.getenv("PLANNING_STEPS", 0))
+
+# Algoritmo de aprendizaje: 'q' (Q-learning de un paso) o 'q_lambda' (Q(lambda) de Watkins)
+LEARNER = os.getenv("LEARNER", "q")
+TRACE_LAMBDA = float(os.getenv("TRACE_LAMBDA", 0.8))
+# Máximo de trazas de elegibilidad vivas en toda la flota
+TRACE_CAPACITY = int(os.getenv("TRACE_CAPACITY", 4096))
+
+# Parada temprana por convergencia: ventana móvil de episodios (0 = entrenar siempre todos)
+CONVERGENCE_WINDOW = int(os.getenv("CONVERGENCE_WINDOW", 10))
+# Episodios seguidos en meseta para parar y mínimo de episodios antes de poder hacerlo
+CONVERGENCE_PATIENCE = int(os.getenv("CONVERGENCE_PATIENCE", 3))
+CONVERGENCE_MIN_EPISODES = int(os.getenv("CONVERGENCE_MIN_EPISODES", 30))
+# Cambio relativo máximo entre ventanas de reward y de pasos por episodio
+CONVERGENCE_REWARD_TOL = float(os.getenv("CONVERGENCE_REWARD_TOL", 0.02))
+CONVERGENCE_STEPS_TOL = float(os.getenv("CONVERGENCE_STEPS_TOL", 0.05))
+# Cambio de Q por paso respecto a su máximo, y crecimiento relativo de estados en la ventana
+CONVERGENCE_Q_TOL = float(os.getenv("CONVERGENCE_Q_TOL", 0.1))
+CONVERGENCE_STATES_TOL = float(os.getenv("CONVERGENCE_STATES_TOL", 0.01))
+
+# Atascos: pasos seguidos sin plantar, irrigar ni cosechar para darlo por atascado (0 = sin detector)
+STALL_WINDOW = int(os.getenv("STALL_WINDOW", 150))
+# Qué hacer al detectarlo: 'log' (sólo anotarlo en las estadísticas), 'end' (cerrar el episodio)
+# o 'reset' (reiniciar el mapa con los pasos que quedan)
+STALL_ACTION = os.getenv("STALL_ACTION", "log")
+# Lado máximo (en celdas) del recuadro en el que un agente que se mueve cuenta como 'looping'
+STALL_LOOP_SPAN = int(os.getenv("STALL_LOOP_SPAN", 3))
+
+# Procesos del barrido de hiperparámetros (POST /sweeps y python -m app.sweeps)
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+# Barridos terminados que conserva la API (los más antiguos se descartan)
+SWEEP_KEEP = int(os.getenv("SWEEP_KEEP", 20))
+
+# Sesiones de simulación (una granja por dashboard) sobre un pool de hilos común
+SESSION_WORKERS = int(os.getenv("SESSION_WORKERS", os.cpu_count() or 4))
+SESSION_MAX = int(os.getenv("SESSION_MAX", 500))
+# Segundos entre turnos del planificador y pasos de cada sesión en su turno
+SESSION_TICK = float(os.getenv("SESSION_TICK", 0.1))
+SESSION_STEPS_PER_TICK = int(os.getenv("SESSION_STEPS_PER_TICK", 1))
+# Pasos totales permitidos por sesión (0 = sin límite)
+SESSION_STEP_BUDGET = int(os.getenv("SESSION_STEP_BUDGET", 0))
+# Máximo de pasos síncronos por petición (POST /sessions/{id}/step)
+SESSION_MAX_STEPS = int(os.getenv("SESSION_MAX_STEPS", 1000))
+# Segundos sin peticiones tras los que una sesión se expulsa
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", 600))
+
+# Motor de simulación/entrenamiento en un proceso aparte (ENGINE_PROCESS=1)
+ENGINE_PROCESS = os.getenv("ENGINE_PROCESS", "0") == "1"
+# Cada cuántos segundos publica el motor la instantánea en memoria compartida
+ENGINE_SNAPSHOT_INTERVAL = float(os.getenv("ENGINE_SNAPSHOT_INTERVAL", 0.05))
+# Espera máxima de la API por la respuesta a un comando
+ENGINE_TIMEOUT = float(os.getenv("ENGINE_TIMEOUT", 30))
+
 DEFAULT_ALPHA = 0.5
 DEFAULT_GAMMA = 0.95
 DEFAULT_EPS = 0.4
@@ -165,6 +231,12 @@ IRRIGATOR_QTABLE_PATH = os.path.join(SAVE_DIR, "irrigator_qtable.pkl")
 STATS_PATH = os.path.join(SAVE_DIR, "train_stats.json")
 LOGS_PATH = os.path.join(SAVE_DIR, "training_logs.txt")
 
+# Cola de trabajos de entrenamiento: procesos concurrentes y carpeta de resultados por trabajo
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+JOBS_DIR = os.path.join(SAVE_DIR, "jobs")
+# Al completarse un trabajo sus Q-tables y estadísticas pasan a ser el modelo actual (QTABLE_PATH)
+JOB_PROMOTE = os.getenv("JOB_PROMOTE", "1") == "1"
+
 # VISUALIZACIÓN
 SIMULATION_SPEED = float(os.getenv("SIM_SPEED", 0.12))
 
@@ -204,6 +276,12 @@ def get_training_config():
     """Retorna configuración de entrenamiento"""
     return {
         'n_agents': N_AGENTS,
+        'fleet': dict(FLEET),
+        'shared_q': SHARED_Q,
+        'replay_batch': REPLAY_BATCH,
+        'planning_steps': PLANNING_STEPS,
+        'learner': LEARNER,
+        'trace_lambda': TRACE_LAMBDA,
         'agent_roles': AGENT_ROLES,
         'role_params': ROLE_PARAMS,
         'episodes': DEFAULT_EPISODES,
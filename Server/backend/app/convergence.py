@@ -0,0 +1,80 @@
+# backend/app/convergence.py
+from collections import deque
+
+import numpy as np
+
+from .config import (
+    CONVERGENCE_WINDOW, CONVERGENCE_PATIENCE, CONVERGENCE_MIN_EPISODES,
+    CONVERGENCE_REWARD_TOL, CONVERGENCE_STEPS_TOL, CONVERGENCE_Q_TOL, CONVERGENCE_STATES_TOL
+)
+
+# Criterios de meseta que se evalúan al cerrar cada episodio
+CRITERIA = ('reward', 'steps', 'q_delta', 'states')
+
+
+def _relative_change(recent, previous):
+    return abs(recent - previous) / max(abs(previous), 1.0)
+
+
+class ConvergenceMonitor:
+    """
+    Detecta la meseta del entrenamiento con ventanas móviles de `window`
+    episodios. Compara la media de la última ventana con la anterior:
+    - reward y pasos: cambio relativo <= reward_tol / steps_tol
+    - q_delta (|alpha * td| medio por paso): por debajo de q_tol veces su
+      mayor media de ventana (la magnitud depende de las recompensas)
+    - estados aprendidos: crecimiento relativo en la ventana <= states_tol
+    Converge cuando todos se cumplen `patience` episodios seguidos.
+    Con window=0 no converge nunca (se entrenan todos los episodios).
+    """
+
+    def __init__(self, window=CONVERGENCE_WINDOW, patience=CONVERGENCE_PATIENCE,
+                 min_episodes=CONVERGENCE_MIN_EPISODES, reward_tol=CONVERGENCE_REWARD_TOL,
+                 steps_tol=CONVERGENCE_STEPS_TOL, q_tol=CONVERGENCE_Q_TOL,
+                 states_tol=CONVERGENCE_STATES_TOL):
+        self.window = max(0, window)
+        self.patience = max(1, patience)
+        self.min_episodes = max(min_episodes, 2 * self.window)
+        self.tol = {'reward': reward_tol, 'steps': steps_tol, 'q_delta': q_tol, 'states': states_tol}
+        self.history = {name: deque(maxlen=2 * self.window) for name in CRITERIA}
+        self.episodes = 0
+        self.streak = 0
+        self.q_peak = 0.0
+        self.checks = {}
+        self.converged = False
+
+    def update(self, reward, steps, q_delta, states):
+        """Registra un episodio; devuelve True si el entrenamiento ha convergido"""
+        for name, value in zip(CRITERIA, (reward, steps, q_delta, states)):
+            self.history[name].append(float(value))
+        self.episodes += 1
+        if self.window == 0 or len(self.history['reward']) < 2 * self.window:
+            return False
+
+        w = self.window
+        means = {name: (np.mean(list(h)[w:]), np.mean(list(h)[:w])) for name, h in self.history.items()}
+        self.q_peak = max(self.q_peak, means['q_delta'][0], means['q_delta'][1])
+        states = self.history['states']
+        self.checks = {
+            'reward': _relative_change(*means['reward']),
+            'steps': _relative_change(*means['steps']),
+            'q_delta': means['q_delta'][0] / self.q_peak if self.q_peak > 0 else 0.0,
+            'states': (states[-1] - states[w - 1]) / max(states[w - 1], 1.0)
+        }
+        if all(self.checks[name] <= self.tol[name] for name in CRITERIA):
+            self.streak += 1
+        else:
+            self.streak = 0
+        self.converged = self.episodes >= self.min_episodes and self.streak >= self.patience
+        return self.converged
+
+    def status(self):
+        return {
+            'episodes': self.episodes,
+            'window': self.window,
+            'streak': self.streak,
+            'patience': self.patience,
+            'converged': self.converged,
+            'checks': {name: round(float(v), 4) for name, v in self.checks.items()},
+            'tolerances': dict(self.tol)
+        }
@@ -0,0 +1,140 @@
+# backend/app/crops.py
+import os
+import numpy as np
+
+from .world import new_layer
+
+# Ticks de vida a partir de los cuales un cultivo está maduro
+MATURITY_STEPS = int(os.getenv("MATURITY_STEPS", 50))
+# Cada cuántos ticks de vida se evapora una unidad de agua de la celda
+EVAPORATION_INTERVAL = int(os.getenv("EVAPORATION_INTERVAL", 10))
+# Ticks seguidos sin agua, ya maduro, tras los que un cultivo se marchita
+WILT_STEPS = int(os.getenv("WILT_STEPS", 200))
+
+AGE_DTYPE = np.uint16
+AGE_MAX = int(np.iinfo(AGE_DTYPE).max)
+
+
+class CropLifecycle:
+    """
+    Ciclo de vida de los cultivos: edad, evaporación, madurez y marchitez.
+    Mantiene un índice de cultivos activos (arrays ys/xs/age/dry alineados y un
+    mapa celda -> hueco), así que avanzar un tick cuesta O(cultivos) y no
+    O(celdas del mapa).
+    """
+
+    def __init__(self, h, w, chunked=False):
+        self.h = h
+        self.w = w
+        self.chunked = chunked
+        self._slot = new_layer(h, w, dtype=np.int32, fill=-1, chunked=chunked)
+        self.ys = np.zeros(0, dtype=np.int64)
+        self.xs = np.zeros(0, dtype=np.int64)
+        self.clear()
+
+    def clear(self):
+        """Vacía el índice tocando sólo las celdas activas"""
+        self._slot[self.ys, self.xs] = -1
+        self.ys = np.zeros(0, dtype=np.int64)
+        self.xs = np.zeros(0, dtype=np.int64)
+        self.age = np.zeros(0, dtype=AGE_DTYPE)
+        self.dry = np.zeros(0, dtype=AGE_DTYPE)
+        self.mature = 0
+        self.wilted_total = 0
+
+    def __len__(self):
+        return len(self.ys)
+
+    @property
+    def nbytes(self):
+        return int(self._slot.nbytes + self.ys.nbytes + self.xs.nbytes + self.age.nbytes + self.dry.nbytes)
+
+    def add(self, ys, xs):
+        """Da de alta cultivos nuevos (edad 0); ignora celdas que ya están en el índice"""
+        ys = np.atleast_1d(np.asarray(ys, dtype=np.int64))
+        xs = np.atleast_1d(np.asarray(xs, dtype=np.int64))
+        if ys.size == 0:
+            return
+        new = self._slot[ys, xs] < 0
+        ys, xs = ys[new], xs[new]
+        if ys.size == 0:
+            return
+        start = len(self.ys)
+        self._slot[ys, xs] = np.arange(start, start + ys.size, dtype=np.int32)
+        self.ys = np.concatenate([self.ys, ys])
+        self.xs = np.concatenate([self.xs, xs])
+        self.age = np.concatenate([self.age, np.zeros(ys.size, dtype=AGE_DTYPE)])
+        self.dry = np.concatenate([self.dry, np.zeros(ys.size, dtype=AGE_DTYPE)])
+
+    def remove(self, ys, xs):
+        """Da de baja cultivos (cosecha, marchitez, limpieza); compacta el índice"""
+        ys = np.atleast_1d(np.asarray(ys, dtype=np.int64))
+        xs = np.atleast_1d(np.asarray(xs, dtype=np.int64))
+        if ys.size == 0 or len(self.ys) == 0:
+            return
+        slots = self._slot[ys, xs]
+        slots = np.unique(slots[slots >= 0])
+        if slots.size == 0:
+            return
+        self.mature -= int(np.count_nonzero(self.age[slots] >= MATURITY_STEPS))
+        self._slot[self.ys[slots], self.xs[slots]] = -1
+        keep = np.ones(len(self.ys), dtype=bool)
+        keep[slots] = False
+        self.ys = self.ys[keep]
+        self.xs = self.xs[keep]
+        self.age = self.age[keep]
+        self.dry = self.dry[keep]
+        # Sólo se reescriben los huecos que se desplazan, nunca el mapa entero
+        first = int(slots[0])
+        self._slot[self.ys[first:], self.xs[first:]] = np.arange(first, len(self.ys), dtype=np.int32)
+
+    def age_at(self, x, y):
+        slot = int(self._slot[y, x])
+        return int(self.age[slot]) if slot >= 0 else 0
+
+    def is_mature(self, x, y):
+        return self.age_at(x, y) >= MATURITY_STEPS
+
+    def age_layer(self):
+        """
+        Capa [y, x] con la edad de cada cultivo (copia para consultas/depuración).
+        En mapas por bloques es otra ChunkedLayer: sólo reserva los bloques con cultivos.
+        """
+        out = new_layer(self.h, self.w, dtype=AGE_DTYPE, fill=0, chunked=self.chunked)
+        out[self.ys, self.xs] = self.age
+        return out
+
+    def advance(self, grid, water, empty_value):
+        """
+        Un tick de vida para todos los cultivos activos:
+          - la edad sube 1 (saturada)
+          - cada EVAPORATION_INTERVAL ticks de edad la celda pierde 1 de agua
+          - ya maduro y sin agua durante WILT_STEPS ticks seguidos se marchita
+            (la celda vuelve a `empty_value`)
+        Devuelve el número de cultivos marchitos en este tick.
+        """
+        if len(self.ys) == 0:
+            return 0
+        age = np.minimum(self.age.astype(np.int64) + 1, AGE_MAX)
+        self.age = age.astype(AGE_DTYPE)
+
+        level = water[self.ys, self.xs]
+        evaporate = (age % EVAPORATION_INTERVAL == 0) & (level > 0)
+        if evaporate.any():
+            level = level.copy()
+            level[evaporate] -= 1
+            water[self.ys[evaporate], self.xs[evaporate]] = level[evaporate]
+
+        mature = age >= MATURITY_STEPS
+        dry = np.where(mature & (level == 0), self.dry.astype(np.int64) + 1, 0)
+        self.dry = np.minimum(dry, AGE_MAX).astype(AGE_DTYPE)
+        self.mature = int(np.count_nonzero(mature))
+
+        wilted = self.dry >= WILT_STEPS
+        n_wilted = int(np.count_nonzero(wilted))
+        if n_wilted:
+            wy, wx = self.ys[wilted], self.xs[wilted]
+            grid[wy, wx] = empty_value
+            self.remove(wy, wx)
+            self.wilted_total += n_wilted
+        return n_wilted
@@ -0,0 +1,371 @@
+# backend/app/engine.py
+import json
+import multiprocessing as mp
+import queue
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .config import ENGINE_PROCESS, ENGINE_SNAPSHOT_INTERVAL, ENGINE_TIMEOUT
+from .sim_manager import SimManager, AGENT_FIELDS, agent_states_from_table
+from .world import serialize_layer, serialize_dense_chunks, is_chunked
+from .instrumentation import PROBE
+from .tracing import TRACER
+
+# Cabecera de la instantánea: contador de secuencia (seqlock), dimensiones y,
+# en mapas por bloques, tamaño de bloque, relleno, versión y época del grid
+HEADER = ('seq', 'h', 'w', 'agents', 'fields', 'meta_len',
+          'chunk', 'cy', 'cx', 'fill', 'version', 'epoch')
+HEADER_BYTES = 128
+META_CAPACITY = 1 << 16
+
+# Lo que la API puede pedir al motor: métodos de SimManager y atributos de sólo lectura
+ENGINE_METHODS = frozenset({
+    'start_training', 'stop_training', 'update_params', 'save_qs', 'save_stats',
+    'load_qs', 'reload_qs', 'start_run_trained', 'stop_run_trained', 'get_train_stats',
+    'get_fleet_metrics', 'get_agents_info', 'get_parcels_info'
+})
+ENGINE_ATTRS = frozenset({'params', 'QTABLE_PATH', 'parcel_count'})
+
+
+class EngineUnavailable(RuntimeError):
+    """El motor no respondió a tiempo (lento, colgado o muerto)"""
+
+
+def _probe_configure(enabled, reset=False):
+    PROBE.set_enabled(enabled)
+    if reset:
+        PROBE.reset()
+    return PROBE.enabled
+
+
+# Instrumentación y trazas del proceso del motor (el bucle en vivo corre allí)
+ENGINE_COMMANDS = {
+    'probe_snapshot': PROBE.snapshot,
+    'probe_configure': _probe_configure,
+    'trace_start': TRACER.start,
+    'trace_stop': TRACER.stop,
+    'trace_status': TRACER.status
+}
+
+
+def _align(n, to=8):
+    return (n + to - 1) // to * to
+
+
+class StateSnapshot:
+    """
+    Instantánea del estado en memoria compartida: grid (uint8 [h, w]), versión
+    de cada bloque del grid (int64 [cy, cx], vacío en mapas densos), tabla de
+    agentes (float64 [agentes, AGENT_FIELDS]) y el bloque 'meta' en JSON. El
+    motor escribe con un seqlock (secuencia impar = escribiendo) y los lectores
+    copian y reintentan si la secuencia cambió, sin bloquear nunca al motor.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray(len(HEADER), dtype=np.int64, buffer=shm.buf)
+        h, w, n, fields, cy, cx = (int(self.header[HEADER.index(k)])
+                                   for k in ('h', 'w', 'agents', 'fields', 'cy', 'cx'))
+        grid_at = HEADER_BYTES
+        versions_at = grid_at + _align(h * w)
+        agents_at = versions_at + cy * cx * 8
+        meta_at = agents_at + n * fields * 8
+        self.grid = np.ndarray((h, w), dtype=np.uint8, buffer=shm.buf, offset=grid_at)
+        self.versions = np.ndarray((cy, cx), dtype=np.int64, buffer=shm.buf, offset=versions_at)
+        self.agents = np.ndarray((n, fields), dtype=np.float64, buffer=shm.buf, offset=agents_at)
+        self.meta = np.ndarray(META_CAPACITY, dtype=np.uint8, buffer=shm.buf, offset=meta_at)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, h, w, n_agents, chunk=0, fill=0):
+        fields = len(AGENT_FIELDS)
+        cy, cx = (-(-h // chunk), -(-w // chunk)) if chunk else (0, 0)
+        size = HEADER_BYTES + _align(h * w) + cy * cx * 8 + n_agents * fields * 8 + META_CAPACITY
+        shm = SharedMemory(create=True, size=size)
+        header = np.ndarray(len(HEADER), dtype=np.int64, buffer=shm.buf)
+        header[:] = (0, h, w, n_agents, fields, 0, chunk, cy, cx, fill, 0, 0)
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        # El motor lo borra al cerrar; si muere antes, el resource_tracker común lo limpia
+        return cls(SharedMemory(name=name), owner=False)
+
+    def publish(self, grid, table, meta, versions=None, version=0, epoch=0):
+        data = json.dumps(meta).encode()
+        if len(data) > META_CAPACITY:
+            raise ValueError(f"meta de {len(data)} bytes no cabe en la instantánea")
+        seq = HEADER.index('seq')
+        self.header[seq] += 1
+        self.grid[...] = grid
+        if versions is not None:
+            self.versions[...] = versions
+            self.header[HEADER.index('version')] = version
+            self.header[HEADER.index('epoch')] = epoch
+        self.agents[...] = table
+        self.meta[:len(data)] = np.frombuffer(data, dtype=np.uint8)
+        self.header[HEADER.index('meta_len')] = len(data)
+        self.header[seq] += 1
+
+    def read(self, retries=1000, grid=True):
+        """
+        (grid, tabla de agentes, meta, bloques) coherentes entre sí (copias).
+        `bloques` es None en mapas densos y si no, {'versions', 'version', 'epoch'}.
+        Con grid=False no se copian grid ni bloques (salen como None).
+        """
+        seq = HEADER.index('seq')
+        for _ in range(retries):
+            before = int(self.header[seq])
+            if before % 2:
+                time.sleep(0)
+                continue
+            grid_copy = self.grid.copy() if grid else None
+            chunks = None
+            if grid and self.versions.size:
+                chunks = {'versions': self.versions.copy(),
+                          'version': int(self.header[HEADER.index('version')]),
+                          'epoch': int(self.header[HEADER.index('epoch')])}
+            table = self.agents.copy()
+            meta = bytes(self.meta[:int(self.header[HEADER.index('meta_len')])])
+            if int(self.header[seq]) == before:
+                return grid_copy, table, json.loads(meta) if meta else {}, chunks
+        raise TimeoutError("La instantánea cambia continuamente")
+
+    @property
+    def chunk(self):
+        return int(self.header[HEADER.index('chunk')])
+
+    @property
+    def fill(self):
+        return int(self.header[HEADER.index('fill')])
+
+    def close(self):
+        # Las vistas NumPy deben soltarse antes de cerrar el segmento
+        self.header = self.grid = self.versions = self.agents = self.meta = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _publish(sim, snapshot):
+    with sim.lock:
+        layer = sim.env.grid
+        if not is_chunked(layer):
+            snapshot.publish(layer, sim.agent_table(), sim.state_meta())
+            return
+        # Igual que serialize_grid: los bloques sucios reciben versión antes de publicar
+        layer.commit()
+        versions = np.full(snapshot.versions.shape, -1, dtype=np.int64)
+        for (cy, cx) in layer.chunks:
+            versions[cy, cx] = layer.versions.get((cy, cx), 0)
+        snapshot.publish(layer.to_dense(), sim.agent_table(), sim.state_meta(),
+                         versions, layer.version, layer.epoch)
+
+
+def _execute(sim, name, args, kwargs):
+    if name in ENGINE_COMMANDS:
+        return ENGINE_COMMANDS[name](*args, **kwargs)
+    if name in ENGINE_METHODS:
+        return getattr(sim, name)(*args, **kwargs)
+    if name in ENGINE_ATTRS:
+        return getattr(sim, name)
+    raise AttributeError(f"El motor no expone '{name}'")
+
+
+def engine_main(commands, replies, sim_kwargs, interval):
+    """
+    Proceso del motor: dueño del SimManager (entrenamiento y bucle en vivo en
+    sus hilos). El hilo principal atiende la cola de comandos y publica la
+    instantánea cada `interval` segundos y tras cada comando.
+    """
+    sim = SimManager(**(sim_kwargs or {}))
+    layer = sim.env.grid
+    chunk, fill = (layer.chunk, int(layer.fill)) if is_chunked(layer) else (0, 0)
+    snapshot = StateSnapshot.create(sim.env.h, sim.env.w, len(sim.agents), chunk, fill)
+    _publish(sim, snapshot)
+    replies.put(('ready', snapshot.name, sim.agent_role_names()))
+    last = time.perf_counter()
+    try:
+        while True:
+            try:
+                command = commands.get(timeout=interval)
+            except queue.Empty:
+                command = None
+            if command is not None:
+                req_id, name, args, kwargs = command
+                if name == 'shutdown':
+                    replies.put((req_id, True, None))
+                    break
+                try:
+                    replies.put((req_id, True, _execute(sim, name, args, kwargs)))
+                except Exception as e:
+                    replies.put((req_id, False, repr(e)))
+            if command is not None or time.perf_counter() - last >= interval:
+                try:
+                    _publish(sim, snapshot)
+                except Exception as e:
+                    # Un paso a medias puede dejar el estado inconsistente: se reintenta luego
+                    print(f"⚠️ Instantánea omitida: {e}")
+                last = time.perf_counter()
+    finally:
+        # stop_training guarda en disco: sólo si de verdad había un entrenamiento
+        if sim.train_thread is not None and sim.train_thread.is_alive():
+            sim.stop_training()
+        sim.stop_run_trained()
+        snapshot.close()
+
+
+def _remote(name):
+    """Método de EngineClient que reenvía la llamada al motor"""
+    def method(self, *args, **kwargs):
+        return self.call(name, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class RemoteTracer:
+    """El StepTracer del motor visto desde la API (mismos métodos que TRACER)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def start(self, steps=500):
+        return self.client.call('trace_start', steps)
+
+    def stop(self):
+        return self.client.call('trace_stop')
+
+    def status(self):
+        return self.client.call('trace_status')
+
+    @property
+    def last_path(self):
+        return self.status()['last_trace']
+
+
+class EngineClient:
+    """
+    Fachada de SimManager para la API cuando el motor corre en otro proceso
+    (ENGINE_PROCESS=1). Las órdenes van por una cola de comandos; get_state lee
+    la instantánea en memoria compartida y nunca espera al bucle de entrenamiento.
+    """
+
+    def __init__(self, sim_kwargs=None, interval=ENGINE_SNAPSHOT_INTERVAL, timeout=ENGINE_TIMEOUT):
+        ctx = mp.get_context('spawn')
+        self.timeout = timeout
+        self._commands = ctx.Queue()
+        self._replies = ctx.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.process = ctx.Process(target=engine_main, name='farm-engine', daemon=True,
+                                   args=(self._commands, self._replies, sim_kwargs, interval))
+        self.process.start()
+        try:
+            _, name, roles = self._replies.get(timeout=max(timeout, 60))
+        except queue.Empty:
+            self.process.terminate()
+            raise EngineUnavailable(f"El motor no arrancó en {max(timeout, 60):.0f} s") from None
+        self.snapshot = StateSnapshot.attach(name)
+        self.roles = roles
+        # Los hilos de entrenamiento viven en el motor: /debug/profile no los ve
+        self.train_thread = None
+        self.trained_thread = None
+        self.tracer = RemoteTracer(self)
+
+    def call(self, name, *args, **kwargs):
+        with self._lock:
+            self._next_id += 1
+            req_id = self._next_id
+            self._commands.put((req_id, name, args, kwargs))
+            while True:
+                try:
+                    reply_id, ok, result = self._replies.get(timeout=self.timeout)
+                except queue.Empty:
+                    state = 'ocupado' if self.process.is_alive() else 'caído'
+                    raise EngineUnavailable(
+                        f"El motor no respondió a '{name}' en {self.timeout:.0f} s ({state})") from None
+                # Respuestas de peticiones que ya expiraron se descartan
+                if reply_id == req_id:
+                    break
+        if not ok:
+            raise RuntimeError(f"Motor: {result}")
+        return result
+
+    def get_state(self, since=None, encoding='list'):
+        """Como SimManager.get_state, desde la instantánea (con `since` en mapas por bloques)"""
+        grid, table, meta, chunks = self.snapshot.read()
+        if chunks is None:
+            payload = serialize_layer(grid, encoding=encoding)
+        else:
+            payload = serialize_dense_chunks(grid, chunks['versions'], self.snapshot.chunk,
+                                             self.snapshot.fill, chunks['version'],
+                                             chunks['epoch'], since=since, encoding=encoding)
+        return {
+            **payload,
+            'agents': agent_states_from_table(table, self.roles),
+            'blackboard': {},
+            'meta': meta
+        }
+
+    @property
+    def running(self):
+        return bool(self.snapshot.read(grid=False)[2].get('is_training', False))
+
+    @property
+    def running_trained(self):
+        return bool(self.snapshot.read(grid=False)[2].get('is_running_trained', False))
+
+    @property
+    def params(self):
+        return self.call('params')
+
+    @property
+    def QTABLE_PATH(self):
+        return self.call('QTABLE_PATH')
+
+    @property
+    def parcel_count(self):
+        return self.call('parcel_count')
+
+    start_training = _remote('start_training')
+    stop_training = _remote('stop_training')
+    update_params = _remote('update_params')
+    save_qs = _remote('save_qs')
+    save_stats = _remote('save_stats')
+    load_qs = _remote('load_qs')
+    reload_qs = _remote('reload_qs')
+    start_run_trained = _remote('start_run_trained')
+    stop_run_trained = _remote('stop_run_trained')
+    get_train_stats = _remote('get_train_stats')
+    get_fleet_metrics = _remote('get_fleet_metrics')
+    get_agents_info = _remote('get_agents_info')
+    get_parcels_info = _remote('get_parcels_info')
+    probe_snapshot = _remote('probe_snapshot')
+    probe_configure = _remote('probe_configure')
+
+    def close(self):
+        try:
+            self.call('shutdown')
+        except Exception:
+            pass
+        self.process.join(timeout=5)
+        self.snapshot.close()
+
+
+def create_sim(module_name):
+    """
+    Simulador de un punto de entrada: EngineClient con ENGINE_PROCESS=1, si no
+    SimManager. None en los procesos hijos (spawn), que re-importan el módulo
+    principal como __mp_main__ y no deben arrancar otra granja ni otro motor.
+    """
+    if module_name == '__mp_main__':
+        return None
+    return EngineClient() if ENGINE_PROCESS else SimManager()
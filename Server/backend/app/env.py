@@ -1,7 +1,13 @@
-import random
 import numpy as np
 from heapq import heappush, heappop
 
+from .instrumentation import PROBE
+from .tracing import TRACER
+from .fleet import default_fleet, normalize_fleet, fleet_roles, fleet_spawn_positions
+from .pool import pool_rows, ROLE_CODES
+from .crops import CropLifecycle, MATURITY_STEPS
+from .world import OccupancyGrid, new_layer, count_equal, serialize_layer, CHUNKED_MIN_CELLS
+
 EMPTY = 0
 OBST = 1
 CROP = 2
@@ -13,13 +19,36 @@ HARVESTER_BARN = 7
 IRRIGATOR_BARN = 8
 PARCEL_BORDER = 11
 
+# Tipos compactos de las capas: los códigos de celda llegan a 11 y el agua es un contador pequeño
+GRID_DTYPE = np.uint8
+WATER_DTYPE = np.uint8
+COMPACTION_DTYPE = np.uint8
+WATER_MAX = int(np.iinfo(WATER_DTYPE).max)
+COMPACTION_MAX = int(np.iinfo(COMPACTION_DTYPE).max)
+
+# Por debajo de este tamaño de flota el bucle por agente es más rápido que las máscaras
+BATCH_MIN_AGENTS = 48
+
+# Vecinos que codifica el bit `occ` del estado (mismo orden que FarmAgent.obs_to_state)
+OCC_DIRS = [(0, 1), (0, -1), (-1, 0), (1, 0)]
+
 def heuristic(a, b):
     """Distancia Manhattan"""
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-def astar(start, goal, obstacles_set, w, h):
+def astar(start, goal, obstacles_set, w, h, stats=None, occupied=None):
+    """
+    A* en 4-conectividad. `occupied` (opcional, p. ej. la ocupación de agentes)
+    bloquea igual que `obstacles_set`. La meta nunca se considera bloqueada
+    (se puede trazar una ruta hasta un compañero).
+    Si se pasa `stats` (dict) se anota 'expanded'.
+    """
     if start == goal:
+        if stats is not None:
+            stats['expanded'] = 0
         return [start]
+    if occupied is None:
+        occupied = ()
     
     openq = []
     heappush(openq, (heuristic(start, goal), 0, start, None))
@@ -36,6 +65,8 @@ def astar(start, goal, obstacles_set, w, h):
         came[current] = parent
         
         if current == goal:
+            if stats is not None:
+                stats['expanded'] = len(closed)
             path = []
             node = current
             while node:
@@ -53,7 +84,7 @@ def astar(start, goal, obstacles_set, w, h):
             if not (0 <= nx < w and 0 <= ny < h):
                 continue
             
-            if (nx, ny) in obstacles_set:
+            if ((nx, ny) in obstacles_set or (nx, ny) in occupied) and (nx, ny) != goal:
                 continue
             
             ng = g + 1
@@ -62,13 +93,22 @@ def astar(start, goal, obstacles_set, w, h):
                 gscore[(nx, ny)] = ng
                 heappush(openq, (ng + heuristic((nx, ny), goal), ng, (nx, ny), current))
     
+    if stats is not None:
+        stats['expanded'] = len(closed)
     return None
 
 class MultiFieldEnv:
-    def __init__(self, w=60, h=40, n_agents=6, crop_count=200, obst_count=30, parcels=None):
+    def __init__(self, w=60, h=40, n_agents=6, crop_count=200, obst_count=30, parcels=None,
+                 chunked=None, rng=None, fleet=None):
         self.w = w
         self.h = h
-        self.n_agents = n_agents
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # Mapas muy grandes: capas dispersas por bloques en lugar de arrays densos
+        self.chunked = (w * h >= CHUNKED_MIN_CELLS) if chunked is None else bool(chunked)
+        # Flota rol -> cantidad; por defecto se reparten n_agents entre los roles
+        self.fleet = normalize_fleet(fleet) or default_fleet(n_agents)
+        self.agent_roles = fleet_roles(self.fleet)
+        self.n_agents = len(self.agent_roles)
         self.initial_crop_count = crop_count
         self.crop_count = crop_count
         self.obst_count = obst_count
@@ -114,28 +154,80 @@ class MultiFieldEnv:
         self.FUEL_COST_IRRIGATE = 1.5
         self.FUEL_RECHARGE_RATE = 20
         
+        self._build_static_template()
+        self.occupancy = OccupancyGrid()
+        self.crops = CropLifecycle(h, w, chunked=self.chunked)
+        self.MATURITY_STEPS = MATURITY_STEPS
         self.reset()
     
-    def reset(self):
-        self.grid = np.zeros((self.h, self.w), dtype=int) + EMPTY
+    def _build_static_template(self):
+        """
+        Capa estática (bordes de parcela + graneros) y celdas libres para cultivos.
+        Se calcula una sola vez; reset() sólo copia la plantilla y muestrea.
+        """
+        self.grid = self._new_layer(EMPTY, GRID_DTYPE)
         self._create_parcel_borders()
         self._place_barn(self.planter_barn_pos, PLANTER_BARN)
         self._place_barn(self.harvester_barn_pos, HARVESTER_BARN)
         self._place_barn(self.irrigator_barn_pos, IRRIGATOR_BARN)
         self._place_barn(self.manager_pos, MANAGER)
+        self._static_grid = self.grid
+        
+        # Salidas de la flota en anillos alrededor de cada granero (fuera de parcelas)
+        barns = {role: self._get_barn_for_role(role) for role in self.fleet}
+        self.agents_init = fleet_spawn_positions(
+            self.fleet, barns, self.w, self.h,
+            is_blocked=lambda x, y: self._in_parcel_area(x, y)
+        )
+        
+        # Índice plano (y * w + x) de las celdas interiores de parcela libres
+        idx = []
+        for parcel in self.parcels:
+            y0, y1 = max(0, parcel['y_start'] + 1), min(self.h, parcel['y_end'] - 1)
+            x0, x1 = max(0, parcel['x_start'] + 1), min(self.w, parcel['x_end'] - 1)
+            if y1 <= y0 or x1 <= x0:
+                continue
+            ys, xs = np.nonzero(self._static_grid[y0:y1, x0:x1] == EMPTY)
+            idx.append((ys + y0) * self.w + (xs + x0))
+        idx = np.concatenate(idx) if idx else np.zeros(0, dtype=np.int64)
+        _, first = np.unique(idx, return_index=True)
+        self._crop_free_idx = idx[np.sort(first)]
+        # Celdas cultivables (interior de parcela): índice plano y coordenadas
+        self.buildable_idx = self._crop_free_idx
+        self._buildable_ys = self.buildable_idx // self.w
+        self._buildable_xs = self.buildable_idx % self.w
+        
+        self._spawn_idx = np.array([y * self.w + x for x, y in self.agents_init], dtype=np.int64)
+        
+        # Obstáculos: fuera del interior de las parcelas y lejos del borde del mapa.
+        # En mapas densos se guarda el índice; por bloques se muestrea con rechazo.
+        self._obstacle_free_idx = None
+        if not self.chunked:
+            free = np.zeros((self.h, self.w), dtype=bool)
+            free[1:self.h - 1, 1:self.w - 1] = True
+            free &= (self._static_grid == EMPTY)
+            # Sin obstáculos en las salidas de los agentes
+            for x, y in self.agents_init:
+                free[y, x] = False
+            for parcel in self.parcels:
+                free[max(0, parcel['y_start'] + 1):max(0, parcel['y_end'] - 1),
+                     max(0, parcel['x_start'] + 1):max(0, parcel['x_end'] - 1)] = False
+            self._obstacle_free_idx = np.flatnonzero(free)
+    
+    def reset(self):
+        previous = getattr(self, 'grid', None)
+        self.grid = self._static_grid.copy()
+        if self.chunked and previous is not None and previous is not self._static_grid:
+            # Versiones monótonas entre episodios; la época avisa al cliente de que descarte su caché
+            self.grid.version = previous.version
+            self.grid.epoch = previous.epoch + 1
         self._place_crops_in_parcels()
         self._place_obstacles_outside_parcels()
-        self.agents_init = [
-            (4, 4),                    # Plantador
-            (5, 4),                    
-            (self.w - 6, 4),           # Cosechador
-            (self.w - 7, 4),         
-            (4, self.h - 6),           # Irrigador
-            (5, self.h - 6)           
-        ]
-        
-        self.compaction = np.zeros((self.h, self.w), dtype=int)
-        self.water = np.zeros((self.h, self.w), dtype=int)
+        # La flota vuelve a sus salidas; place_agents() si las posiciones difieren
+        self.occupancy.place(self.agents_init)
+        
+        self.compaction = self._new_layer(0, COMPACTION_DTYPE)
+        self.water = self._new_layer(0, WATER_DTYPE)
         self.blackboard = {
             'agents': {},
             'resources': {},
@@ -158,25 +250,34 @@ class MultiFieldEnv:
             'irrigating': self.target_irrigated,
             'harvesting': self.target_harvested
         }
-        
-        return self._get_obs()
+    
+    def _new_layer(self, fill=0, dtype=GRID_DTYPE):
+        return new_layer(self.h, self.w, dtype=dtype, fill=fill, chunked=self.chunked)
     
     def _create_parcel_borders(self):
         for parcel in self.parcels:
             x_start, x_end = parcel['x_start'], parcel['x_end']
             y_start, y_end = parcel['y_start'], parcel['y_end']
+            xs = slice(max(0, x_start), max(0, x_end))
+            ys = slice(max(0, y_start), max(0, y_end))
             
-            for x in range(x_start, x_end):
-                if 0 <= y_start < self.h:
-                    self.grid[y_start, x] = PARCEL_BORDER
-                if 0 <= y_end - 1 < self.h:
-                    self.grid[y_end - 1, x] = PARCEL_BORDER
+            if 0 <= y_start < self.h:
+                self.grid[y_start, xs] = PARCEL_BORDER
+            if 0 <= y_end - 1 < self.h:
+                self.grid[y_end - 1, xs] = PARCEL_BORDER
             
-            for y in range(y_start, y_end):
-                if 0 <= x_start < self.w:
-                    self.grid[y, x_start] = PARCEL_BORDER
-                if 0 <= x_end - 1 < self.w:
-                    self.grid[y, x_end - 1] = PARCEL_BORDER
+            if 0 <= x_start < self.w:
+                self.grid[ys, x_start] = PARCEL_BORDER
+            if 0 <= x_end - 1 < self.w:
+                self.grid[ys, x_end - 1] = PARCEL_BORDER
+    
+    def _in_parcel_area(self, x, y):
+        """Dentro de una parcela incluyendo su borde"""
+        for parcel in self.parcels:
+            if (parcel['x_start'] <= x < parcel['x_end'] and 
+                parcel['y_start'] <= y < parcel['y_end']):
+                return True
+        return False
     
     def _is_inside_parcel(self, x, y):
         for parcel in self.parcels:
@@ -186,40 +287,42 @@ class MultiFieldEnv:
         return False
     
     def _place_crops_in_parcels(self):
-        placed = 0
-        attempts = 0
-        max_attempts = self.initial_crop_count * 20
-        
-        while placed < self.initial_crop_count and attempts < max_attempts:
-            parcel = random.choice(self.parcels)
-            x = random.randrange(parcel['x_start'] + 1, parcel['x_end'] - 1)
-            y = random.randrange(parcel['y_start'] + 1, parcel['y_end'] - 1)
-            
-            if self.grid[y, x] == EMPTY:
-                self.grid[y, x] = CROP
-                placed += 1
-            
-            attempts += 1
-        
-        print(f"✓ Cultivos plantados: {placed}/{self.initial_crop_count}")
+        # Una sola muestra sin reemplazo sobre el índice de celdas libres
+        n = min(self.initial_crop_count, len(self._crop_free_idx))
+        picks = self._crop_free_idx[self.rng.choice(len(self._crop_free_idx), n, replace=False)]
+        self.grid[picks // self.w, picks % self.w] = CROP
+        self.crops.clear()
+        self.crops.add(picks // self.w, picks % self.w)
+        self.placed_crops = int(n)
     
     def _place_obstacles_outside_parcels(self):
-        placed = 0
-        attempts = 0
-        max_attempts = self.obst_count * 10
-        
-        self.obstacles = set()
-        
-        while placed < self.obst_count and attempts < max_attempts:
-            x = random.randrange(1, self.w - 1)
-            y = random.randrange(1, self.h - 1)
-            
-            if not self._is_inside_parcel(x, y) and self.grid[y, x] == EMPTY:
-                self.grid[y, x] = OBST
-                self.obstacles.add((x, y))
-                placed += 1
-            
-            attempts += 1
+        if self._obstacle_free_idx is not None:
+            n = min(self.obst_count, len(self._obstacle_free_idx))
+            picks = self._obstacle_free_idx[self.rng.choice(len(self._obstacle_free_idx), n, replace=False)]
+        else:
+            picks = self._sample_obstacles_by_rejection()
+        ys, xs = picks // self.w, picks % self.w
+        self.grid[ys, xs] = OBST
+        self.obstacles = set(zip(xs.tolist(), ys.tolist()))
+    
+    def _sample_obstacles_by_rejection(self):
+        """Mapas por bloques: muestreo vectorizado con rechazo (sin índice de todo el mapa)"""
+        chosen = np.zeros(0, dtype=np.int64)
+        for _ in range(10):
+            missing = self.obst_count - len(chosen)
+            if missing <= 0 or self.w < 3 or self.h < 3:
+                break
+            xs = self.rng.integers(1, self.w - 1, missing * 2)
+            ys = self.rng.integers(1, self.h - 1, missing * 2)
+            ok = self._static_grid[ys, xs] == EMPTY
+            ok &= ~np.isin(ys * self.w + xs, self._spawn_idx)
+            for parcel in self.parcels:
+                ok &= ~((parcel['x_start'] + 1 <= xs) & (xs < parcel['x_end'] - 1) &
+                        (parcel['y_start'] + 1 <= ys) & (ys < parcel['y_end'] - 1))
+            cand = np.concatenate([chosen, ys[ok] * self.w + xs[ok]])
+            _, first = np.unique(cand, return_index=True)
+            chosen = cand[np.sort(first)][:self.obst_count]
+        return chosen
     
     def _place_barn(self, pos, barn_type):
         x, y = pos
@@ -228,29 +331,41 @@ class MultiFieldEnv:
                 if 0 <= x + dx < self.w and 0 <= y + dy < self.h:
                     self.grid[y + dy, x + dx] = barn_type
     
-    def _get_obs(self):
-        obs = []
-        occ = set(self.obstacles)
-        
-        for i, init_pos in enumerate(self.agents_init):
-            # Determinar rol
-            if i < 2:
-                role = 'planter'
-            elif i < 4:
-                role = 'harvester'
-            else:
-                role = 'irrigator'
-            
-            obs.append({
-                'pos': init_pos,
-                'goal': self._get_smart_goal(init_pos, role),
-                'nearby': occ,
-                'blackboard': self.blackboard,
-                'agent_id': i,
-                'role': role
-            })
-        
-        return obs
+    def observe(self, agents, fresh=False):
+        """
+        Estados compactos de toda la flota (las tuplas de FarmAgent.obs_to_state),
+        leídos del pool sin construir dicts de observación. La meta es la que ya
+        calculó compute_paths (ag.current_goal); con fresh=True (inicio de
+        episodio, aún sin rutas) se elige aquí con la misma regla.
+        """
+        return [tuple(row) for row in self.observe_array(agents, fresh).tolist()]
+    
+    def observe_array(self, agents, fresh=False):
+        """Los mismos estados que observe() como array (N, 7), listo para codificar"""
+        pool, rows = pool_rows(agents)
+        if fresh:
+            returning = pool.should_return_to_barn(rows).tolist()
+            for i, ag in enumerate(agents):
+                ag.current_goal = ag.barn_pos if returning[i] else self._get_smart_goal(ag.pos, ag.role)
+        
+        x, y = pool.x[rows], pool.y[rows]
+        dx = np.clip(pool.goal_x[rows] - x, -8, 8)
+        dy = np.clip(pool.goal_y[rows] - y, -8, 8)
+        
+        # Bit por vecino con obstáculo (las celdas OBST de la capa son self.obstacles)
+        occ = np.zeros(len(agents), dtype=np.int64)
+        for b, (ox, oy) in enumerate(OCC_DIRS):
+            nx, ny = x + ox, y + oy
+            inside = np.flatnonzero((nx >= 0) & (nx < self.w) & (ny >= 0) & (ny < self.h))
+            hit = self.grid[ny[inside], nx[inside]] == OBST
+            occ[inside[hit]] |= 1 << b
+        
+        cap = np.clip((pool.current_capacity[rows] / pool.max_capacity[rows] * 4).astype(np.int64), 0, 4)
+        barn = np.minimum(5, pool.barn_distance(rows) // 10)
+        fuel = np.clip((pool.current_fuel[rows] / pool.max_fuel[rows] * 4).astype(np.int64), 0, 4)
+        returning = pool.is_returning_to_barn[rows].astype(np.int64)
+        
+        return np.column_stack([dx, dy, occ, cap, barn, fuel, returning]).astype(np.int64)
     
     def _get_smart_goal(self, pos, role):
         """
@@ -259,46 +374,63 @@ class MultiFieldEnv:
         """
         if role == 'planter' and self.cycle_phase == 'planting':
             # Buscar tierra vacía dentro de parcelas
-            targets = []
-            for parcel in self.parcels:
-                for y in range(parcel['y_start'] + 1, parcel['y_end'] - 1):
-                    for x in range(parcel['x_start'] + 1, parcel['x_end'] - 1):
-                        if self.grid[y, x] == EMPTY:
-                            targets.append((x, y))
+            regions = [
+                (p['y_start'] + 1, p['y_end'] - 1, p['x_start'] + 1, p['x_end'] - 1)
+                for p in self.parcels
+            ]
+            mask = lambda y0, y1, x0, x1: self.grid[y0:y1, x0:x1] == EMPTY
                             
         elif role == 'irrigator' and self.cycle_phase == 'irrigating':
-            # Buscar cultivos con menos agua (priorizar los que necesitan más)
-            targets = []
-            for y in range(self.h):
-                for x in range(self.w):
-                    if self.grid[y, x] == CROP:
-                        water_level = self.water[y, x]
-                        if water_level < 2: 
-                            priority = 3 - water_level 
-                            for _ in range(priority):
-                                targets.append((x, y))
+            # Buscar cultivos con menos agua
+            regions = [(0, self.h, 0, self.w)]
+            mask = lambda y0, y1, x0, x1: ((self.grid[y0:y1, x0:x1] == CROP) &
+                                           (self.water[y0:y1, x0:x1] < 2))
                       
         elif role == 'harvester' and self.cycle_phase == 'harvesting':
-            targets = []
-            for y in range(self.h):
-                for x in range(self.w):
-                    if self.grid[y, x] == CROP and self.water[y, x] >= 1:
-                        targets.append((x, y))
+            regions = [(0, self.h, 0, self.w)]
+            mask = lambda y0, y1, x0, x1: ((self.grid[y0:y1, x0:x1] == CROP) &
+                                           (self.water[y0:y1, x0:x1] >= 1))
         else:
             return self._get_barn_for_role(role)
         
-        if not targets:
-            return self._get_barn_for_role(role)
-        
-        min_dist = float('inf')
-        nearest = targets[0]
-        for t in targets:
-            dist = heuristic(pos, t)
-            if dist < min_dist:
-                min_dist = dist
-                nearest = t
+        # El primero (en orden de recorrido) entre los más cercanos
+        best = None
+        for region in regions:
+            found = self._nearest_in_region(pos, region, mask)
+            if found is not None and (best is None or found[0] < best[0]):
+                best = found
         
-        return nearest
+        if best is None:
+            return self._get_barn_for_role(role)
+        return best[1]
+    
+    def _nearest_in_region(self, pos, region, mask):
+        """
+        Celda más cercana (Manhattan) a `pos` que cumple `mask` dentro de la región
+        [y0, y1) x [x0, x1). Busca en ventanas crecientes alrededor de `pos`, así el
+        coste depende de la distancia al objetivo y no del área del mapa.
+        Empates: gana la primera celda en orden fila-mayor, igual que un recorrido completo.
+        """
+        y0, y1, x0, x1 = region
+        if y1 <= y0 or x1 <= x0:
+            return None
+        px, py = pos
+        r = 8
+        while True:
+            wy0, wy1 = max(y0, py - r), min(y1, py + r + 1)
+            wx0, wx1 = max(x0, px - r), min(x1, px + r + 1)
+            full = (wy0 == y0 and wy1 == y1 and wx0 == x0 and wx1 == x1)
+            if wy0 < wy1 and wx0 < wx1:
+                ys, xs = np.nonzero(mask(wy0, wy1, wx0, wx1))
+                if ys.size:
+                    dist = np.abs(xs + wx0 - px) + np.abs(ys + wy0 - py)
+                    k = int(np.argmin(dist))
+                    # Fuera de la ventana toda celda está a distancia > r
+                    if dist[k] <= r or full:
+                        return int(dist[k]), (int(xs[k] + wx0), int(ys[k] + wy0))
+            if full:
+                return None
+            r *= 2
     
     def _get_barn_for_role(self, role):
         if role == 'planter':
@@ -342,52 +474,77 @@ class MultiFieldEnv:
             return 100
     
     def _update_blackboard_from_agents(self, agents):
-        for ag in agents:
+        pool, rows = pool_rows(agents)
+        capacity_pct = pool.capacity_percentage(rows).tolist()
+        fuel_pct = pool.fuel_percentage(rows).tolist()
+        returning = pool.is_returning_to_barn[rows].tolist()
+        xs = pool.x[rows].tolist()
+        ys = pool.y[rows].tolist()
+        harvested = pool.harvested[rows].tolist()
+        planted = pool.planted[rows].tolist()
+        irrigated = pool.irrigated[rows].tolist()
+        for i, ag in enumerate(agents):
             self.blackboard['agents'][f'agent_{ag.id}'] = {
-                'pos': tuple(ag.pos),
-                'role': getattr(ag, 'role', None),
-                'harvested': getattr(ag, 'harvested', 0),
-                'planted': getattr(ag, 'planted', 0),
-                'irrigated': getattr(ag, 'irrigated', 0),
-                'capacity_pct': ag.get_capacity_percentage(),
-                'fuel_pct': ag.get_fuel_percentage(),
-                'is_returning': ag.is_returning_to_barn,
-                'is_fuel_low': ag.is_fuel_low()
+                'pos': (xs[i], ys[i]),
+                'role': ag.role,
+                'harvested': harvested[i],
+                'planted': planted[i],
+                'irrigated': irrigated[i],
+                'capacity_pct': capacity_pct[i],
+                'fuel_pct': fuel_pct[i],
+                'is_returning': returning[i],
+                'is_fuel_low': fuel_pct[i] <= 30
             }
     
+    def place_agents(self, agents):
+        """Reconstruye la capa de ocupación desde las posiciones de los agentes"""
+        self.occupancy.place([ag.pos for ag in agents])
+    
+    def resolve_collisions(self, agents, proposals):
+        """Los agentes que reclaman la misma celda se quedan donde están"""
+        crowded = self.occupancy.crowded(proposals)
+        return [agents[i].pos if crowded[i] else p for i, p in enumerate(proposals)]
+    
     def compute_paths(self, agents):
-        obstset = set(self.obstacles)
-        agent_positions = set(ag.pos for ag in agents)
+        if self.occupancy.total != len(agents):
+            self.place_agents(agents)
+        # Obstáculos estáticos + ocupación de agentes; la meta queda libre dentro de astar()
+        blocked = self.obstacles
+        occupied = self.occupancy.cells
+        tracing = TRACER.active
+        
+        # Decisión de volver al granero para toda la flota de una vez
+        pool, rows = pool_rows(agents)
+        returning = pool.should_return_to_barn(rows)
+        pool.is_returning_to_barn[rows] = returning
+        returning = returning.tolist()
         
         for i, ag in enumerate(agents):
             start = ag.pos
+            if tracing:
+                tid = TRACER.agent_tid(ag)
+                t0 = TRACER.now()
             
             # 1. Determinar Objetivo
-            if ag.should_return_to_barn():
+            if returning[i]:
                 goal = ag.barn_pos
-                ag.is_returning_to_barn = True
             else:
                 goal = self._get_smart_goal(start, ag.role)
-                ag.is_returning_to_barn = False
-            
-            # 2. Definir Obstáculos para este agente
-            obstacles_for_this_agent = obstset.copy()
-            for other_ag in agents:
-                if other_ag.id != ag.id:
-                    if other_ag.pos == goal:
-                        continue
-                    obstacles_for_this_agent.add(other_ag.pos)
-            
-            # --- CORRECCIÓN CRÍTICA AQUÍ ---
-            # Si mi meta está ocupada por otro agente (ej. un compañero en el granero),
-            # la quitamos de la lista de obstáculos para que A* no falle.
-            # Esto permite trazar una ruta HASTA el compañero.
-            if goal in obstacles_for_this_agent:
-                obstacles_for_this_agent.remove(goal)
-            # -------------------------------
+            if tracing:
+                TRACER.add('goal_selection', tid, t0, {'goal': list(goal)})
             
             # 3. Calcular Ruta
-            path = astar(start, goal, obstacles_for_this_agent, self.w, self.h)
+            if tracing:
+                t0 = TRACER.now()
+                search = {}
+                path = astar(start, goal, blocked, self.w, self.h, stats=search, occupied=occupied)
+                TRACER.add('pathfinding', tid, t0, {
+                    'nodes_expanded': search.get('expanded', 0),
+                    'path_len': len(path) if path else 0,
+                    'found': path is not None
+                })
+            else:
+                path = astar(start, goal, blocked, self.w, self.h, occupied=occupied)
             
             if path and len(path) > 1:
                 ag.path = path[1:] 
@@ -399,9 +556,11 @@ class MultiFieldEnv:
     def step(self, agents, actions_by_q=None):
         self.step_count += 1
         
-        self._update_blackboard_from_agents(agents)
+        with PROBE.section('update_blackboard'):
+            self._update_blackboard_from_agents(agents)
         self._update_cycle_phase()
-        self.compute_paths(agents)
+        with PROBE.section('compute_paths'):
+            self.compute_paths(agents)
         
         proposals = []
         for i, ag in enumerate(agents):
@@ -414,133 +573,324 @@ class MultiFieldEnv:
         return proposals
     
     def apply_final_positions_and_harvest(self, agents, final_positions):
+        # Flotas pequeñas, o trazas activas (un span por movimiento): bucle por agente
+        if TRACER.active or len(agents) < BATCH_MIN_AGENTS:
+            rewards, infos = self._apply_sequential(agents, final_positions)
+        else:
+            rewards, infos = self._apply_batch(agents, final_positions)
+        
+        self.commit_layers()
+        
+        # CONDICIÓN DE TERMINACIÓN: CICLO COMPLETO
+        done = self.is_task_complete()
+        
+        if done:
+            cycle_bonus = self.REWARD_CYCLE_COMPLETE
+            # Bonus de eficiencia por tiempo (pasos)
+            efficiency_bonus = max(0, 300.0 - (self.step_count / 10))
+            total_bonus = cycle_bonus + efficiency_bonus
+            
+            for i in range(len(rewards)):
+                rewards[i] += total_bonus / len(rewards)
+        
+        return rewards, infos, done
+    
+    def _apply_sequential(self, agents, final_positions):
+        """Versión de referencia: un agente detrás de otro"""
         rewards = [0.0] * len(agents)
         infos = [{} for _ in agents]
         
+        tracing = TRACER.active
         for i, ag in enumerate(agents):
-            newpos = final_positions[i]
-            old_pos = ag.pos
-            moved = (newpos != old_pos)
-            
-            # 1. Consumo de combustible por movimiento
-            if moved:
-                if not ag.consume_fuel(self.FUEL_COST_MOVE):
-                    rewards[i] += self.PENALTY_OUT_OF_FUEL
-                    infos[i]['out_of_fuel'] = True
-                    ag.is_returning_to_barn = True
-                    # Si no tiene gasolina, no se mueve (se queda en old_pos)
-                    continue 
-            
-            # 2. Recompensa por acercarse al objetivo (Shaping)
-            if hasattr(ag, 'current_goal'):
-                old_dist = heuristic(old_pos, ag.current_goal)
-                new_dist = heuristic(newpos, ag.current_goal)
-                
-                if new_dist < old_dist:
-                    rewards[i] += self.REWARD_APPROACH_TARGET
-            
-            # 3. Actualizar posición física
-            ag.pos = newpos
-            x, y = newpos
-            
-            # Actualizar path del agente (borrar el paso que ya dio)
-            if moved and hasattr(ag, 'path') and len(ag.path) > 0:
-                if ag.path[0] == newpos:
-                    ag.path.pop(0)
+            if tracing:
+                t0 = TRACER.now()
+                old_pos = ag.pos
+            rewards[i] = self._apply_agent(ag, final_positions[i], infos[i])
+            if tracing:
+                TRACER.add('movement', TRACER.agent_tid(ag), t0, {
+                    'from': list(old_pos), 'to': list(ag.pos), 'reward': rewards[i]
+                })
+        return rewards, infos
+    
+    def _apply_batch(self, agents, final_positions):
+        """
+        Misma semántica que _apply_sequential, por lotes sobre el AgentPool:
+        combustible, shaping, parking y acciones de fase se calculan con máscaras.
+        Los agentes que trabajan sobre la misma celda (caso raro) se resuelven
+        después uno a uno en orden de índice, como en el bucle original.
+        Las recompensas se suman en el mismo orden para obtener los mismos floats.
+        """
+        n = len(agents)
+        pool, rows = pool_rows(agents)
+        rewards = np.zeros(n)
+        infos = [{} for _ in agents]
+        
+        old_x = pool.x[rows]
+        old_y = pool.y[rows]
+        final = np.asarray(final_positions, dtype=np.int64).reshape(n, 2)
+        moved = (final[:, 0] != old_x) | (final[:, 1] != old_y)
+        
+        # 1. Combustible por movimiento: sin gasolina no se mueve
+        stuck = np.zeros(n, dtype=bool)
+        moving = np.flatnonzero(moved)
+        if moving.size:
+            ok = pool.consume_fuel(rows[moving], self.FUEL_COST_MOVE)
+            stuck[moving[~ok]] = True
+        rewards[stuck] += self.PENALTY_OUT_OF_FUEL
+        pool.is_returning_to_barn[rows[stuck]] = True
+        for i in np.flatnonzero(stuck).tolist():
+            infos[i]['out_of_fuel'] = True
+        active = ~stuck
+        
+        # 2. Shaping hacia el objetivo
+        goal_x, goal_y = pool.goal_x[rows], pool.goal_y[rows]
+        old_dist = np.abs(old_x - goal_x) + np.abs(old_y - goal_y)
+        new_dist = np.abs(final[:, 0] - goal_x) + np.abs(final[:, 1] - goal_y)
+        rewards += np.where(active & (new_dist < old_dist), self.REWARD_APPROACH_TARGET, 0.0)
+        
+        # 3. Posiciones, ocupación y rutas
+        stepping = np.flatnonzero(moved & active)
+        pool.x[rows[stepping]] = final[stepping, 0]
+        pool.y[rows[stepping]] = final[stepping, 1]
+        for i in stepping.tolist():
+            newpos = (int(final[i, 0]), int(final[i, 1]))
+            self.occupancy.move((int(old_x[i]), int(old_y[i])), newpos)
+            path = agents[i].path
+            if path and path[0] == newpos:
+                path.pop(0)
+        
+        rewards += np.where(active, self.PENALTY_STEP, 0.0)
+        xs = np.where(active, final[:, 0], old_x)
+        ys = np.where(active, final[:, 1], old_y)
+        
+        # Zona de parking: recarga/descarga y nada más
+        dist_to_barn = np.abs(xs - pool.barn_x[rows]) + np.abs(ys - pool.barn_y[rows])
+        parking = active & (pool.is_at_barn(rows) |
+                            ((dist_to_barn <= 2) & pool.is_returning_to_barn[rows]))
+        parked = np.flatnonzero(parking)
+        if parked.size:
+            at_barn, _ = pool.recharge_at_barn(rows[parked], self.FUEL_RECHARGE_RATE)
+            recharged = parked[at_barn]
+            rewards[recharged] += 15.0
+            efficient = recharged[pool.efficiency_score(rows[recharged]) > 80]
+            rewards[efficient] += self.REWARD_FUEL_EFFICIENT
+            for i in recharged.tolist():
+                infos[i]['recharged'] = True
+        
+        # Acciones de fase; las celdas con varios trabajadores van en serie
+        working = np.flatnonzero(active & ~parking)
+        if working.size:
+            cells = ys[working] * self.w + xs[working]
+            _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+            shared = counts[inverse] > 1
+            self._apply_phase_batch(agents, pool, rows, working[~shared],
+                                    xs, ys, rewards, infos)
+            for i in working[shared].tolist():
+                rewards[i] = self._apply_phase_action(agents[i], int(xs[i]), int(ys[i]),
+                                                      float(rewards[i]), infos[i])
+        
+        return rewards.tolist(), infos
+    
+    def _apply_phase_batch(self, agents, pool, rows, idx, xs, ys, rewards, infos):
+        """_apply_phase_action para los agentes `idx`, todos en celdas distintas"""
+        if idx.size == 0:
+            return
+        r = rows[idx]
+        x = xs[idx]
+        y = ys[idx]
+        role = pool.role_code[r]
+        cell = self.grid[y, x]
+        phase = self.cycle_phase
+        
+        if phase == 'planting':
+            inside = np.zeros(idx.size, dtype=bool)
+            for parcel in self.parcels:
+                inside |= ((parcel['x_start'] + 1 <= x) & (x < parcel['x_end'] - 1) &
+                           (parcel['y_start'] + 1 <= y) & (y < parcel['y_end'] - 1))
+            workers = (role == ROLE_CODES['planter']) & (cell == EMPTY) & inside
+            bystanders = role != ROLE_CODES['planter']
+            fuel_cost, reward, counter, key = self.FUEL_COST_PLANT, self.REWARD_PLANT, 'planted', 'planted'
+        elif phase == 'irrigating':
+            workers = (role == ROLE_CODES['irrigator']) & (cell == CROP)
+            bystanders = role != ROLE_CODES['irrigator']
+            fuel_cost, reward, counter, key = self.FUEL_COST_IRRIGATE, self.REWARD_IRRIGATE, 'irrigated', 'irrigated'
+        elif phase == 'harvesting':
+            on_crop = (role == ROLE_CODES['harvester']) & (cell == CROP)
+            water = self.water[y, x]
+            # Penalización por cosechar seco
+            rewards[idx[on_crop & (water < 1)]] += self.PENALTY_FAIL
+            workers = on_crop & (water >= 1)
+            bystanders = role != ROLE_CODES['harvester']
+            fuel_cost, reward, counter, key = self.FUEL_COST_HARVEST, self.REWARD_HARVEST, 'harvested', 'harvested'
+        else:
+            workers = bystanders = np.zeros(idx.size, dtype=bool)
+        
+        w = np.flatnonzero(workers)
+        if w.size:
+            # use_capacity y después consume_fuel, sólo si hubo capacidad
+            cap_ok = pool.use_capacity(r[w])
+            fuel_ok = np.zeros(w.size, dtype=bool)
+            fuel_ok[cap_ok] = pool.consume_fuel(r[w][cap_ok], fuel_cost)
+            done = w[fuel_ok]
+            failed = w[~fuel_ok]
+            dx, dy = x[done], y[done]
             
-            rewards[i] += self.PENALTY_STEP
+            if phase == 'planting':
+                self.grid[dy, dx] = CROP
+                self.crops.add(dy, dx)
+                self.planted_total += int(done.size)
+            elif phase == 'irrigating':
+                # Contador saturado: no desbordar el uint8
+                level = self.water[dy, dx].astype(np.int64)
+                self.water[dy, dx] = np.minimum(level + 1, WATER_MAX)
+                self.irrigated_total += int(done.size)
+            else:
+                wet = self.water[dy, dx] >= 2
+                self.grid[dy, dx] = PATH
+                self.crops.remove(dy, dx)
+                self.harvested_total += int(done.size)
             
-            # --- 🔥 MODIFICACIÓN: ZONA DE PARKING AMPLIADA 🔥 ---
-            # Calculamos distancia Manhattan al granero
-            dist_to_barn = abs(x - ag.barn_pos[0]) + abs(y - ag.barn_pos[1])
+            getattr(pool, counter)[r[done]] += 1
+            rewards[idx[done]] += reward
+            if phase == 'harvesting':
+                # Bonus por cultivo bien regado
+                rewards[idx[done[wet]]] += 10.0
+            for i in idx[done].tolist():
+                infos[i][key] = True
+                agents[i].path = []
+            pool.is_returning_to_barn[r[failed]] = True
+        
+        # Pequeña recompensa por existir para los roles fuera de su fase
+        rewards[idx[bystanders]] += 0.5
+        
+        # Chequeo general de retorno (por si se gastó fuel en esta acción)
+        back = pool.should_return_to_barn(r)
+        pool.is_returning_to_barn[r[back]] = True
+        for i in idx[back].tolist():
+            agents[i].path = []
+    
+    def _apply_agent(self, ag, newpos, info):
+        """Aplica el movimiento final y la acción de fase de un agente; devuelve su recompensa"""
+        reward = 0.0
+        old_pos = ag.pos
+        moved = (newpos != old_pos)
+        
+        # 1. Consumo de combustible por movimiento
+        if moved:
+            if not ag.consume_fuel(self.FUEL_COST_MOVE):
+                reward += self.PENALTY_OUT_OF_FUEL
+                info['out_of_fuel'] = True
+                ag.is_returning_to_barn = True
+                # Si no tiene gasolina, no se mueve (se queda en old_pos)
+                return reward
+        
+        # 2. Recompensa por acercarse al objetivo (Shaping)
+        if hasattr(ag, 'current_goal'):
+            old_dist = heuristic(old_pos, ag.current_goal)
+            new_dist = heuristic(newpos, ag.current_goal)
             
-            # Condición relajada: Si está en el centro O cerca (<= 2) y quiere volver
-            in_parking_zone = ag.is_at_barn() or (dist_to_barn <= 2 and ag.is_returning_to_barn)
+            if new_dist < old_dist:
+                reward += self.REWARD_APPROACH_TARGET
+        
+        # 3. Actualizar posición física
+        ag.pos = newpos
+        self.occupancy.move(old_pos, newpos)
+        x, y = newpos
+        
+        # Actualizar path del agente (borrar el paso que ya dio)
+        if moved and hasattr(ag, 'path') and len(ag.path) > 0:
+            if ag.path[0] == newpos:
+                ag.path.pop(0)
+        
+        reward += self.PENALTY_STEP
+        
+        # --- 🔥 MODIFICACIÓN: ZONA DE PARKING AMPLIADA 🔥 ---
+        # Calculamos distancia Manhattan al granero
+        dist_to_barn = abs(x - ag.barn_pos[0]) + abs(y - ag.barn_pos[1])
+        
+        # Condición relajada: Si está en el centro O cerca (<= 2) y quiere volver
+        in_parking_zone = ag.is_at_barn() or (dist_to_barn <= 2 and ag.is_returning_to_barn)
 
-            if in_parking_zone:
-                # Intentar recargar/descargar
-                # Nota: recharge_at_barn devuelve True si terminó o está en proceso
-                if ag.recharge_at_barn(self.FUEL_RECHARGE_RATE):
-                    rewards[i] += 15.0
-                    if ag.calculate_efficiency_score() > 80:
-                        rewards[i] += self.REWARD_FUEL_EFFICIENT
-                    infos[i]['recharged'] = True
-                
-                # Si está en zona de parking, no hace nada más (no cosecha ni riega)
-                continue
-            # -------------------------------------------------------
+        if in_parking_zone:
+            # Intentar recargar/descargar
+            # Nota: recharge_at_barn devuelve True si terminó o está en proceso
+            if ag.recharge_at_barn(self.FUEL_RECHARGE_RATE):
+                reward += 15.0
+                if ag.calculate_efficiency_score() > 80:
+                    reward += self.REWARD_FUEL_EFFICIENT
+                info['recharged'] = True
+            
+            # Si está en zona de parking, no hace nada más (no cosecha ni riega)
+            return reward
+        # -------------------------------------------------------
 
-            # FASE 1: SOLO PLANTADORES
-            if self.cycle_phase == 'planting':
-                if ag.role == 'planter' and self.grid[y, x] == EMPTY and self._is_inside_parcel(x, y):
-                    if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_PLANT):
-                        self.grid[y, x] = CROP
-                        ag.planted += 1
-                        self.planted_total += 1
-                        rewards[i] += self.REWARD_PLANT
-                        infos[i]['planted'] = True
-                        ag.path = [] # Limpiar ruta para buscar nuevo objetivo cercano
-                    else:
-                        ag.is_returning_to_barn = True
-                
-                elif ag.role != 'planter':
-                    rewards[i] += 0.5 # Pequeña recompensa por existir (evitar suicidio)
+        return self._apply_phase_action(ag, x, y, reward, info)
+    
+    def _apply_phase_action(self, ag, x, y, reward, info):
+        """Acción de la fase actual sobre la celda (x, y), fuera de la zona de parking"""
+        # FASE 1: SOLO PLANTADORES
+        if self.cycle_phase == 'planting':
+            if ag.role == 'planter' and self.grid[y, x] == EMPTY and self._is_inside_parcel(x, y):
+                if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_PLANT):
+                    self.grid[y, x] = CROP
+                    self.crops.add(y, x)
+                    ag.planted += 1
+                    self.planted_total += 1
+                    reward += self.REWARD_PLANT
+                    info['planted'] = True
+                    ag.path = [] # Limpiar ruta para buscar nuevo objetivo cercano
+                else:
+                    ag.is_returning_to_barn = True
             
-            # FASE 2: SOLO IRRIGADORES
-            elif self.cycle_phase == 'irrigating':
-                if ag.role == 'irrigator' and self.grid[y, x] == CROP:
-                    if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_IRRIGATE):
+            elif ag.role != 'planter':
+                reward += 0.5 # Pequeña recompensa por existir (evitar suicidio)
+        
+        # FASE 2: SOLO IRRIGADORES
+        elif self.cycle_phase == 'irrigating':
+            if ag.role == 'irrigator' and self.grid[y, x] == CROP:
+                if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_IRRIGATE):
+                    # Contador saturado: no desbordar el uint8
+                    if self.water[y, x] < WATER_MAX:
                         self.water[y, x] += 1
-                        ag.irrigated += 1
-                        self.irrigated_total += 1
-                        rewards[i] += self.REWARD_IRRIGATE
-                        infos[i]['irrigated'] = True
+                    ag.irrigated += 1
+                    self.irrigated_total += 1
+                    reward += self.REWARD_IRRIGATE
+                    info['irrigated'] = True
+                    ag.path = []
+                else:
+                    ag.is_returning_to_barn = True
+            
+            elif ag.role != 'irrigator':
+                reward += 0.5
+        
+        # FASE 3: SOLO COSECHADORES
+        elif self.cycle_phase == 'harvesting':
+            if ag.role == 'harvester' and self.grid[y, x] == CROP:
+                # Solo cosechar si está regado (opcional, según tu regla)
+                if self.water[y, x] >= 1:
+                    if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_HARVEST):
+                        self.grid[y, x] = PATH # O EMPTY
+                        self.crops.remove(y, x)
+                        ag.harvested += 1
+                        self.harvested_total += 1
+                        reward += self.REWARD_HARVEST
+                        if self.water[y, x] >= 2:
+                            reward += 10.0 # Bonus por cultivo bien regado
+                        info['harvested'] = True
                         ag.path = []
                     else:
                         ag.is_returning_to_barn = True
-                
-                elif ag.role != 'irrigator':
-                    rewards[i] += 0.5
-            
-            # FASE 3: SOLO COSECHADORES
-            elif self.cycle_phase == 'harvesting':
-                if ag.role == 'harvester' and self.grid[y, x] == CROP:
-                    # Solo cosechar si está regado (opcional, según tu regla)
-                    if self.water[y, x] >= 1:
-                        if ag.use_capacity(1) and ag.consume_fuel(self.FUEL_COST_HARVEST):
-                            self.grid[y, x] = PATH # O EMPTY
-                            ag.harvested += 1
-                            self.harvested_total += 1
-                            rewards[i] += self.REWARD_HARVEST
-                            if self.water[y, x] >= 2:
-                                rewards[i] += 10.0 # Bonus por cultivo bien regado
-                            infos[i]['harvested'] = True
-                            ag.path = []
-                        else:
-                            ag.is_returning_to_barn = True
-                    else:
-                        rewards[i] += self.PENALTY_FAIL # Penalización por cosechar seco
-                elif ag.role != 'harvester':
-                    rewards[i] += 0.5
-            
-            # Chequeo general de retorno (por si se gastó fuel en esta acción)
-            if ag.should_return_to_barn() and not in_parking_zone:
-                ag.is_returning_to_barn = True
-                ag.path = [] 
+                else:
+                    reward += self.PENALTY_FAIL # Penalización por cosechar seco
+            elif ag.role != 'harvester':
+                reward += 0.5
         
-        # CONDICIÓN DE TERMINACIÓN: CICLO COMPLETO
-        done = self.is_task_complete()
-        
-        if done:
-            cycle_bonus = self.REWARD_CYCLE_COMPLETE
-            # Bonus de eficiencia por tiempo (pasos)
-            efficiency_bonus = max(0, 300.0 - (self.step_count / 10))
-            total_bonus = cycle_bonus + efficiency_bonus
-            
-            for i in range(len(rewards)):
-                rewards[i] += total_bonus / len(rewards)
+        # Chequeo general de retorno (por si se gastó fuel en esta acción)
+        if ag.should_return_to_barn():
+            ag.is_returning_to_barn = True
+            ag.path = []
         
-        return rewards, infos, done
+        return reward
     
     def is_task_complete(self):
         return (
@@ -557,7 +907,7 @@ class MultiFieldEnv:
             'planted': int(self.planted_total),
             'irrigated': int(self.irrigated_total),
             'harvested': int(self.harvested_total),
-            'remaining_crops': int(np.sum(self.grid == CROP)),
+            'remaining_crops': int(count_equal(self.grid, CROP)),
             'progress': {
                 'planted': f"{self.planted_total}/{self.target_planted}",
                 'irrigated': f"{self.irrigated_total}/{self.target_irrigated}",
@@ -580,9 +930,68 @@ class MultiFieldEnv:
         
         return int((planted_pct + irrigated_pct + harvested_pct) / 3)
     
+    @property
+    def buildable_count(self):
+        return len(self.buildable_idx)
+    
+    @property
+    def buildable_mask(self):
+        """Máscara densa [y, x] de celdas cultivables (copia para consultas/depuración)"""
+        mask = np.zeros((self.h, self.w), dtype=bool)
+        mask[self._buildable_ys, self._buildable_xs] = True
+        return mask
+    
+    @property
+    def active_crops(self):
+        """Cultivos en pie (sólo hay cultivos en celdas cultivables); O(1)"""
+        return len(self.crops)
+    
+    @property
+    def mature_crops(self):
+        """Cultivos en pie ya maduros; O(1)"""
+        return self.crops.mature
+    
+    def clear_buildable(self):
+        """Vacía de golpe todas las celdas cultivables (cultivo, agua y compactación)"""
+        ys, xs = self._buildable_ys, self._buildable_xs
+        self.grid[ys, xs] = EMPTY
+        self.water[ys, xs] = 0
+        self.compaction[ys, xs] = 0
+        self.crops.clear()
+    
+    @property
+    def crop_age(self):
+        """Capa [y, x] con la edad (ticks) de cada cultivo activo (copia; por bloques si el mapa lo es)"""
+        return self.crops.age_layer()
+    
     def update_crops(self):
-        for y in range(self.h):
-            for x in range(self.w):
-                if self.grid[y, x] == 2:  # CROP
-                # Lógica de crecimiento
-                    pass
\ No newline at end of file
+        """
+        Avanza un tick el ciclo de vida (edad, evaporación, madurez, marchitez)
+        sobre el índice de cultivos activos; devuelve cuántos cultivos quedan.
+        """
+        self.crops.advance(self.grid, self.water, EMPTY)
+        return len(self.crops)
+    
+    def commit_layers(self):
+        """Cierra el tick de las capas por bloques (marca versiones de bloques sucios)"""
+        if self.chunked:
+            for layer in (self.grid, self.water, self.compaction):
+                layer.commit()
+    
+    def serialize_grid(self, since=None, encoding='list'):
+        """
+        Grid para JSON: lista de filas (denso) o sólo bloques activos/cambiados (por bloques).
+        encoding='b64' envía los bytes uint8 en base64 sin pasar por enteros de Python.
+        """
+        if self.chunked:
+            self.grid.commit()
+        return serialize_layer(self.grid, since=since, encoding=encoding)
+    
+    def layer_nbytes(self):
+        """Memoria ocupada por las capas del entorno"""
+        return {
+            'grid': int(self.grid.nbytes),
+            'water': int(self.water.nbytes),
+            'compaction': int(self.compaction.nbytes),
+            'crops': self.crops.nbytes
+        }
@@ -0,0 +1,91 @@
+# backend/app/fleet.py
+from collections import OrderedDict, deque
+
+ROLE_ORDER = ['planter', 'harvester', 'irrigator']
+
+# Celda de arranque respecto al granero y orden de expansión por rol.
+# Con 2 agentes por rol reproduce las posiciones clásicas de AGENT_START_POSITIONS.
+ROLE_SPAWN = {
+    'planter': {'offset': (1, 1), 'dirs': [(1, 0), (0, 1), (-1, 0), (0, -1)]},
+    'harvester': {'offset': (-1, 1), 'dirs': [(-1, 0), (0, 1), (1, 0), (0, -1)]},
+    'irrigator': {'offset': (1, -1), 'dirs': [(1, 0), (0, -1), (-1, 0), (0, 1)]},
+}
+
+DEFAULT_FLEET_SPEC = "planter:2,harvester:2,irrigator:2"
+
+
+def parse_fleet(spec):
+    """'planter:2,harvester:2,irrigator:2' -> OrderedDict(rol -> cantidad)"""
+    fleet = OrderedDict()
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        role, _, count = item.partition(':')
+        role = role.strip()
+        if role not in ROLE_SPAWN:
+            raise ValueError(f"Rol desconocido en la flota: {role}")
+        fleet[role] = fleet.get(role, 0) + int(count or 1)
+    return fleet
+
+
+def default_fleet(n_agents):
+    """Reparte n agentes entre los roles (el resto va a los primeros roles)"""
+    base, extra = divmod(max(0, int(n_agents)), len(ROLE_ORDER))
+    return OrderedDict(
+        (role, base + (1 if i < extra else 0)) for i, role in enumerate(ROLE_ORDER)
+    )
+
+
+def normalize_fleet(fleet):
+    if fleet is None:
+        return None
+    if isinstance(fleet, str):
+        return parse_fleet(fleet)
+    return OrderedDict((role, int(fleet[role])) for role in ROLE_ORDER if role in fleet)
+
+
+def fleet_roles(fleet):
+    """Lista de roles por índice de agente, agrupados por rol"""
+    roles = []
+    for role, count in fleet.items():
+        roles.extend([role] * count)
+    return roles
+
+
+def spawn_positions(role, barn_pos, count, w, h, is_blocked=None, taken=None):
+    """
+    Genera `count` posiciones de salida alrededor del granero del rol, en anillos
+    crecientes (BFS) desde la celda de arranque. Se saltan celdas fuera del mapa,
+    bloqueadas (is_blocked(x, y)) o ya ocupadas (`taken`).
+    """
+    spec = ROLE_SPAWN[role]
+    taken = taken if taken is not None else set()
+    start = (barn_pos[0] + spec['offset'][0], barn_pos[1] + spec['offset'][1])
+    start = (min(max(0, start[0]), w - 1), min(max(0, start[1]), h - 1))
+
+    positions = []
+    queue = deque([start])
+    seen = {start}
+    while queue and len(positions) < count:
+        x, y = queue.popleft()
+        if (x, y) not in taken and not (is_blocked and is_blocked(x, y)):
+            positions.append((x, y))
+            taken.add((x, y))
+        for dx, dy in spec['dirs']:
+            nb = (x + dx, y + dy)
+            if nb not in seen and 0 <= nb[0] < w and 0 <= nb[1] < h:
+                seen.add(nb)
+                queue.append(nb)
+    if len(positions) < count:
+        raise ValueError(f"No hay sitio para {count} agentes '{role}' en un mapa {w}x{h}")
+    return positions
+
+
+def fleet_spawn_positions(fleet, barns, w, h, is_blocked=None):
+    """Posiciones de salida de toda la flota, en el mismo orden que fleet_roles()"""
+    taken = set()
+    positions = []
+    for role, count in fleet.items():
+        positions.extend(spawn_positions(role, barns[role], count, w, h, is_blocked, taken))
+    return positions
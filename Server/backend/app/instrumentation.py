@@ -0,0 +1,166 @@
+# backend/app/instrumentation.py
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Límites de los buckets en segundos (desde 10µs hasta 5s)
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+
+SECTION_METRIC = 'farm_section_duration_seconds'
+REQUEST_METRIC = 'farm_http_request_duration_seconds'
+
+METRIC_HELP = {
+    SECTION_METRIC: 'Duración de las secciones del bucle de simulación/entrenamiento',
+    REQUEST_METRIC: 'Latencia de las peticiones HTTP por endpoint'
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _NullTimer:
+    """Temporizador vacío: lo que cuesta la instrumentación desactivada"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('probe', 'metric', 'labels', 't0')
+
+    def __init__(self, probe, metric, labels):
+        self.probe = probe
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.probe.observe(self.metric, self.labels, time.perf_counter() - self.t0)
+        return False
+
+
+class Instrumentation:
+    """
+    Acumula histogramas de duración por sección y por endpoint.
+    Se puede activar/desactivar en caliente; desactivada, section() devuelve
+    un temporizador vacío compartido.
+    """
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def section(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, SECTION_METRIC, (('section', name),))
+
+    def observe(self, metric, labels, seconds):
+        key = (metric, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def observe_request(self, method, path, status, seconds):
+        if self.enabled:
+            labels = (('method', method), ('path', path), ('status', str(status)))
+            self.observe(REQUEST_METRIC, labels, seconds)
+
+    def snapshot(self):
+        """Copia consistente de los histogramas: {(metric, labels): (counts, sum, count)}"""
+        with self._lock:
+            return {
+                key: (list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items()
+            }
+
+    def render_prometheus(self, extra=()):
+        """
+        Formato de exposición de texto de Prometheus (0.0.4). `extra` son
+        instantáneas de otros procesos (motor, trabajos) que se suman a éstas.
+        """
+        lines = [
+            '# HELP farm_instrumentation_enabled 1 si la instrumentación está activa',
+            '# TYPE farm_instrumentation_enabled gauge',
+            f'farm_instrumentation_enabled {1 if self.enabled else 0}'
+        ]
+        snap = merge_snapshots(self.snapshot(), *extra)
+        for metric in sorted({m for m, _ in snap}):
+            lines.append(f'# HELP {metric} {METRIC_HELP.get(metric, metric)}')
+            lines.append(f'# TYPE {metric} histogram')
+            for (m, labels), (counts, total, count) in sorted(snap.items()):
+                if m != metric:
+                    continue
+                cumulative = 0
+                for bound, c in zip(self.buckets, counts):
+                    cumulative += c
+                    le = _labels(labels + (('le', f'{bound:g}'),))
+                    lines.append(f'{metric}_bucket{le} {cumulative}')
+                lines.append(f'{metric}_bucket{_labels(labels + (("le", "+Inf"),))} {count}')
+                lines.append(f'{metric}_sum{_labels(labels)} {total:.9f}')
+                lines.append(f'{metric}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def merge_snapshots(*snapshots):
+    """Suma instantáneas de snapshot() (mismos buckets) serie a serie"""
+    merged = {}
+    for snap in snapshots:
+        for key, (counts, total, count) in snap.items():
+            if key in merged:
+                prev_counts, prev_total, prev_count = merged[key]
+                counts = [a + b for a, b in zip(prev_counts, counts)]
+                total += prev_total
+                count += prev_count
+            merged[key] = (list(counts), total, count)
+    return merged
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+PROBE = Instrumentation(enabled=os.getenv('INSTRUMENTATION', '0') == '1')
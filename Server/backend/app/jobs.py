@@ -0,0 +1,447 @@
+# backend/app/jobs.py
+import contextlib
+import io
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import JOB_WORKERS, JOBS_DIR, JOB_PROMOTE, QTABLE_PATH, STATS_PATH
+from .instrumentation import PROBE
+from .tracing import TRACER
+from .profiler import profile_thread
+
+# Cada cuántos segundos atiende un trabajo las órdenes de la API (métricas, trazas, perfilado)
+CONTROL_INTERVAL = 0.5
+
+
+def _control_loop(job_id, control, events, thread, finished):
+    """
+    Hilo de control de un trabajo: aplica las órdenes de la API que llegan por
+    `control` (instrumentación, trazas, perfilado del hilo que entrena) y
+    devuelve por `events` los histogramas, el estado de la traza y los perfiles.
+    PROBE y TRACER son de cada proceso: sin esto la API no vería el entrenamiento.
+    """
+    seen = {'reset': None, 'trace': None, 'profile': None}
+    sent_trace = None
+    was_enabled = False
+    while True:
+        last = finished.is_set()
+        enabled, reset_gen = control.get('probe', (False, 0))
+        PROBE.set_enabled(enabled)
+        if seen['reset'] is not None and reset_gen != seen['reset']:
+            PROBE.reset()
+        seen['reset'] = reset_gen
+
+        trace = control.get(('trace', job_id))
+        if trace is not None and trace[0] != seen['trace']:
+            seen['trace'] = trace[0]
+            if trace[1] > 0:
+                TRACER.start(trace[1])
+            else:
+                TRACER.stop()
+        if last and TRACER.active:
+            TRACER.stop()
+        trace_status = TRACER.status()
+        if seen['trace'] is not None and trace_status != sent_trace:
+            events.put(('trace', job_id, trace_status))
+            sent_trace = trace_status
+
+        profile = control.get(('profile', job_id))
+        if profile is not None and profile[0] != seen['profile']:
+            req_id, seconds, interval, top = profile
+            seen['profile'] = req_id
+            result = profile_thread(thread, 0 if last else seconds, interval, top)
+            events.put(('profile', job_id, (req_id, result)))
+
+        if enabled or was_enabled:
+            events.put(('probe', job_id, PROBE.snapshot()))
+        was_enabled = enabled
+        if last:
+            return
+        finished.wait(CONTROL_INTERVAL)
+
+
+def run_job(job_id, params, episodes, steps_per_episode, seed, out_dir, events, stop_flags, control):
+    """
+    Un trabajo de entrenamiento en un proceso del pool: su propio entorno,
+    agentes y carpeta de salida. Avisa del arranque, de cada episodio y del
+    final ('done' o 'failed') por `events`, en ese orden; se cancela al
+    marcarlo en `stop_flags` (al cerrar el episodio).
+    """
+    from .sim_manager import SimManager
+
+    events.put(('started', job_id, {'pid': os.getpid(), 'time': time.time()}))
+    # El proceso del pool se reutiliza: los histogramas son sólo de este trabajo
+    PROBE.reset()
+    finished = threading.Event()
+    controller = threading.Thread(target=_control_loop, daemon=True,
+                                  args=(job_id, control, events, threading.current_thread(), finished))
+    controller.start()
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim = SimManager(seed=seed)
+            sim.QTABLE_PATH = os.path.join(out_dir, 'trained_qtables.pkl')
+            sim.STATS_PATH = os.path.join(out_dir, 'train_stats.json')
+            sim.update_params(params)
+
+            def on_episode(episode_data):
+                events.put(('episode', job_id, episode_data))
+                return not stop_flags.get(job_id, False)
+
+            sim.train_background(episodes=episodes, steps_per_episode=steps_per_episode,
+                                 on_episode=on_episode)
+    except Exception as e:
+        events.put(('failed', job_id, {'error': repr(e)}))
+        raise
+    finally:
+        # Los últimos histogramas y trazas salen antes del aviso final
+        finished.set()
+        controller.join()
+    result = {'episodes': len(sim.train_stats['episodes']),
+              'best_reward': float(sim.train_stats['best_reward']),
+              'stop_reason': sim.train_stats['stop_reason'],
+              'convergence': sim.train_stats['convergence']}
+    events.put(('done', job_id, result))
+    return result
+
+
+class Job:
+    """Un entrenamiento encolado: parámetros, estado, progreso y rutas de salida"""
+
+    def __init__(self, params, episodes, steps_per_episode, seed=None, jobs_dir=JOBS_DIR):
+        self.id = uuid.uuid4().hex[:8]
+        self.params = params
+        self.episodes = episodes
+        self.steps_per_episode = steps_per_episode
+        self.seed = seed
+        self.out_dir = os.path.join(jobs_dir, self.id)
+        self.status = 'queued'
+        self.error = None
+        self.pid = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.episodes_done = 0
+        self.steps_done = 0
+        self.last_reward = None
+        self.best_reward = None
+        self.last_episode = {}
+        self.stop_reason = None
+        self.convergence = None
+        self.promoted = False
+        self.episode_log = []
+        self.best_episode = 0
+        self.probe = None
+        self.trace = None
+        self.future = None
+
+    @property
+    def qtable_path(self):
+        return os.path.join(self.out_dir, 'trained_qtables.pkl')
+
+    @property
+    def stats_path(self):
+        return os.path.join(self.out_dir, 'train_stats.json')
+
+    def record(self, episode_data):
+        self.episodes_done = int(episode_data['episode'])
+        self.steps_done += int(episode_data['steps'])
+        self.last_reward = float(episode_data['reward'])
+        if self.best_reward is None or self.last_reward > self.best_reward:
+            self.best_reward = self.last_reward
+            self.best_episode = self.episodes_done
+        self.last_episode = episode_data
+        self.episode_log.append(episode_data)
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running', 'cancelling')
+
+    def train_stats(self):
+        """Lo mismo que SimManager.get_train_stats, con los episodios recibidos del proceso"""
+        return {
+            'episodes': list(self.episode_log),
+            'best_reward': self.best_reward if self.best_reward is not None else float('-inf'),
+            'best_episode': self.best_episode,
+            'fuel_efficiency': [],
+            'time_savings': [],
+            'stop_reason': self.stop_reason,
+            'convergence': self.convergence
+        }
+
+    def summary(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        eps_per_sec = self.episodes_done / elapsed if elapsed > 0 else 0.0
+        remaining = self.episodes - self.episodes_done
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'params': self.params,
+            'seed': self.seed,
+            'episodes': self.episodes,
+            'steps_per_episode': self.steps_per_episode,
+            'episodes_done': self.episodes_done,
+            'progress_pct': round(self.episodes_done / max(1, self.episodes) * 100, 1),
+            'steps_done': self.steps_done,
+            'elapsed_sec': round(elapsed, 2),
+            'steps_per_sec': round(self.steps_done / elapsed, 1) if elapsed > 0 else 0.0,
+            'episodes_per_sec': round(eps_per_sec, 3),
+            'eta_sec': round(remaining / eps_per_sec, 1) if self.status == 'running' and eps_per_sec > 0 else None,
+            'last_reward': self.last_reward,
+            'best_reward': self.best_reward,
+            'task_complete': bool(self.last_episode.get('task_complete', False)),
+            'qtable_path': self.qtable_path,
+            'stats_path': self.stats_path,
+            'pid': self.pid,
+            'stop_reason': self.stop_reason,
+            'convergence': self.convergence,
+            'promoted': self.promoted,
+            'error': self.error
+        }
+
+
+class JobQueue:
+    """
+    Cola de trabajos de entrenamiento sobre un pool de `workers` procesos: los
+    trabajos esperan en 'queued' hasta que queda un proceso libre. Un hilo
+    recoge los avisos de los procesos (arranque, episodios, final) y cierra
+    cada trabajo con su aviso final. Con `promote`, las Q-tables del trabajo
+    completado más reciente se copian a `qtable_path` (el modelo actual) y se
+    llama a `on_promote(job)`.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, jobs_dir=JOBS_DIR, promote=JOB_PROMOTE,
+                 qtable_path=QTABLE_PATH, stats_path=STATS_PATH, on_promote=None):
+        self.workers = max(1, workers)
+        self.jobs_dir = jobs_dir
+        self.promote = promote
+        self.qtable_path = qtable_path
+        self.stats_path = stats_path
+        self.on_promote = on_promote
+        self.promoted = None
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.pool = None
+        self.manager = None
+        self.events = None
+        self.stop_flags = None
+        self.control = None
+        self.thread = None
+        self._profiles = {}
+        self._trace_gen = 0
+        self._probe_reset = 0
+
+    def _ensure_started(self):
+        if self.pool is not None:
+            return
+        # spawn: los procesos no heredan los hilos del servidor
+        ctx = mp.get_context('spawn')
+        self.manager = ctx.Manager()
+        self.events = self.manager.Queue()
+        self.stop_flags = self.manager.dict()
+        self.control = self.manager.dict()
+        self.control['probe'] = (PROBE.enabled, self._probe_reset)
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=ctx)
+        self.thread = threading.Thread(target=self._collect, daemon=True)
+        self.thread.start()
+
+    def submit(self, params, episodes, steps_per_episode, seed=None):
+        with self.lock:
+            self._ensure_started()
+            job = Job(params, episodes, steps_per_episode, seed, self.jobs_dir)
+            self.jobs[job.id] = job
+            job.future = self.pool.submit(run_job, job.id, params, episodes, steps_per_episode,
+                                          seed, job.out_dir, self.events, self.stop_flags,
+                                          self.control)
+            job.future.add_done_callback(lambda f, job=job: self._check_crash(job, f))
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        return list(self.jobs.values())
+
+    def latest(self):
+        return max(self.jobs.values(), key=lambda j: j.created_at, default=None)
+
+    def cancel(self, job_id):
+        """En cola se descarta; en marcha se corta al terminar su episodio actual"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        with self.lock:
+            if job.status == 'queued' and job.future.cancel():
+                job.status = 'cancelled'
+                job.stop_reason = 'cancelled'
+                job.finished_at = time.time()
+            elif job.status in ('queued', 'running'):
+                self.stop_flags[job.id] = True
+                job.status = 'cancelling'
+        return job
+
+    def cancel_all(self):
+        return [self.cancel(job.id) for job in self.list() if job.status in ('queued', 'running')]
+
+    def _collect(self):
+        while True:
+            try:
+                kind, job_id, data = self.events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            with self.lock:
+                if kind == 'started':
+                    job.pid = data['pid']
+                    job.started_at = data['time']
+                    if job.status == 'queued':
+                        job.status = 'running'
+                elif kind == 'episode':
+                    job.record(data)
+                elif kind == 'probe':
+                    job.probe = data
+                elif kind == 'trace':
+                    job.trace = data
+                elif kind == 'profile':
+                    req_id, result = data
+                    pending = self._profiles.get(req_id)
+                    if pending is not None:
+                        pending['result'] = result
+                        pending['ready'].set()
+                elif kind == 'failed':
+                    self._fail(job, data['error'])
+                elif kind == 'done':
+                    self._finish(job, data)
+            if kind == 'done' and job.status == 'complete' and self.promote:
+                self.promote_job(job.id, latest_only=True)
+
+    def _finish(self, job, result):
+        """Cierra el trabajo con su aviso 'done' (llega tras todos sus episodios)"""
+        job.finished_at = time.time()
+        job.stop_reason = result['stop_reason']
+        job.convergence = result['convergence']
+        if self.stop_flags.get(job.id, False):
+            job.status = 'cancelled'
+            job.stop_reason = 'cancelled'
+        else:
+            job.status = 'complete'
+
+    def _fail(self, job, error):
+        if job.status in ('complete', 'cancelled', 'failed'):
+            return
+        job.finished_at = time.time()
+        job.status = 'failed'
+        job.error = error
+
+    def _check_crash(self, job, future):
+        """Si el proceso muere sin avisar (p.ej. BrokenProcessPool) el future lo cuenta"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            with self.lock:
+                self._fail(job, repr(error))
+
+    def promote_job(self, job_id, latest_only=False):
+        """
+        Copia las Q-tables y estadísticas del trabajo al modelo actual. Con
+        latest_only no se sustituye a uno promovido que se encoló después.
+        """
+        job = self.jobs.get(job_id)
+        if job is None or not os.path.exists(job.qtable_path):
+            return False
+        with self.lock:
+            if latest_only and self.promoted is not None and self.promoted.created_at > job.created_at:
+                return False
+            for src, dst in ((job.qtable_path, self.qtable_path), (job.stats_path, self.stats_path)):
+                if os.path.exists(src):
+                    # Copia y renombrado: los lectores nunca ven un fichero a medias
+                    shutil.copyfile(src, dst + '.tmp')
+                    os.replace(dst + '.tmp', dst)
+            if self.promoted is not None:
+                self.promoted.promoted = False
+            job.promoted = True
+            self.promoted = job
+        if self.on_promote is not None:
+            self.on_promote(job)
+        return True
+
+    # ---------- instrumentación, trazas y perfilado de los procesos ----------
+
+    def active(self):
+        return any(job.active for job in self.list())
+
+    def running(self):
+        return [job for job in self.list() if job.status == 'running']
+
+    def configure_probe(self, enabled, reset=False):
+        """Activa/desactiva PROBE en los trabajos; reset borra sus histogramas"""
+        with self.lock:
+            if reset:
+                self._probe_reset += 1
+                for job in self.jobs.values():
+                    job.probe = None
+            if self.control is not None:
+                self.control['probe'] = (bool(enabled), self._probe_reset)
+
+    def probe_snapshots(self):
+        """Últimos histogramas de cada trabajo (también de los terminados)"""
+        return [job.probe for job in self.list() if job.probe]
+
+    def start_trace(self, steps):
+        """Graba `steps` pasos en cada trabajo en cola o en marcha"""
+        return self._send_trace(steps)
+
+    def stop_trace(self):
+        return self._send_trace(0)
+
+    def _send_trace(self, steps):
+        with self.lock:
+            targets = [job for job in self.jobs.values() if job.active]
+            self._trace_gen += 1
+            for job in targets:
+                self.control[('trace', job.id)] = (self._trace_gen, int(steps))
+        return [job.id for job in targets]
+
+    def trace_status(self):
+        return {job.id: job.trace for job in self.list() if job.trace is not None}
+
+    def profile(self, job_id, seconds, interval, top=20):
+        """Perfil por muestreo del hilo que entrena en el proceso del trabajo (None si no llega)"""
+        job = self.jobs.get(job_id)
+        if job is None or job.status != 'running':
+            return None
+        req_id = uuid.uuid4().hex[:8]
+        pending = self._profiles[req_id] = {'ready': threading.Event(), 'result': None}
+        self.control[('profile', job_id)] = (req_id, seconds, interval, top)
+        try:
+            pending['ready'].wait(seconds + CONTROL_INTERVAL + 10)
+            return pending['result']
+        finally:
+            self._profiles.pop(req_id, None)
+
+    def stats(self):
+        jobs = self.list()
+        statuses = [j.status for j in jobs]
+        return {
+            'workers': self.workers,
+            'total': len(jobs),
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running') + statuses.count('cancelling'),
+            'complete': statuses.count('complete'),
+            'cancelled': statuses.count('cancelled'),
+            'failed': statuses.count('failed'),
+            'steps_per_sec': round(sum(j.summary()['steps_per_sec'] for j in jobs
+                                       if j.status == 'running'), 1)
+        }
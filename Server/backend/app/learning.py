@@ -0,0 +1,439 @@
+# backend/app/learning.py
+import numpy as np
+
+ACTIONS = [(0,0), (1,0), (-1,0), (0,1), (0,-1)]
+N_ACTIONS = len(ACTIONS)
+
+# Componentes del estado de FarmAgent.obs_to_state: (nombre, mínimo, nº de valores)
+STATE_FIELDS = (
+    ('dx', -8, 17),
+    ('dy', -8, 17),
+    ('occ', 0, 16),
+    ('cap_level', 0, 5),
+    ('barn_dist_q', 0, 6),
+    ('fuel_level', 0, 5),
+    ('returning', 0, 2),
+)
+_LOWS = np.array([f[1] for f in STATE_FIELDS], dtype=np.int64)
+_SIZES = np.array([f[2] for f in STATE_FIELDS], dtype=np.int64)
+# Base mixta: el último componente varía más rápido
+_STRIDES = np.concatenate([np.cumprod(_SIZES[::-1])[::-1][1:], [1]]).astype(np.int64)
+N_STATES = int(np.prod(_SIZES))
+
+# Movimiento (dx, dy) -> índice de acción; cualquier otro desplazamiento cuenta como 0
+_MOVE_INDEX = np.zeros((3, 3), dtype=np.int64)
+for _i, (_ax, _ay) in enumerate(ACTIONS):
+    _MOVE_INDEX[_ax + 1, _ay + 1] = _i
+
+
+def encode_states(states):
+    """Array (N, 7) de estados -> códigos enteros en [0, N_STATES)"""
+    digits = np.asarray(states, dtype=np.int64).reshape(-1, len(STATE_FIELDS)) - _LOWS
+    if ((digits < 0) | (digits >= _SIZES)).any():
+        raise ValueError("Estado fuera de rango")
+    return digits @ _STRIDES
+
+
+def encode_state(state):
+    if len(state) != len(STATE_FIELDS):
+        raise ValueError(f"Estado fuera de rango: {state}")
+    code = 0
+    for value, (_, low, size) in zip(state, STATE_FIELDS):
+        digit = int(value) - low
+        if not 0 <= digit < size:
+            raise ValueError(f"Estado fuera de rango: {state}")
+        code = code * size + digit
+    return code
+
+
+def decode_state(code):
+    digits = []
+    for _, low, size in reversed(STATE_FIELDS):
+        code, digit = divmod(int(code), size)
+        digits.append(digit + low)
+    return tuple(reversed(digits))
+
+
+def actions_from_moves(dx, dy):
+    """Índice de acción de cada desplazamiento (mismo criterio que el dict inverso de ACTIONS)"""
+    dx = np.asarray(dx, dtype=np.int64)
+    dy = np.asarray(dy, dtype=np.int64)
+    unit = (np.abs(dx) <= 1) & (np.abs(dy) <= 1)
+    return np.where(unit, _MOVE_INDEX[np.clip(dx, -1, 1) + 1, np.clip(dy, -1, 1) + 1], 0)
+
+
+class QStore:
+    """
+    Q-tables de varios dueños (agentes) en un único array [filas, acciones].
+    Cada par (dueño, estado codificado) ocupa una fila, así la elección
+    epsilon-greedy y las actualizaciones TD de toda la flota son indexación
+    avanzada sobre ese array.
+    """
+
+    def __init__(self, n_actions=N_ACTIONS, capacity=1024):
+        self.n_actions = n_actions
+        self.q = np.zeros((max(1, capacity), n_actions))
+        self.size = 0
+        self._rows = {}
+        self._counts = []
+        # Rol -> dueño compartido (tablas comunes a todos los agentes del rol)
+        self._role_owners = {}
+
+    def __len__(self):
+        """Estados aprendidos en total (filas en uso)"""
+        return sum(self._counts)
+
+    @property
+    def shared(self):
+        return bool(self._role_owners)
+
+    @property
+    def nbytes(self):
+        return int(len(self) * self.n_actions * self.q.itemsize)
+
+    def new_owner(self):
+        self._counts.append(0)
+        return len(self._counts) - 1
+
+    def role_owner(self, role):
+        """Dueño común de todos los agentes de un rol (lo crea la primera vez)"""
+        if role not in self._role_owners:
+            self._role_owners[role] = self.new_owner()
+        return self._role_owners[role]
+
+    def count(self, owner):
+        return self._counts[owner]
+
+    @staticmethod
+    def keys(owners, codes):
+        return np.asarray(owners, dtype=np.int64) * N_STATES + np.asarray(codes, dtype=np.int64)
+
+    def _new_row(self, key):
+        if self.size == len(self.q):
+            grown = np.zeros((len(self.q) * 2, self.n_actions))
+            grown[:self.size] = self.q[:self.size]
+            self.q = grown
+        row = self.size
+        self.size += 1
+        self._rows[key] = row
+        self._counts[key // N_STATES] += 1
+        return row
+
+    def row(self, key, create=False):
+        row = self._rows.get(key, -1)
+        if row < 0 and create:
+            row = self._new_row(key)
+        return row
+
+    def lookup(self, keys, create=False, created=None):
+        """
+        Filas de un lote de claves (-1 si no existen y create=False).
+        Con `created` (array de enteros) se suma 1 a cada posición que creó fila.
+        """
+        get = self._rows.get
+        rows = [get(k, -1) for k in keys.tolist()]
+        if create:
+            for i, k in enumerate(keys.tolist()):
+                if rows[i] < 0:
+                    # La clave puede haberse creado antes en este mismo lote
+                    rows[i] = self.row(k)
+                    if rows[i] < 0:
+                        rows[i] = self._new_row(k)
+                        if created is not None:
+                            created[i] += 1
+        return np.array(rows, dtype=np.int64)
+
+    def items(self, owner):
+        """(estado, valores) de un dueño"""
+        lo = owner * N_STATES
+        for key, row in self._rows.items():
+            if lo <= key < lo + N_STATES:
+                yield decode_state(key - lo), self.q[row]
+
+    def clear_owner(self, owner):
+        """Olvida la tabla de un dueño (sus filas quedan sin uso)"""
+        lo = owner * N_STATES
+        for key in [k for k in self._rows if lo <= k < lo + N_STATES]:
+            del self._rows[key]
+        self._counts[owner] = 0
+
+    def greedy(self, keys):
+        """Acción de mayor valor de cada clave (-1 si el estado no se ha visto)"""
+        rows = self.lookup(keys)
+        return np.where(rows >= 0, np.argmax(self.q[np.maximum(rows, 0)], axis=1), -1)
+
+    def choose(self, keys, eps, rng):
+        """
+        Epsilon-greedy por lotes: con los aleatorios sacados de una vez, explora
+        si toca o si el estado es nuevo; si no, la acción de mayor valor.
+        """
+        n = len(keys)
+        rows = self.lookup(keys)
+        explore = (rng.random(n) < eps) | (rows < 0)
+        random_actions = rng.integers(0, self.n_actions, n)
+        greedy = np.argmax(self.q[np.maximum(rows, 0)], axis=1)
+        return np.where(explore, random_actions, greedy)
+
+    def td_update(self, keys, actions, rewards, next_keys, alpha, gamma, done=False, stats=None):
+        """
+        Q(s,a) += alpha * (r + gamma * max Q(s') - Q(s,a)) para todo el lote.
+        Todos los objetivos se calculan con la Q anterior al lote. Si una (s, a)
+        se repite en el lote (tablas por rol, lotes de replay con reemplazo) se
+        aplica la media de sus correcciones. Con `stats` (dict) se devuelven el error TD
+        ('td_error'), las filas actualizadas ('rows') y las filas que creó cada
+        elemento ('created').
+        """
+        created = np.zeros(len(keys), dtype=np.int64)
+        rows = self.lookup(keys, create=True, created=created)
+        next_rows = self.lookup(next_keys, create=True, created=created)
+        q = self.q
+        max_next = np.where(done, 0.0, q[next_rows].max(axis=1))
+        target = np.asarray(rewards, dtype=np.float64) + np.asarray(gamma) * max_next
+        current = q[rows, actions]
+        delta = target - current
+        step = np.broadcast_to(np.asarray(alpha, dtype=np.float64), delta.shape) * delta
+        flat = rows * self.n_actions + np.asarray(actions, dtype=np.int64)
+        cells, inverse, counts = np.unique(flat, return_inverse=True, return_counts=True)
+        if len(cells) < len(flat):
+            q.reshape(-1)[cells] += np.bincount(inverse, weights=step) / counts
+        else:
+            q[rows, actions] = current + step
+        if stats is not None:
+            stats['td_error'] = delta
+            stats['rows'] = rows
+            stats['created'] = created
+
+
+class QTable:
+    """Vista tipo dict (estado -> valores) de la tabla de un dueño en un QStore"""
+    __slots__ = ('store', 'owner')
+
+    def __init__(self, store, owner):
+        self.store = store
+        self.owner = owner
+
+    def _key(self, state):
+        return self.owner * N_STATES + encode_state(state)
+
+    def __len__(self):
+        return self.store.count(self.owner)
+
+    def __contains__(self, state):
+        try:
+            return self.store.row(self._key(state)) >= 0
+        except ValueError:
+            return False
+
+    def __getitem__(self, state):
+        # Como el defaultdict anterior: un estado nuevo nace con ceros.
+        # La fila se reserva antes de leer store.q (puede crecer y reubicarse)
+        row = self.store.row(self._key(state), create=True)
+        return self.store.q[row]
+
+    def __setitem__(self, state, values):
+        row = self.store.row(self._key(state), create=True)
+        self.store.q[row] = values
+
+    def __iter__(self):
+        return (state for state, _ in self.store.items(self.owner))
+
+    def keys(self):
+        return list(iter(self))
+
+    def items(self):
+        return self.store.items(self.owner)
+
+    def update(self, mapping):
+        """Carga estados desde un dict; se ignoran los que no son estados válidos"""
+        for state, values in mapping.items():
+            try:
+                self[state] = values
+            except (ValueError, TypeError):
+                continue
+
+
+class _Transitions:
+    """Columnas preasignadas de transiciones (s, a, r, s', done) con su alpha/gamma"""
+
+    COLUMNS = (
+        ('keys', np.int64), ('actions', np.int64), ('rewards', np.float64),
+        ('next_keys', np.int64), ('done', bool), ('alpha', np.float64), ('gamma', np.float64)
+    )
+
+    def _allocate(self, capacity):
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def _write(self, slots, keys, actions, rewards, next_keys, done, alpha, gamma):
+        n = len(slots)
+        values = (keys, actions, rewards, next_keys, done, alpha, gamma)
+        for (name, _), value in zip(self.COLUMNS, values):
+            getattr(self, name)[slots] = np.broadcast_to(value, (n,)) if np.ndim(value) == 0 else value
+
+    def _update(self, store, slots):
+        store.td_update(self.keys[slots], self.actions[slots], self.rewards[slots],
+                        self.next_keys[slots], self.alpha[slots], self.gamma[slots],
+                        done=self.done[slots])
+
+
+class ReplayBuffer(_Transitions):
+    """
+    Anillo preasignado de las últimas `capacity` transiciones. replay() repasa
+    un lote aleatorio con una sola actualización TD sobre el QStore.
+    """
+
+    def __init__(self, capacity=50000):
+        self.capacity = max(1, int(capacity))
+        self._allocate(self.capacity)
+        self.size = 0
+        self.head = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, keys, actions, rewards, next_keys, done, alpha, gamma):
+        n = len(keys)
+        if n == 0:
+            return
+        # Si el lote no cabe, sólo se guardan sus últimas transiciones
+        keep = slice(max(0, n - self.capacity), n)
+        args = [v[keep] if np.ndim(v) else v for v in
+                (np.asarray(keys), np.asarray(actions), np.asarray(rewards, dtype=np.float64),
+                 np.asarray(next_keys), np.asarray(done), np.asarray(alpha), np.asarray(gamma))]
+        m = len(args[0])
+        slots = (self.head + np.arange(m)) % self.capacity
+        self._write(slots, *args)
+        self.head = int((self.head + m) % self.capacity)
+        self.size = min(self.capacity, self.size + m)
+
+    def replay(self, store, batch, rng):
+        if self.size == 0 or batch <= 0:
+            return
+        self._update(store, rng.integers(0, self.size, batch))
+
+
+class DynaModel(_Transitions):
+    """
+    Modelo determinista aprendido para Dyna-Q: (s, a) -> último (r, s', done)
+    observado. plan() hace `n` actualizaciones simuladas sobre pares ya vistos.
+    """
+
+    def __init__(self, capacity=4096):
+        self._allocate(max(1, capacity))
+        self.size = 0
+        self._slots = {}
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        for name, _ in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(len(old) * 2, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def update(self, keys, actions, rewards, next_keys, done, alpha, gamma):
+        keys = np.asarray(keys, dtype=np.int64)
+        actions = np.asarray(actions, dtype=np.int64)
+        slots = np.empty(len(keys), dtype=np.int64)
+        for i, sa in enumerate((keys * N_ACTIONS + actions).tolist()):
+            slot = self._slots.get(sa)
+            if slot is None:
+                if self.size == len(self.keys):
+                    self._grow()
+                slot = self._slots[sa] = self.size
+                self.size += 1
+            slots[i] = slot
+        self._write(slots, keys, actions, np.asarray(rewards, dtype=np.float64),
+                    np.asarray(next_keys), np.asarray(done), np.asarray(alpha), np.asarray(gamma))
+
+    def plan(self, store, n, rng):
+        if self.size == 0 or n <= 0:
+            return
+        self._update(store, rng.integers(0, self.size, n))
+
+
+class EligibilityTraces:
+    """
+    Trazas de elegibilidad dispersas para Q(lambda) de Watkins: sólo se guardan
+    los pares (agente, fila, acción) visitados hace poco, en arrays de tamaño
+    acotado. Cada paso decae y aplica todas las trazas con operaciones
+    vectorizadas; las que bajan de `min_trace` se descartan.
+    """
+
+    def __init__(self, lam=0.8, capacity=4096, min_trace=0.01):
+        self.lam = float(lam)
+        self.capacity = max(1, int(capacity))
+        self.min_trace = min_trace
+        self.clear()
+
+    def clear(self):
+        self.agents = np.zeros(0, dtype=np.int64)
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.e = np.zeros(0)
+
+    def __len__(self):
+        return len(self.e)
+
+    def cut(self, agents):
+        """Corta las trazas de los agentes que tomaron una acción no greedy"""
+        if len(self.e) and len(agents):
+            keep = ~np.isin(self.agents, agents)
+            self.agents, self.cells, self.e = self.agents[keep], self.cells[keep], self.e[keep]
+
+    def step(self, store, rows, actions, steps, gamma):
+        """
+        Tras la actualización de un paso de cada agente i (su par actual ya
+        recibió `steps[i]` = alpha * delta), propaga esa corrección a sus pares
+        anteriores, Q += steps[i] * e, y registra el par actual con traza 1
+        (reemplazo) antes de decaer todas por gamma * lambda.
+        """
+        n = len(rows)
+        agents = np.arange(n, dtype=np.int64)
+        cells = rows * store.n_actions + np.asarray(actions, dtype=np.int64)
+        if len(self.e):
+            # El par actual ya se actualizó en el paso de un solo salto: no repetirlo
+            current = np.isin(self.agents * len(store.q) * store.n_actions + self.cells,
+                              agents * len(store.q) * store.n_actions + cells)
+            self.agents, self.cells, self.e = self.agents[~current], self.cells[~current], self.e[~current]
+            np.add.at(store.q.reshape(-1), self.cells, np.asarray(steps)[self.agents] * self.e)
+        self.agents = np.concatenate([self.agents, agents])
+        self.cells = np.concatenate([self.cells, cells])
+        self.e = np.concatenate([self.e, np.ones(n)])
+        self.e *= np.broadcast_to(np.asarray(gamma, dtype=np.float64), (n,))[self.agents] * self.lam
+        alive = self.e >= self.min_trace
+        if alive.all() and len(self.e) <= self.capacity:
+            return
+        keep = np.flatnonzero(alive)
+        if len(keep) > self.capacity:
+            keep = keep[np.argpartition(self.e[keep], -self.capacity)[-self.capacity:]]
+        self.agents, self.cells, self.e = self.agents[keep], self.cells[keep], self.e[keep]
+
+
+def q_owners(agents):
+    """
+    (store, dueños) de una lista de agentes. Si no comparten QStore se copian
+    a uno nuevo (sus vistas pasan a apuntar a él), como pool_rows con el pool.
+    """
+    if not agents:
+        return QStore(), np.zeros(0, dtype=np.int64)
+    store = agents[0]._qstore
+    owners = np.empty(len(agents), dtype=np.int64)
+    for i, ag in enumerate(agents):
+        if ag._qstore is not store:
+            return adopt_tables(agents)
+        owners[i] = ag._owner
+    return store, owners
+
+
+def adopt_tables(agents):
+    store = QStore()
+    for ag in agents:
+        owner = store.new_owner()
+        table = QTable(store, owner)
+        for state, values in ag.Q.items():
+            table[state] = values
+        ag._qstore = store
+        ag._owner = owner
+    return store, np.arange(len(agents), dtype=np.int64)
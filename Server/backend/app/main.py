@@ -1,8 +1,11 @@
 # backend/app/main.py
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from .sim_manager import SimManager
+from .config import ENGINE_PROCESS
+from .engine import create_sim
+from .world import count_equal
 import asyncio
+import os
 import numpy as np
 
 def convert_numpy_types(obj):
@@ -23,13 +26,43 @@ app.add_middleware(
     allow_headers=['*']
 )
 
-sim = SimManager()
+# Con ENGINE_PROCESS=1 la granja corre en el proceso del motor y `sim` es su fachada
+sim = create_sim(__name__)
+qtables_mtime = None
 
 # Cargar Q-tables al inicio
-if sim.load_qs():
-    print("✅ Q-Tables cargadas correctamente.")
-else:
-    print("⚠️ No se encontraron Q-Tables guardadas. Iniciando desde cero.")
+if sim is not None:
+    if sim.load_qs():
+        print("✅ Q-Tables cargadas correctamente.")
+    else:
+        print("⚠️ No se encontraron Q-Tables guardadas. Iniciando desde cero.")
+    qtables_mtime = os.path.getmtime(sim.QTABLE_PATH) if os.path.exists(sim.QTABLE_PATH) else None
+
+def reload_qtables():
+    """Recarga las Q-tables si el fichero cambió (un trabajo de /train completado lo reemplaza)"""
+    global qtables_mtime
+    if not os.path.exists(sim.QTABLE_PATH):
+        return False
+    mtime = os.path.getmtime(sim.QTABLE_PATH)
+    if mtime == qtables_mtime:
+        return False
+    qtables_mtime = mtime
+    loaded = sim.reload_qs()
+    if loaded:
+        print("🔄 Q-Tables actualizadas desde disco.")
+    return loaded
+
+async def stream_engine(websocket):
+    """Modo motor: el bucle en vivo corre en el motor; aquí sólo se envía su instantánea"""
+    reload_qtables()
+    sim.start_run_trained()
+    step_count = 0
+    while True:
+        await websocket.send_json(convert_numpy_types(sim.get_state()))
+        step_count += 1
+        if step_count % 50 == 0:
+            reload_qtables()
+        await asyncio.sleep(0.1)  # 10 FPS
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -37,10 +70,14 @@ async def websocket_endpoint(websocket: WebSocket):
     print("🔌 Unity Conectado")
 
     try:
+        if ENGINE_PROCESS:
+            await stream_engine(websocket)
+            return
         # Inicializar ambiente si no hay agentes
         if not sim.agents:
             sim.env.reset()
             print("🌱 Ambiente inicializado")
+        reload_qtables()
 
         step_count = 0
         episode_step = 0
@@ -50,13 +87,12 @@ async def websocket_endpoint(websocket: WebSocket):
             try:
                 with sim.lock:
                     # 1. Obtener observaciones
-                    obs_list = sim.env._get_obs()
+                    states = sim.env.observe(sim.agents)
                     actions = {}
 
                     # 2. Cada agente elige acción usando Q-table
                     for i, agent in enumerate(sim.agents):
-                        state = agent.obs_to_state(obs_list[i])
-                        action_idx = agent.choose_action(state, training=False)
+                        action_idx = agent.choose_action(states[i], training=False)
                         
                         # Mapear acción a movimiento
                         move_map = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}
@@ -66,16 +102,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     proposals = sim.env.step(sim.agents, actions_by_q=actions)
                     
                     # 4. Resolver colisiones
-                    counts = {}
-                    for p in proposals: 
-                        counts[p] = counts.get(p, 0) + 1
-                    
-                    finals = []
-                    for i, p in enumerate(proposals):
-                        if counts[p] > 1: 
-                            finals.append(sim.agents[i].pos)  # No mover si colisiona
-                        else: 
-                            finals.append(p)
+                    finals = sim.env.resolve_collisions(sim.agents, proposals)  # No mover si colisiona
                     
                     # 5. Aplicar movimientos finales y cosechar
                     sim.env.apply_final_positions_and_harvest(sim.agents, finals)
@@ -93,8 +120,12 @@ async def websocket_endpoint(websocket: WebSocket):
                     if episode_step >= max_steps_per_episode:
                         print(f"🔄 Episodio completado ({max_steps_per_episode} pasos), reiniciando...")
                         sim.env.reset()
+                        sim.env.place_agents(sim.agents)
                         episode_step = 0
 
+                if episode_step == 0:
+                    reload_qtables()
+
             except Exception as e_inner:
                 print(f"❌ Error en frame {step_count}: {e_inner}")
                 import traceback
@@ -108,7 +139,7 @@ async def websocket_endpoint(websocket: WebSocket):
             step_count += 1
             if step_count % 50 == 0:
                 print(f"📊 Frame {step_count} | Episodio paso {episode_step}")
-                print(f"   Cultivos: {sum(1 for r in sim.env.grid for c in r if c == 2)}")
+                print(f"   Cultivos: {count_equal(sim.env.grid, 2)}")
                 print(f"   Fuel promedio: {sum(a.current_fuel for a in sim.agents)/len(sim.agents):.1f}")
             
             # 11. Enviar a Unity
@@ -0,0 +1,207 @@
+# backend/app/pool.py
+import numpy as np
+
+from .fleet import ROLE_ORDER
+
+ROLE_CODES = {role: i for i, role in enumerate(ROLE_ORDER)}
+HARVESTER = ROLE_CODES['harvester']
+
+INT_COLUMNS = (
+    'x', 'y', 'barn_x', 'barn_y', 'goal_x', 'goal_y', 'role_code',
+    'max_capacity', 'current_capacity', 'max_fuel',
+    'harvested', 'planted', 'irrigated', 'delivered',
+    'recharge_counter', 'low_fuel_warnings', 'out_of_fuel_count',
+    'steps_taken', 'successful_actions', 'barn_visits',
+    'total_distance_traveled', 'fuel_refills',
+    'q_updates', 'states_discovered'
+)
+FLOAT_COLUMNS = ('current_fuel', 'fuel_consumed', 'fuel_efficiency_score', 'eps')
+BOOL_COLUMNS = ('is_returning_to_barn',)
+
+
+class AgentPool:
+    """
+    Estado de toda la flota en columnas NumPy contiguas (struct-of-arrays).
+    Cada FarmAgent es una vista sobre una fila; las operaciones por lotes
+    reciben un array de filas y actúan sobre todos los agentes a la vez.
+    """
+
+    def __init__(self, capacity=8):
+        self.size = 0
+        self.capacity = max(1, capacity)
+        for name in INT_COLUMNS:
+            setattr(self, name, np.zeros(self.capacity, dtype=np.int64))
+        for name in FLOAT_COLUMNS:
+            setattr(self, name, np.zeros(self.capacity, dtype=np.float64))
+        for name in BOOL_COLUMNS:
+            setattr(self, name, np.zeros(self.capacity, dtype=bool))
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in INT_COLUMNS + FLOAT_COLUMNS + BOOL_COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(self.capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def add(self, pos, role, barn_pos, capacity, fuel, eps):
+        """Reserva una fila nueva y devuelve su índice"""
+        if self.size == self.capacity:
+            self._grow()
+        row = self.size
+        self.size += 1
+        self.x[row], self.y[row] = pos
+        self.barn_x[row], self.barn_y[row] = barn_pos
+        self.goal_x[row], self.goal_y[row] = barn_pos
+        self.role_code[row] = ROLE_CODES[role]
+        self.max_capacity[row] = capacity
+        # Cosechadores empiezan vacíos
+        self.current_capacity[row] = capacity if role != 'harvester' else 0
+        self.max_fuel[row] = fuel
+        self.current_fuel[row] = fuel
+        self.eps[row] = eps
+        return row
+
+    def rows(self):
+        return np.arange(self.size)
+
+    # ---------- consultas vectorizadas ----------
+
+    def barn_distance(self, rows):
+        return np.abs(self.barn_x[rows] - self.x[rows]) + np.abs(self.barn_y[rows] - self.y[rows])
+
+    def fuel_percentage(self, rows):
+        return (self.current_fuel[rows] / self.max_fuel[rows] * 100).astype(np.int64)
+
+    def capacity_percentage(self, rows):
+        return (self.current_capacity[rows] / self.max_capacity[rows] * 100).astype(np.int64)
+
+    def is_fuel_low(self, rows):
+        return self.fuel_percentage(rows) <= 30
+
+    def is_fuel_critical(self, rows):
+        return self.fuel_percentage(rows) <= 10
+
+    def is_at_barn(self, rows):
+        return ((np.abs(self.x[rows] - self.barn_x[rows]) <= 2) &
+                (np.abs(self.y[rows] - self.barn_y[rows]) <= 2))
+
+    def efficiency_score(self, rows):
+        consumed = self.fuel_consumed[rows]
+        safe = np.where(consumed == 0, 1.0, consumed)
+        score = np.minimum(100, self.successful_actions[rows] / safe * 100)
+        return np.where(consumed == 0, 100.0, score)
+
+    def should_return_to_barn(self, rows):
+        """Misma regla que FarmAgent.should_return_to_barn para todas las filas"""
+        fuel = self.current_fuel[rows]
+        cap = self.current_capacity[rows]
+        max_cap = self.max_capacity[rows]
+        dist = self.barn_distance(rows)
+        harvester = self.role_code[rows] == HARVESTER
+
+        out = (fuel <= 0) | (self.fuel_percentage(rows) <= 10) | (fuel < dist * 1.5)
+        out |= harvester & ((cap >= max_cap) | ((cap >= max_cap * 0.8) & (dist < 5)))
+        out |= ~harvester & ((cap <= 0) | ((cap < max_cap * 0.2) & (dist < 5)))
+        return out
+
+    # ---------- actualizaciones vectorizadas ----------
+
+    def consume_fuel(self, rows, amount):
+        """Descuenta combustible; devuelve la máscara de filas que podían moverse"""
+        amount = np.broadcast_to(np.asarray(amount, dtype=np.float64), np.shape(rows))
+        ok = self.current_fuel[rows] > 0
+        r = rows[ok]
+        self.current_fuel[r] = np.maximum(0, self.current_fuel[r] - amount[ok])
+        self.fuel_consumed[r] += amount[ok]
+        self.out_of_fuel_count[rows[~ok]] += 1
+        return ok
+
+    def recharge_at_barn(self, rows, fuel_recharge_rate=20):
+        """
+        Carga/descarga y repostaje de las filas que están en su granero.
+        Devuelve (en_granero, recarga_completa).
+        """
+        at = self.is_at_barn(rows)
+        r = rows[at]
+        self.recharge_counter[r] += 1
+
+        harvester = self.role_code[r] == HARVESTER
+        unload = r[harvester & (self.current_capacity[r] > 0)]
+        self.delivered[unload] += self.current_capacity[unload]
+        self.current_capacity[unload] = 0
+        refill = r[~harvester]
+        self.current_capacity[refill] = self.max_capacity[refill]
+
+        low = r[self.current_fuel[r] < self.max_fuel[r]]
+        self.current_fuel[low] = np.minimum(self.max_fuel[low], self.current_fuel[low] + fuel_recharge_rate)
+
+        full = self.current_fuel[r] >= self.max_fuel[r]
+        done = r[full]
+        self.is_returning_to_barn[done] = False
+        self.recharge_counter[done] = 0
+        self.barn_visits[done] += 1
+        self.fuel_refills[done] += 1
+
+        completed = np.zeros(np.shape(rows), dtype=bool)
+        completed[np.flatnonzero(at)[full]] = True
+        return at, completed
+
+    def use_capacity(self, rows, amount=1):
+        """Cosechadores suman carga, el resto la gasta; devuelve la máscara de éxito"""
+        harvester = self.role_code[rows] == HARVESTER
+        cap = self.current_capacity[rows]
+        ok = np.where(harvester, cap < self.max_capacity[rows], cap >= amount)
+        r = rows[ok]
+        self.current_capacity[r] += np.where(harvester[ok], amount, -amount)
+        self.successful_actions[r] += 1
+        return ok
+
+    def refuel(self, rows):
+        self.current_fuel[rows] = self.max_fuel[rows]
+
+    def reset_episode(self, rows, eps=None, eps_min=0.01):
+        """Estado de inicio de episodio (carga y combustible llenos, contadores a cero)"""
+        for name in ('harvested', 'planted', 'irrigated'):
+            getattr(self, name)[rows] = 0
+        self.current_capacity[rows] = self.max_capacity[rows]
+        self.current_fuel[rows] = self.max_fuel[rows]
+        self.is_returning_to_barn[rows] = False
+        if eps is not None:
+            self.eps[rows] = max(eps_min, min(1.0, eps))
+
+    def decay_epsilon(self, rows, decay_rate=0.995, eps_min=0.01):
+        self.eps[rows] = np.maximum(eps_min, self.eps[rows] * decay_rate)
+
+
+def pool_rows(agents):
+    """
+    (pool, filas) de una lista de agentes. Si no comparten pool se trasladan
+    a uno nuevo (sus vistas pasan a apuntar a él), así las operaciones por
+    lotes siempre tienen columnas contiguas.
+    """
+    if not agents:
+        return AgentPool(1), np.zeros(0, dtype=np.int64)
+    pool = agents[0]._pool
+    rows = np.empty(len(agents), dtype=np.int64)
+    for i, ag in enumerate(agents):
+        if ag._pool is not pool:
+            return adopt(agents)
+        rows[i] = ag._row
+    return pool, rows
+
+
+def adopt(agents):
+    """Copia el estado de los agentes a un pool nuevo y redirige sus vistas"""
+    pool = AgentPool(len(agents))
+    for ag in agents:
+        row = pool.size
+        pool.size += 1
+        for name in INT_COLUMNS + FLOAT_COLUMNS + BOOL_COLUMNS:
+            getattr(pool, name)[row] = getattr(ag._pool, name)[ag._row]
+        ag._pool = pool
+        ag._row = row
+    return pool, pool.rows()
@@ -0,0 +1,82 @@
+# backend/app/profiler.py
+import os
+import sys
+import time
+from collections import Counter
+
+MAX_PROFILE_SECONDS = 120
+DEFAULT_INTERVAL = 0.005
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame):
+    """Pila de la raíz a la hoja como tupla de etiquetas"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+def sample_thread(thread, seconds, interval=DEFAULT_INTERVAL):
+    """
+    Muestrea la pila de `thread` cada `interval` segundos durante `seconds`.
+    No detiene ni ralentiza de forma apreciable al hilo muestreado
+    (sólo lee sys._current_frames desde el hilo que llama).
+    """
+    seconds = max(0.0, min(float(seconds), MAX_PROFILE_SECONDS))
+    stacks = Counter()
+    ident = thread.ident
+    deadline = time.perf_counter() + seconds
+    samples = 0
+    while time.perf_counter() < deadline and thread.is_alive():
+        frame = sys._current_frames().get(ident)
+        if frame is not None:
+            stacks[_stack(frame)] += 1
+            samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+def collapsed(stacks):
+    """Formato 'a;b;c N' (flamegraph.pl, speedscope, inferno)"""
+    return '\n'.join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks, samples, top=20):
+    self_counts = Counter()
+    total_counts = Counter()
+    for stack, count in stacks.items():
+        if not stack:
+            continue
+        self_counts[stack[-1]] += count
+        for label in set(stack):
+            total_counts[label] += count
+    denom = max(1, samples)
+    return {
+        'self': [
+            {'function': f, 'samples': int(c), 'pct': round(100.0 * c / denom, 2)}
+            for f, c in self_counts.most_common(top)
+        ],
+        'total': [
+            {'function': f, 'samples': int(c), 'pct': round(100.0 * c / denom, 2)}
+            for f, c in total_counts.most_common(top)
+        ]
+    }
+
+
+def profile_thread(thread, seconds, interval=DEFAULT_INTERVAL, top=20):
+    started = time.time()
+    stacks, samples = sample_thread(thread, seconds, interval)
+    return {
+        'thread': thread.name,
+        'seconds': round(time.time() - started, 3),
+        'interval': interval,
+        'samples': int(samples),
+        'top': top_functions(stacks, samples, top),
+        'collapsed': collapsed(stacks)
+    }
@@ -0,0 +1,25 @@
+# backend/app/seeding.py
+import numpy as np
+
+# Flujos independientes de una ejecución: colocación del mapa, agentes y aprendizaje
+STREAMS = ('env', 'agents', 'learning')
+
+
+def seed_sequence(seed=None):
+    """SeedSequence raíz (acepta None, un entero o una SeedSequence ya creada)"""
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+
+def seed_streams(seed=None, names=STREAMS):
+    """
+    Un numpy.random.Generator por nombre, derivados de la semilla raíz con
+    SeedSequence.spawn: los flujos no se solapan entre sí ni entre procesos,
+    y la misma semilla reproduce la ejecución bit a bit.
+    """
+    children = seed_sequence(seed).spawn(len(names))
+    return {name: np.random.default_rng(child) for name, child in zip(names, children)}
+
+
+def spawn_seeds(seed, n):
+    """`n` semillas enteras derivadas de una raíz, para pasarlas a otros procesos"""
+    return [int(child.generate_state(1)[0]) for child in seed_sequence(seed).spawn(n)]
@@ -0,0 +1,251 @@
+# backend/app/sessions.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import (
+    GRID_W, GRID_H, CROP_COUNT, QTABLE_PATH,
+    SESSION_WORKERS, SESSION_MAX, SESSION_TICK, SESSION_STEPS_PER_TICK,
+    SESSION_STEP_BUDGET, SESSION_MAX_STEPS, SESSION_IDLE_TTL
+)
+from .sim_manager import SimManager, read_qtables
+
+
+class SessionLimitError(RuntimeError):
+    """No caben más sesiones (SESSION_MAX) ni hay sesiones inactivas que expulsar"""
+
+
+class Session:
+    """
+    Una granja independiente (su propio SimManager) con presupuesto de pasos.
+    El planificador la avanza `steps_per_tick` pasos por turno mientras está
+    en 'running'; al agotar el presupuesto pasa a 'budget_exhausted'.
+    Los turnos del planificador y los pasos manuales se serializan con `lock`.
+    """
+
+    def __init__(self, sid, sim, step_budget=0, steps_per_tick=1):
+        self.id = sid
+        self.sim = sim
+        self.step_budget = step_budget
+        self.steps_per_tick = max(1, steps_per_tick)
+        self.steps = 0
+        self.status = 'paused'
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.busy_sec = 0.0
+        self.lock = threading.Lock()
+
+    def touch(self):
+        self.last_access = time.time()
+
+    @property
+    def remaining(self):
+        """Pasos que quedan del presupuesto (None = sin límite)"""
+        if not self.step_budget:
+            return None
+        return max(0, self.step_budget - self.steps)
+
+    def advance(self, n):
+        """Avanza hasta `n` pasos respetando el presupuesto; devuelve los pasos dados"""
+        with self.lock:
+            remaining = self.remaining
+            if remaining is not None:
+                n = min(n, remaining)
+            t0 = time.perf_counter()
+            for _ in range(n):
+                self.sim.step_live()
+            self.busy_sec += time.perf_counter() - t0
+            self.steps += n
+            if self.remaining == 0:
+                self.status = 'budget_exhausted'
+            return n
+
+    def summary(self):
+        env = self.sim.env
+        return {
+            'session_id': self.id,
+            'status': self.status,
+            'steps': self.steps,
+            'step_budget': self.step_budget or None,
+            'remaining': self.remaining,
+            'steps_per_tick': self.steps_per_tick,
+            'grid': [env.w, env.h],
+            'agents': len(self.sim.agents),
+            'planted_total': int(env.planted_total),
+            'irrigated_total': int(env.irrigated_total),
+            'harvested_total': int(env.harvested_total),
+            'idle_sec': round(time.time() - self.last_access, 1),
+            'busy_sec': round(self.busy_sec, 3)
+        }
+
+
+class SessionScheduler:
+    """
+    Aloja muchas sesiones y las reparte en turnos sobre un pool acotado de
+    hilos: cada SESSION_TICK segundos cada sesión en marcha que no tenga ya un
+    turno en curso recibe uno. Expulsa las sesiones sin peticiones durante
+    `idle_ttl` segundos. La política entrenada se lee de disco una vez y se
+    copia a cada sesión nueva.
+    """
+
+    def __init__(self, workers=SESSION_WORKERS, max_sessions=SESSION_MAX, tick=SESSION_TICK,
+                 idle_ttl=SESSION_IDLE_TTL, qtable_path=QTABLE_PATH, max_steps=SESSION_MAX_STEPS):
+        self.workers = max(1, workers)
+        self.max_sessions = max_sessions
+        self.max_steps = max(1, max_steps)
+        self.tick = tick
+        self.idle_ttl = idle_ttl
+        self.qtable_path = qtable_path
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.pool = None
+        self.thread = None
+        self.running = False
+        self.evicted = 0
+        self.slices = 0
+        self._in_flight = set()
+        self._policy = None
+        self._policy_mtime = None
+
+    # ---------- ciclo de vida ----------
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='session')
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- sesiones ----------
+
+    def _trained_policy(self):
+        """Q-tables guardadas (se releen sólo si el fichero cambia)"""
+        if not os.path.exists(self.qtable_path):
+            return None
+        mtime = os.path.getmtime(self.qtable_path)
+        if mtime != self._policy_mtime:
+            self._policy = read_qtables(self.qtable_path)
+            self._policy_mtime = mtime
+        return self._policy
+
+    def create(self, w=GRID_W, h=GRID_H, crop_count=CROP_COUNT, fleet=None, seed=None,
+               step_budget=SESSION_STEP_BUDGET, steps_per_tick=SESSION_STEPS_PER_TICK,
+               load_q=True, run=False):
+        with self.lock:
+            if len(self.sessions) >= self.max_sessions:
+                self._evict_idle(time.time())
+            if len(self.sessions) >= self.max_sessions:
+                raise SessionLimitError(f"Límite de sesiones alcanzado ({self.max_sessions})")
+        # Las sesiones sólo simulan: sin buffer de replay ni modelo Dyna
+        sim = SimManager(w=w, h=h, fleet=fleet, crop_count=crop_count, seed=seed,
+                         replay_batch=0, planning_steps=0)
+        policy = self._trained_policy() if load_q else None
+        if policy:
+            sim.apply_qtables(policy)
+        sim.reset_live()
+        session = Session(uuid.uuid4().hex[:12], sim, step_budget, steps_per_tick)
+        if run:
+            session.status = 'running'
+        with self.lock:
+            self.sessions[session.id] = session
+        self.start()
+        return session
+
+    def get(self, sid):
+        """Sesión por id (None si no existe); cuenta como actividad del cliente"""
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.touch()
+        return session
+
+    def remove(self, sid):
+        with self.lock:
+            return self.sessions.pop(sid, None) is not None
+
+    def run(self, sid):
+        session = self.get(sid)
+        if session is None:
+            return None
+        if session.status != 'budget_exhausted':
+            session.status = 'running'
+        return session
+
+    def pause(self, sid):
+        session = self.get(sid)
+        if session is not None and session.status == 'running':
+            session.status = 'paused'
+        return session
+
+    def step(self, sid, n=1):
+        """
+        Pasos síncronos (fuera de turno), limitados por el presupuesto y a
+        `max_steps` por llamada: una petición no retiene el hilo sin límite
+        """
+        session = self.get(sid)
+        if session is None:
+            return None
+        session.advance(max(0, min(n, self.max_steps)))
+        return session
+
+    # ---------- planificador ----------
+
+    def _loop(self):
+        while self.running:
+            t0 = time.perf_counter()
+            now = time.time()
+            with self.lock:
+                self._evict_idle(now)
+                ready = [s for s in self.sessions.values()
+                         if s.status == 'running' and s.id not in self._in_flight]
+                self._in_flight.update(s.id for s in ready)
+            for session in ready:
+                self.pool.submit(self._run_slice, session)
+            time.sleep(max(0.0, self.tick - (time.perf_counter() - t0)))
+
+    def _run_slice(self, session):
+        try:
+            session.advance(session.steps_per_tick)
+        except Exception as e:
+            session.status = 'error'
+            print(f"❌ Sesión {session.id}: {e}")
+        finally:
+            with self.lock:
+                self._in_flight.discard(session.id)
+                self.slices += 1
+
+    def _evict_idle(self, now):
+        """Expulsa las sesiones inactivas (se llama con self.lock tomado)"""
+        idle = [sid for sid, s in self.sessions.items()
+                if now - s.last_access > self.idle_ttl and sid not in self._in_flight]
+        for sid in idle:
+            del self.sessions[sid]
+        self.evicted += len(idle)
+        return len(idle)
+
+    def stats(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+            in_flight = len(self._in_flight)
+        return {
+            'sessions': len(sessions),
+            'running': sum(1 for s in sessions if s.status == 'running'),
+            'in_flight': in_flight,
+            'workers': self.workers,
+            'max_sessions': self.max_sessions,
+            'max_steps': self.max_steps,
+            'tick_sec': self.tick,
+            'idle_ttl_sec': self.idle_ttl,
+            'evicted': self.evicted,
+            'slices': self.slices,
+            'total_steps': sum(s.steps for s in sessions)
+        }
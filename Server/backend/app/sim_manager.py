@@ -8,26 +8,93 @@ from collections import defaultdict
 import numpy as np
 
 from .config import (
-    GRID_W, GRID_H, N_AGENTS, 
+    GRID_W, GRID_H, FLEET, CROP_COUNT, OBSTACLE_COUNT,
     DEFAULT_ALPHA, DEFAULT_GAMMA, DEFAULT_EPS, 
     EPS_DECAY, EPS_MIN, 
     QTABLE_PATH, STATS_PATH,
-    AGENT_START_POSITIONS, ROLE_BARNS, AGENT_ROLES,
     PLANTER_CAPACITY, HARVESTER_CAPACITY, IRRIGATOR_CAPACITY,
     PLANTER_FUEL, HARVESTER_FUEL, IRRIGATOR_FUEL,
     FUEL_RECHARGE_RATE, PARCELS,
-    SAVE_FREQUENCY
+    SAVE_FREQUENCY, SHARED_Q,
+    REPLAY_CAPACITY, REPLAY_BATCH, PLANNING_STEPS,
+    LEARNER, TRACE_LAMBDA, TRACE_CAPACITY, CONVERGENCE_WINDOW,
+    STALL_WINDOW, STALL_ACTION
 )
 from .env import MultiFieldEnv
 from .agents import FarmAgent
+from .pool import AgentPool, pool_rows
+from .learning import (
+    ACTIONS, N_ACTIONS, QStore, ReplayBuffer, DynaModel, EligibilityTraces,
+    q_owners, encode_states, actions_from_moves
+)
+from .seeding import seed_streams
+from .convergence import ConvergenceMonitor
+from .stall import StallDetector, progress_counters
+from .instrumentation import PROBE
+from .tracing import TRACER
+
+# Columnas de agent_table (lo que get_state publica de cada agente)
+AGENT_FIELDS = (
+    'id', 'x', 'y', 'harvested', 'planted', 'irrigated', 'capacity_pct', 'fuel_pct',
+    'fuel', 'is_returning', 'is_fuel_low', 'is_fuel_critical', 'epsilon',
+    'states_learned', 'fuel_efficiency'
+)
+_F = {name: j for j, name in enumerate(AGENT_FIELDS)}
+
+def agent_states_from_table(table, roles):
+    """Lista 'agents' de get_state a partir de agent_table (también desde memoria compartida)"""
+    states = []
+    for row, role in zip(table.tolist(), roles):
+        states.append({
+            'id': int(row[_F['id']]),
+            'pos': [int(row[_F['x']]), int(row[_F['y']])],
+            'role': role,
+            'harvested': int(row[_F['harvested']]),
+            'planted': int(row[_F['planted']]),
+            'irrigated': int(row[_F['irrigated']]),
+            'capacity_pct': int(row[_F['capacity_pct']]),
+            'fuel_pct': int(row[_F['fuel_pct']]),
+            'fuel': float(row[_F['fuel']]),
+            'is_returning': bool(row[_F['is_returning']]),
+            'is_fuel_low': bool(row[_F['is_fuel_low']]),
+            'is_fuel_critical': bool(row[_F['is_fuel_critical']]),
+            'epsilon': float(round(row[_F['epsilon']], 4)),
+            'states_learned': int(row[_F['states_learned']]),
+            'fuel_efficiency': float(round(row[_F['fuel_efficiency']], 1))
+        })
+    return states
+
+def read_qtables(path):
+    """Q-tables guardadas por save_qs: lista (una por agente) de dict estado -> valores"""
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    tables = []
+    for agent_data in data:
+        table = defaultdict(lambda: np.zeros(5))
+        q_dict = agent_data.get('Q', agent_data)
+        for state_str, values in q_dict.items():
+            try:
+                state = eval(state_str)
+            except:
+                state = state_str
+            table[state] = np.array(values)
+        tables.append(table)
+    return tables
 
 class SimManager:
-    def __init__(self):
+    def __init__(self, w=GRID_W, h=GRID_H, fleet=None, crop_count=CROP_COUNT,
+                 obst_count=OBSTACLE_COUNT, parcels=None, shared_q=None,
+                 replay_batch=None, planning_steps=None, seed=None, stall_window=None):
+        # Flujos aleatorios independientes (mapa, agentes, aprendizaje) de una semilla raíz
+        streams = seed_streams(seed)
         self.env = MultiFieldEnv(
-            w=GRID_W, 
-            h=GRID_H, 
-            n_agents=N_AGENTS,
-            parcels=PARCELS
+            w=w, 
+            h=h, 
+            fleet=fleet or FLEET,
+            crop_count=crop_count,
+            obst_count=obst_count,
+            parcels=parcels if parcels is not None else PARCELS,
+            rng=streams['env']
         )
         
         # Crear agentes con graneros correctos Y combustible
@@ -44,10 +111,16 @@ class SimManager:
             'irrigator': IRRIGATOR_FUEL
         }
         
-        for i in range(N_AGENTS):
-            role = AGENT_ROLES[i]
-            start_pos = AGENT_START_POSITIONS[i]
-            barn_pos = ROLE_BARNS[role]
+        # Un agente por entrada de la flota del entorno (roles y salidas),
+        # todos como vistas de un único pool de estado y un único QStore
+        # (con shared_q, una Q-table por rol en lugar de una por agente)
+        self.shared_q = SHARED_Q if shared_q is None else bool(shared_q)
+        pool = AgentPool(len(self.env.agent_roles))
+        qstore = QStore()
+        agent_rngs = streams['agents'].spawn(len(self.env.agent_roles))
+        for i, role in enumerate(self.env.agent_roles):
+            start_pos = self.env.agents_init[i]
+            barn_pos = self.env._get_barn_for_role(role)
             capacity = capacities[role]
             fuel = fuels[role]
             
@@ -60,7 +133,11 @@ class SimManager:
                 gamma=DEFAULT_GAMMA,
                 eps=DEFAULT_EPS,
                 capacity=capacity,
-                fuel=fuel
+                fuel=fuel,
+                pool=pool,
+                qstore=qstore,
+                shared_q=self.shared_q,
+                rng=agent_rngs[i]
             )
             self.agents.append(agent)
         
@@ -84,72 +161,189 @@ class SimManager:
             'gamma': DEFAULT_GAMMA,
             'eps': DEFAULT_EPS,
             'eps_decay': EPS_DECAY,
-            'eps_min': EPS_MIN
+            'eps_min': EPS_MIN,
+            'learner': LEARNER,
+            'trace_lambda': TRACE_LAMBDA,
+            'early_stopping': CONVERGENCE_WINDOW > 0
         }
         
         self.running_trained = False
         self.trained_thread = None
         self.QTABLE_PATH = QTABLE_PATH
+        self.STATS_PATH = STATS_PATH
+        
+        # Repaso de experiencia (replay) y planificación Dyna-Q sobre el QStore
+        self.replay_batch = REPLAY_BATCH if replay_batch is None else int(replay_batch)
+        self.planning_steps = PLANNING_STEPS if planning_steps is None else int(planning_steps)
+        self.replay = ReplayBuffer(REPLAY_CAPACITY) if self.replay_batch > 0 else None
+        self.model = DynaModel() if self.planning_steps > 0 else None
+        self.rng = streams['learning']
+        # Corte de episodios atascados (0 = siempre hasta steps_per_episode)
+        self.stall_window = STALL_WINDOW if stall_window is None else int(stall_window)
+        self.stall_action = STALL_ACTION
 
-    def get_state(self):
+    def get_state(self, since=None, encoding='list'):
         with self.lock:
-            grid = self.env.grid.copy()
-            
-            agent_states = []
-            for a in self.agents:
-                agent_states.append({
-                    'id': int(a.id),
-                    'pos': list(a.pos),
-                    'role': str(a.role),
-                    'harvested': int(a.harvested),
-                    'planted': int(a.planted),
-                    'irrigated': int(a.irrigated),
-                    'capacity_pct': int(a.get_capacity_percentage()),
-                    'fuel_pct': int(a.get_fuel_percentage()),
-                    'fuel': float(a.current_fuel),
-                    'is_returning': bool(a.is_returning_to_barn),
-                    'is_fuel_low': bool(a.is_fuel_low()),
-                    'is_fuel_critical': bool(a.is_fuel_critical()),
-                    'epsilon': float(round(a.eps, 4)),
-                    'states_learned': int(len(a.Q)),
-                    'fuel_efficiency': float(round(a.calculate_efficiency_score(), 1))
-                })
-            
-            metrics = self.env.get_metrics()
-            
-            # Calcular estadísticas agregadas de combustible
-            total_fuel_consumed = float(sum(a.fuel_consumed for a in self.agents))
-            avg_fuel_efficiency = float(np.mean([a.calculate_efficiency_score() for a in self.agents]))
-            
-            meta = {
-                'step': int(self.env.step_count),
-                'harvested_total': int(self.env.harvested_total),
-                'planted_total': int(self.env.planted_total),
-                'irrigated_total': int(self.env.irrigated_total),
-                'is_training': bool(self.running),
-                'is_running_trained': bool(self.running_trained),
-                'total_agents': int(len(self.agents)),
-                'objectives': {
-                    'planted': f"{self.env.planted_total}/{self.env.target_planted}",
-                    'irrigated': f"{self.env.irrigated_total}/{self.env.target_irrigated}",
-                    'harvested': f"{self.env.harvested_total}/{self.env.target_harvested}"
-                },
-                'task_complete': bool(self.env.is_task_complete()),
-                'total_fuel_consumed': float(total_fuel_consumed),
-                'avg_fuel_efficiency': float(round(avg_fuel_efficiency, 1)),
-                'parcels': int(len(self.env.parcels)),
-                'metrics': metrics  # Ya está convertido en get_metrics()
-            }
+            grid_payload = self.env.serialize_grid(since=since, encoding=encoding)
+            agent_states = agent_states_from_table(self.agent_table(), self.agent_role_names())
+            meta = self.state_meta()
         
         return {
-            'grid': grid.tolist(),
+            **grid_payload,
             'agents': agent_states,
             'blackboard': {},  # Simplificado para evitar problemas de serialización
             'meta': meta
         }
 
-    def train_background(self, episodes=50, steps_per_episode=2000):
+    def agent_role_names(self):
+        return [str(a.role) for a in self.agents]
+
+    def agent_table(self):
+        """Estado visible de la flota como array [agentes, AGENT_FIELDS] (columnas del pool)"""
+        pool, rows = pool_rows(self.agents)
+        store, owners = q_owners(self.agents)
+        columns = {
+            'id': [a.id for a in self.agents],
+            'x': pool.x[rows],
+            'y': pool.y[rows],
+            'harvested': pool.harvested[rows],
+            'planted': pool.planted[rows],
+            'irrigated': pool.irrigated[rows],
+            'capacity_pct': pool.capacity_percentage(rows),
+            'fuel_pct': pool.fuel_percentage(rows),
+            'fuel': pool.current_fuel[rows],
+            'is_returning': pool.is_returning_to_barn[rows],
+            'is_fuel_low': pool.is_fuel_low(rows),
+            'is_fuel_critical': pool.is_fuel_critical(rows),
+            'epsilon': pool.eps[rows],
+            'states_learned': [store.count(o) for o in owners.tolist()],
+            'fuel_efficiency': pool.efficiency_score(rows)
+        }
+        table = np.empty((len(self.agents), len(AGENT_FIELDS)))
+        for j, name in enumerate(AGENT_FIELDS):
+            table[:, j] = columns[name]
+        return table
+
+    def state_meta(self):
+        """Bloque 'meta' de get_state (contadores, objetivos, combustible, métricas)"""
+        pool, rows = pool_rows(self.agents)
+        metrics = self.env.get_metrics()
+        
+        # Calcular estadísticas agregadas de combustible
+        total_fuel_consumed = float(pool.fuel_consumed[rows].sum())
+        avg_fuel_efficiency = float(np.mean(pool.efficiency_score(rows))) if len(rows) else 0.0
+        
+        return {
+            'step': int(self.env.step_count),
+            'harvested_total': int(self.env.harvested_total),
+            'planted_total': int(self.env.planted_total),
+            'irrigated_total': int(self.env.irrigated_total),
+            'is_training': bool(self.running),
+            'is_running_trained': bool(self.running_trained),
+            'total_agents': int(len(self.agents)),
+            'objectives': {
+                'planted': f"{self.env.planted_total}/{self.env.target_planted}",
+                'irrigated': f"{self.env.irrigated_total}/{self.env.target_irrigated}",
+                'harvested': f"{self.env.harvested_total}/{self.env.target_harvested}"
+            },
+            'task_complete': bool(self.env.is_task_complete()),
+            'total_fuel_consumed': float(total_fuel_consumed),
+            'avg_fuel_efficiency': float(round(avg_fuel_efficiency, 1)),
+            'parcels': int(len(self.env.parcels)),
+            'metrics': metrics  # Ya está convertido en get_metrics()
+        }
+
+    @property
+    def parcel_count(self):
+        return len(self.env.parcels)
+
+    def update_params(self, values):
+        """Actualiza hiperparámetros (se aplican al empezar el próximo episodio)"""
+        self.params.update(values)
+        return dict(self.params)
+
+    def get_train_stats(self):
+        """Copia de train_stats (la lista de episodios también se copia)"""
+        stats = dict(self.train_stats)
+        stats['episodes'] = list(stats.get('episodes', []))
+        return stats
+
+    def get_fleet_metrics(self):
+        """Métricas del entorno más las de combustible de la flota"""
+        env_metrics = self.env.get_metrics()
+        pool, rows = pool_rows(self.agents)
+        fuel_pct = pool.fuel_percentage(rows)
+        
+        # Agregar métricas de combustible
+        agent_fuel_stats = {
+            'avg_fuel_pct': float(fuel_pct.mean()),
+            'low_fuel_count': int(np.count_nonzero(fuel_pct <= 30)),
+            'critical_fuel_count': int(np.count_nonzero(fuel_pct <= 10)),
+            'total_fuel_consumed': float(pool.fuel_consumed[rows].sum()),
+            'avg_fuel_efficiency': float(pool.efficiency_score(rows).mean())
+        }
+        return {**env_metrics, 'fuel_stats': agent_fuel_stats}
+
+    def get_agents_info(self):
+        """Estadísticas por agente, reparto de roles y resumen de combustible"""
+        roles = self.agent_role_names()
+        return {
+            'agents': [a.get_stats() for a in self.agents],
+            'total_agents': int(len(self.agents)),
+            'roles': {
+                'planter': int(roles.count('planter')),
+                'harvester': int(roles.count('harvester')),
+                'irrigator': int(roles.count('irrigator'))
+            },
+            'fuel_system': {
+                'enabled': True,
+                'avg_fuel_pct': float(sum(a.get_fuel_percentage() for a in self.agents) / len(self.agents)),
+                'refills_total': int(sum(a.fuel_refills for a in self.agents))
+            }
+        }
+
+    def get_parcels_info(self):
+        """Límites, área y cultivos actuales de cada parcela"""
+        parcels_data = []
+        for i, parcel in enumerate(self.env.parcels):
+            # Contar cultivos en cada parcela
+            y0, y1 = max(0, parcel['y_start']), min(self.env.h, parcel['y_end'])
+            x0, x1 = max(0, parcel['x_start']), min(self.env.w, parcel['x_end'])
+            crops_in_parcel = 0
+            if y1 > y0 and x1 > x0:
+                crops_in_parcel = int(np.count_nonzero(self.env.grid[y0:y1, x0:x1] == 2))  # CROP
+            
+            parcels_data.append({
+                'id': int(i),
+                'name': str(parcel.get('name', f'Parcela {i+1}')),
+                'bounds': {
+                    'x_start': int(parcel['x_start']),
+                    'x_end': int(parcel['x_end']),
+                    'y_start': int(parcel['y_start']),
+                    'y_end': int(parcel['y_end'])
+                },
+                'area': int((parcel['x_end'] - parcel['x_start']) * (parcel['y_end'] - parcel['y_start'])),
+                'crops_current': int(crops_in_parcel)
+            })
+        
+        return {
+            'total_parcels': int(len(self.env.parcels)),
+            'parcels': parcels_data
+        }
+
+    def train_background(self, episodes=50, steps_per_episode=2000, on_episode=None, persist=True):
+        """
+        Bucle de entrenamiento. `on_episode(episode_data)` se llama al cerrar
+        cada episodio; si devuelve False el entrenamiento se detiene. Con
+        persist=False no se escriben Q-tables ni estadísticas en disco.
+        Con params['early_stopping'] para al detectar la meseta; el motivo
+        queda en train_stats['stop_reason'] ('completed', 'converged', 'stopped').
+        """
         self.running = True
+        monitor = ConvergenceMonitor() if self.params.get('early_stopping') else None
+        self.train_stats['stop_reason'] = None
+        self.train_stats['convergence'] = None
+        stop_reason = 'completed'
         print("\n" + "="*70)
         print(f"ENTRENAMIENTO: {episodes} episodios")
         print(f"Sistema de combustible: ACTIVO")
@@ -161,85 +355,132 @@ class SimManager:
         
         for ep in range(episodes):
             if not self.running:
+                stop_reason = 'stopped'
                 break
             
-            obs = self.env.reset()
-            
-            for i, agent in enumerate(self.agents):
-                if i < len(self.env.agents_init):
-                    agent.pos = self.env.agents_init[i]
-                agent.harvested = 0
-                agent.planted = 0
-                agent.irrigated = 0
-                agent.current_capacity = agent.max_capacity
-                agent.current_fuel = agent.max_fuel
-                agent.is_returning_to_barn = False
-                agent.set_eps(self.params['eps'])
+            pool, rows = self._reset_episode(eps=self.params['eps'])
+            # Q-tables de la flota en un QStore: estados como claves enteras
+            store, owners = q_owners(self.agents)
+            # alpha/gamma de self.params (los cambia /train o /params entre episodios)
+            for agent in self.agents:
+                agent.alpha = self.params['alpha']
+                agent.gamma = self.params['gamma']
+            alphas = np.array([a.alpha for a in self.agents])
+            gammas = np.array([a.gamma for a in self.agents])
             
             episode_reward = 0.0
             episode_fuel_consumed = 0
+            episode_td_error = 0.0
+            episode_q_delta = 0.0
+            episode_agreement = 0.0
+            # Q(lambda): trazas nuevas en cada episodio
+            traces = None
+            if self.params.get('learner') == 'q_lambda':
+                traces = EligibilityTraces(self.params['trace_lambda'], TRACE_CAPACITY)
             prev_phase = self.env.cycle_phase
+            keys = None
+            learn = {}
+            stall = StallDetector(self.stall_window) if self.stall_window > 0 else None
+            if stall is not None:
+                stall.reset(progress_counters(self.env), pool.x[rows], pool.y[rows])
+            stalls = []
             
             for step in range(steps_per_episode):
                 if not self.running:
                     break
                 
+                tracing = TRACER.active
+                if tracing:
+                    TRACER.begin_step(self.env.step_count + 1)
+                
                 # Detectar cambio de fase
                 current_phase = self.env.cycle_phase
                 if current_phase != prev_phase:
                     print(f"  → Fase cambiada: {prev_phase} → {current_phase}")
                     prev_phase = current_phase
                 
-                obs_list = self.env._get_obs()
-                
-                while len(obs_list) < len(self.agents):
-                    obs_list.append(obs_list[-1] if obs_list else {
-                        'pos': (1, 1),
-                        'goal': self.env.manager_pos,
-                        'nearby': set(),
-                        'blackboard': self.env.blackboard
-                    })
+                # Los estados siguientes del paso anterior son los actuales de éste
+                if keys is None:
+                    with PROBE.section('get_obs'):
+                        keys = store.keys(owners, encode_states(
+                            self.env.observe_array(self.agents, fresh=True)))
 
-                proposals = self.env.step(self.agents)
-                
-                counts = {}
-                for p in proposals:
-                    counts[p] = counts.get(p, 0) + 1
+                with PROBE.section('env_step'):
+                    proposals = self.env.step(self.agents)
                 
-                finals = []
-                for i, p in enumerate(proposals):
-                    finals.append(self.agents[i].pos if counts[p] > 1 else p)
+                finals = self.env.resolve_collisions(self.agents, proposals)
+                start_x, start_y = pool.x[rows].copy(), pool.y[rows].copy()
                 
-                rewards, infos, done = self.env.apply_final_positions_and_harvest(
-                    self.agents, finals
-                )
+                with PROBE.section('apply_final_positions_and_harvest'):
+                    rewards, infos, done = self.env.apply_final_positions_and_harvest(
+                        self.agents, finals
+                    )
                 
                 episode_reward += sum(rewards)
-                episode_fuel_consumed += sum(a.fuel_consumed for a in self.agents)
+                episode_fuel_consumed += float(pool.fuel_consumed[rows].sum())
                 
-                obs2_list = self.env._get_obs()
-                while len(obs2_list) < len(self.agents):
-                    obs2_list.append(obs2_list[-1])
+                with PROBE.section('get_obs'):
+                    next_keys = store.keys(owners, encode_states(self.env.observe_array(self.agents)))
                 
-                for i, agent in enumerate(self.agents):
-                    state = agent.obs_to_state(obs_list[i])
-                    next_state = agent.obs_to_state(obs2_list[i])
+                # Una sola actualización TD para toda la flota
+                with PROBE.section('update_q'):
+                    if tracing:
+                        t0 = TRACER.now()
+                    # Acción = movimiento realmente hecho en este paso (sin combustible, quieto)
+                    actions = actions_from_moves(pool.x[rows] - start_x, pool.y[rows] - start_y)
+                    # Calidad de la política: la acción greedy coincide con la hecha (antes de aprenderla)
+                    greedy = store.greedy(keys)
+                    episode_agreement += float(np.mean(greedy == actions))
+                    store.td_update(keys, actions, rewards, next_keys, alphas, gammas, done, stats=learn)
+                    if traces is not None:
+                        # Watkins: una acción exploratoria corta la traza de su agente
+                        traces.cut(np.flatnonzero((greedy != actions) & (greedy >= 0)))
+                        traces.step(store, learn['rows'], actions,
+                                    alphas * learn['td_error'], gammas)
+                    pool.q_updates[rows] += 1
+                    pool.states_discovered[rows] += learn['created']
+                    episode_td_error += float(np.abs(learn['td_error']).mean())
+                    episode_q_delta += float(np.abs(alphas * learn['td_error']).mean())
                     
-                    action_map_inv = {(0,0): 0, (1,0): 1, (-1,0): 2, (0,1): 3, (0,-1): 4}
-                    actual_move = (finals[i][0] - self.agents[i].pos[0], 
-                                 finals[i][1] - self.agents[i].pos[1])
-                    action_taken = action_map_inv.get(actual_move, 0)
-                    
-                    agent.update_q(state, action_taken, rewards[i], next_state, done)
+                    if self.replay is not None:
+                        self.replay.add(keys, actions, rewards, next_keys, done, alphas, gammas)
+                        self.replay.replay(store, self.replay_batch, self.rng)
+                    if self.model is not None:
+                        self.model.update(keys, actions, rewards, next_keys, done, alphas, gammas)
+                        self.model.plan(store, self.planning_steps, self.rng)
+                    if tracing:
+                        for i, agent in enumerate(self.agents):
+                            TRACER.add('q_update', TRACER.agent_tid(agent), t0,
+                                       {'action': int(actions[i]), 'reward': rewards[i]})
+                
+                pool.decay_epsilon(rows, self.params['eps_decay'])
+                keys = next_keys
                 
-                for agent in self.agents:
-                    agent.decay_epsilon(self.params['eps_decay'])
+                if tracing:
+                    TRACER.end_step()
                 
                 if done:
                     break
+                
+                if stall is not None:
+                    cause = stall.update(progress_counters(self.env), pool.x[rows], pool.y[rows],
+                                         pool.current_fuel[rows], pool.is_at_barn(rows))
+                    if cause is not None:
+                        stalls.append({'step': step + 1, 'cause': cause, 'agents': stall.counts})
+                        if self.stall_action == 'end':
+                            break
+                        if self.stall_action == 'reset':
+                            # Mapa y flota de nuevo al inicio; se sigue con los pasos que quedan
+                            self._reset_episode()
+                            if traces is not None:
+                                traces.clear()
+                            keys = None
+                        # Con 'log' sólo se anota: el siguiente atasco se mide desde aquí
+                        stall.reset(progress_counters(self.env), pool.x[rows], pool.y[rows])
             
             avg_epsilon = np.mean([a.eps for a in self.agents])
-            total_states = sum(len(a.Q) for a in self.agents)
+            # Estados distintos en el QStore (una tabla por rol cuenta una vez)
+            total_states = len(store)
             avg_fuel_efficiency = np.mean([a.calculate_efficiency_score() for a in self.agents])
             
             baseline_steps = 1000  # Tiempo sin optimización
@@ -255,6 +496,14 @@ class SimManager:
                 'steps': step + 1,
                 'avg_epsilon': round(avg_epsilon, 4),
                 'total_states_learned': total_states,
+                'qtable_bytes': store.nbytes,
+                'td_error': round(episode_td_error / (step + 1), 4),
+                'q_delta': round(episode_q_delta / (step + 1), 4),
+                'policy_agreement': round(episode_agreement / (step + 1), 4),
+                'stall_cause': stalls[-1]['cause'] if stalls else None,
+                'stall_step': stalls[-1]['step'] if stalls else None,
+                'stall_agents': stalls[-1]['agents'] if stalls else None,
+                'stalls': len(stalls),
                 'fuel_consumed': round(episode_fuel_consumed, 2),
                 'avg_fuel_efficiency': round(avg_fuel_efficiency, 1),
                 'time_saved_pct': round(time_saved_pct, 1)
@@ -281,13 +530,28 @@ class SimManager:
                       f"Steps:{step+1:4d} | Fuel:{avg_fuel_efficiency:.1f}% | "
                       f"{task_status}")
             
-            if (ep + 1) % SAVE_FREQUENCY == 0:
+            if persist and (ep + 1) % SAVE_FREQUENCY == 0:
                 self.save_qs()
                 self.save_stats()
+            
+            if monitor is not None and monitor.update(episode_reward, step + 1,
+                                                      episode_q_delta / (step + 1), total_states):
+                stop_reason = 'converged'
+                print(f"✅ Convergencia en el episodio {ep + 1}: {monitor.status()['checks']}")
+                self.running = False
+            
+            if on_episode is not None and on_episode(episode_data) is False:
+                self.running = False
+            if stop_reason == 'converged':
+                break
         
         self.running = False
-        self.save_qs()
-        self.save_stats()
+        self.train_stats['stop_reason'] = stop_reason
+        if monitor is not None:
+            self.train_stats['convergence'] = monitor.status()
+        if persist:
+            self.save_qs()
+            self.save_stats()
         
         print("\n" + "="*70)
         print("ENTRENAMIENTO COMPLETADO")
@@ -295,6 +559,17 @@ class SimManager:
         print(f"  Eficiencia promedio: {avg_fuel_efficiency:.1f}%")
         print("="*70 + "\n")
 
+    def _reset_episode(self, eps=None):
+        """Mapa nuevo y flota en sus salidas con carga y combustible llenos"""
+        self.env.reset()
+        for i, agent in enumerate(self.agents):
+            if i < len(self.env.agents_init):
+                agent.pos = self.env.agents_init[i]
+        pool, rows = pool_rows(self.agents)
+        pool.reset_episode(rows, eps=eps)
+        self.env.place_agents(self.agents)
+        return pool, rows
+
     def start_training(self, episodes=50, steps_per_episode=1000):
         if self.running:
             return False
@@ -306,17 +581,18 @@ class SimManager:
         self.train_thread.start()
         return True
 
-    def stop_training(self):
+    def stop_training(self, persist=True):
         self.running = False
         if self.train_thread:
             self.train_thread.join(timeout=2)
-        self.save_qs()
-        self.save_stats()
+        if persist:
+            self.save_qs()
+            self.save_stats()
         return True
 
     def save_qs(self, path=None):
         if path is None:
-            path = QTABLE_PATH
+            path = self.QTABLE_PATH
         data = []
         for agent in self.agents:
             agent_q = {}
@@ -334,31 +610,28 @@ class SimManager:
 
     def load_qs(self, path=None):
         if path is None:
-            path = QTABLE_PATH
+            path = self.QTABLE_PATH
         if not os.path.exists(path):
             return False
         try:
-            with open(path, 'rb') as f:
-                data = pickle.load(f)
-            for i, agent in enumerate(self.agents):
-                if i < len(data):
-                    agent_data = data[i]
-                    new_q = defaultdict(lambda: np.zeros(5))
-                    q_dict = agent_data.get('Q', agent_data)
-                    for state_str, values in q_dict.items():
-                        try:
-                            state = eval(state_str)
-                        except:
-                            state = state_str
-                        new_q[state] = np.array(values)
-                    agent.Q = new_q
+            self.apply_qtables(read_qtables(path))
             print(f"✓ Q-tables cargadas")
             return True
         except Exception as e:
             print(f"✗ Error: {e}")
             return False
 
-    def save_stats(self):
+    def reload_qs(self, path=None):
+        """load_qs con el lock del bucle: cambia las tablas sin pisar un paso en curso"""
+        with self.lock:
+            return self.load_qs(path)
+
+    def apply_qtables(self, tables):
+        """Copia en los agentes las tablas de read_qtables (una por agente, en orden)"""
+        for agent, table in zip(self.agents, tables):
+            agent.Q = table
+
+    def save_stats(self, path=None):
         try:
             stats_to_save = {
                 'episodes': [
@@ -372,6 +645,14 @@ class SimManager:
                         'steps': int(ep.get('steps', 0)),
                         'avg_epsilon': float(ep.get('avg_epsilon', 0)),
                         'total_states_learned': int(ep.get('total_states_learned', 0)),
+                        'qtable_bytes': int(ep.get('qtable_bytes', 0)),
+                        'td_error': float(ep.get('td_error', 0)),
+                        'q_delta': float(ep.get('q_delta', 0)),
+                        'policy_agreement': float(ep.get('policy_agreement', 0)),
+                        'stall_cause': ep.get('stall_cause'),
+                        'stall_step': ep.get('stall_step'),
+                        'stall_agents': ep.get('stall_agents'),
+                        'stalls': int(ep.get('stalls', 0)),
                         'fuel_consumed': float(ep.get('fuel_consumed', 0)),
                         'avg_fuel_efficiency': float(ep.get('avg_fuel_efficiency', 0)),
                         'time_saved_pct': float(ep.get('time_saved_pct', 0))
@@ -379,21 +660,32 @@ class SimManager:
                     for ep in self.train_stats.get('episodes', [])
                 ],
                 'best_reward': float(self.train_stats.get('best_reward', 0)),
-                'best_episode': int(self.train_stats.get('best_episode', 0))
+                'best_episode': int(self.train_stats.get('best_episode', 0)),
+                'stop_reason': self.train_stats.get('stop_reason'),
+                'convergence': self.train_stats.get('convergence')
             }
             
-            with open(STATS_PATH, 'w') as f:
+            with open(path or self.STATS_PATH, 'w') as f:
                 json.dump(stats_to_save, f, indent=2)
         except Exception as e:
             print(f"Error guardando stats: {e}")
 
-    def best_action(self, agent, obs):
-        state = agent.obs_to_state(obs)
-        if state not in agent.Q:
-            return np.random.randint(0, 5)
-        return int(np.argmax(agent.Q[state]))
+    def best_actions(self, states=None):
+        """
+        Acción greedy de toda la flota en un lote; los estados no vistos reciben
+        una acción aleatoria, sacadas todas de una vez del generador del simulador.
+        """
+        if states is None:
+            states = self.env.observe_array(self.agents)
+        store, owners = q_owners(self.agents)
+        greedy = store.greedy(store.keys(owners, encode_states(states)))
+        unseen = greedy < 0
+        if unseen.any():
+            greedy[unseen] = self.rng.integers(0, N_ACTIONS, int(unseen.sum()))
+        return greedy
 
-    def run_trained_loop(self, sleep=0.12):
+    def reset_live(self):
+        """Episodio nuevo para el bucle en vivo (política entrenada, sin aprender)"""
         with self.lock:
             self.env.reset()
             for i, agent in enumerate(self.agents):
@@ -402,21 +694,30 @@ class SimManager:
                 agent.current_capacity = agent.max_capacity
                 agent.current_fuel = agent.max_fuel
                 agent.is_returning_to_barn = False
-        
-        self.running_trained = True
-        while self.running_trained:
-            with self.lock:
-                obs_list = self.env._get_obs()
-                actions = {}
-                for i, agent in enumerate(self.agents):
-                    action_idx = self.best_action(agent, obs_list[i])
-                    actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[action_idx]
+            self.env.place_agents(self.agents)
+
+    def step_live(self):
+        """Un paso del bucle en vivo con la acción greedy de cada agente"""
+        with self.lock:
+            tracing = TRACER.active
+            if tracing:
+                TRACER.begin_step(self.env.step_count + 1)
+            with PROBE.section('get_obs'):
+                states = self.env.observe_array(self.agents)
+            actions = {i: ACTIONS[a] for i, a in enumerate(self.best_actions(states).tolist())}
+            with PROBE.section('env_step'):
                 proposals = self.env.step(self.agents, actions_by_q=actions)
-                counts = {}
-                for p in proposals:
-                    counts[p] = counts.get(p, 0) + 1
-                finals = [self.agents[i].pos if counts[p] > 1 else p for i, p in enumerate(proposals)]
+            finals = self.env.resolve_collisions(self.agents, proposals)
+            with PROBE.section('apply_final_positions_and_harvest'):
                 self.env.apply_final_positions_and_harvest(self.agents, finals)
+            if tracing:
+                TRACER.end_step()
+
+    def run_trained_loop(self, sleep=0.12):
+        self.reset_live()
+        self.running_trained = True
+        while self.running_trained:
+            self.step_live()
             time.sleep(sleep)
         return True
 
@@ -0,0 +1,81 @@
+# backend/app/stall.py
+import numpy as np
+
+from .config import STALL_WINDOW, STALL_LOOP_SPAN
+
+# Motivos de atasco por agente, en orden de prioridad para el motivo dominante
+STALL_CAUSES = ('out_of_fuel', 'frozen', 'looping')
+# Motivo del episodio cuando ningún agente encaja: la flota se mueve por el mapa sin avanzar
+WANDERING = 'wandering'
+
+
+def progress_counters(env):
+    """Contadores de avance del ciclo: plantado, irrigado y cosechado"""
+    return (int(env.planted_total), int(env.irrigated_total), int(env.harvested_total))
+
+
+class StallDetector:
+    """
+    Detecta episodios atascados: `window` pasos seguidos sin que cambie ningún
+    contador de avance. Entonces clasifica a cada agente por lo que hizo en ese tramo:
+    - 'out_of_fuel': depósito vacío lejos del granero
+    - 'frozen': con combustible pero sin moverse (bloqueado por colisiones)
+    - 'looping': se movió sin salir de un recuadro de `loop_span` celdas
+    El motivo del atasco es el más frecuente (`counts` guarda el reparto);
+    si ninguno encaja es 'wandering'.
+    """
+
+    def __init__(self, window=STALL_WINDOW, loop_span=STALL_LOOP_SPAN):
+        self.window = max(1, window)
+        self.loop_span = max(1, loop_span)
+        self.progress = None
+        self.x = self.y = None
+        self.moved = None
+        self.lo_x = self.hi_x = self.lo_y = self.hi_y = None
+        self.idle_steps = 0
+        self.counts = {}
+
+    def reset(self, progress, x, y):
+        self.progress = tuple(progress)
+        self.x = np.array(x, copy=True)
+        self.y = np.array(y, copy=True)
+        self._restart()
+
+    def _restart(self):
+        """Empieza un tramo nuevo en las posiciones actuales"""
+        self.moved = np.zeros(len(self.x), dtype=bool)
+        self.lo_x, self.hi_x = self.x.copy(), self.x.copy()
+        self.lo_y, self.hi_y = self.y.copy(), self.y.copy()
+        self.idle_steps = 0
+
+    def update(self, progress, x, y, fuel, at_barn):
+        """Registra un paso; devuelve el motivo del atasco o None"""
+        self.moved |= (x != self.x) | (y != self.y)
+        self.x[...] = x
+        self.y[...] = y
+        np.minimum(self.lo_x, x, out=self.lo_x)
+        np.maximum(self.hi_x, x, out=self.hi_x)
+        np.minimum(self.lo_y, y, out=self.lo_y)
+        np.maximum(self.hi_y, y, out=self.hi_y)
+        progress = tuple(progress)
+        if progress != self.progress:
+            self.progress = progress
+            self._restart()
+            return None
+        self.idle_steps += 1
+        if self.idle_steps < self.window:
+            return None
+
+        causes = self.agent_causes(fuel, at_barn)
+        self.counts = {cause: int(np.count_nonzero(causes == cause)) for cause in STALL_CAUSES}
+        self.counts[WANDERING] = int(np.count_nonzero(causes == ''))
+        best = max(STALL_CAUSES, key=lambda cause: self.counts[cause])
+        return best if self.counts[best] > 0 else WANDERING
+
+    def agent_causes(self, fuel, at_barn):
+        """Motivo de cada agente en el tramo actual ('' si sigue recorriendo el mapa)"""
+        span = np.maximum(self.hi_x - self.lo_x, self.hi_y - self.lo_y)
+        empty = (fuel <= 0) & ~at_barn
+        return np.select(
+            [empty, ~self.moved & (fuel > 0), self.moved & (span <= self.loop_span)],
+            list(STALL_CAUSES), default='')
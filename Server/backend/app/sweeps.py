@@ -0,0 +1,342 @@
+# backend/app/sweeps.py
+import argparse
+import contextlib
+import io
+import itertools
+import math
+import multiprocessing as mp
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .config import SWEEP_WORKERS
+from .seeding import spawn_seeds
+
+# Parámetros de SimManager.params que admite un barrido
+TUNABLE = ('alpha', 'gamma', 'eps', 'eps_decay', 'learner', 'trace_lambda')
+# Métricas numéricas de episodio (train_background) por las que se puede ordenar
+METRICS = ('reward', 'planted', 'irrigated', 'harvested', 'steps', 'avg_epsilon',
+           'total_states_learned', 'qtable_bytes', 'td_error', 'q_delta', 'policy_agreement',
+           'stalls', 'fuel_consumed', 'avg_fuel_efficiency', 'time_saved_pct')
+# Métricas de episodio en las que menos es mejor
+MINIMIZE = ('td_error', 'steps', 'fuel_consumed')
+
+
+def expand_space(space, search='grid', n_trials=None, seed=0):
+    """
+    Combinaciones de parámetros de un espacio de búsqueda.
+      grid:   {'alpha': [0.1, 0.5], 'gamma': [0.9, 0.95]} -> producto cartesiano
+      random: cada parámetro es una lista (se elige un valor) o un rango
+              {'low': 0.1, 'high': 0.9, 'log': False} (muestreo uniforme)
+    `n_trials` recorta el grid y es el número de muestras en random.
+    """
+    unknown = [name for name in space if name not in TUNABLE]
+    if unknown:
+        raise ValueError(f"Parámetros no ajustables: {', '.join(unknown)} (válidos: {', '.join(TUNABLE)})")
+    names = list(space)
+    if search == 'grid':
+        for name in names:
+            if not isinstance(space[name], (list, tuple)) or not space[name]:
+                raise ValueError(f"En grid '{name}' debe ser una lista de valores")
+        combos = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+        return combos[:n_trials] if n_trials else combos
+    if search != 'random':
+        raise ValueError(f"Búsqueda desconocida: {search}")
+    rng = np.random.default_rng(seed)
+    trials = []
+    for _ in range(n_trials or 8):
+        params = {}
+        for name in names:
+            spec = space[name]
+            if isinstance(spec, dict):
+                low, high = float(spec['low']), float(spec['high'])
+                if spec.get('log'):
+                    params[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+                else:
+                    params[name] = float(rng.uniform(low, high))
+            else:
+                params[name] = spec[int(rng.integers(len(spec)))]
+        trials.append(params)
+    return trials
+
+
+def run_trial(trial_id, params, seed, episodes, steps_per_episode, sim_kwargs, events, stop_flags):
+    """
+    Un entrenamiento completo en un proceso del pool. Cada episodio se envía
+    a `events`; el proceso padre puede cortar el trial marcándolo en `stop_flags`.
+    """
+    from .sim_manager import SimManager
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim = SimManager(seed=seed, **(sim_kwargs or {}))
+        sim.params.update(params)
+
+        def on_episode(episode_data):
+            events.put(('episode', trial_id, episode_data))
+            return not stop_flags.get(trial_id, False)
+
+        sim.train_background(episodes=episodes, steps_per_episode=steps_per_episode,
+                             on_episode=on_episode, persist=False)
+    return len(sim.train_stats['episodes'])
+
+
+class Sweep:
+    """
+    Barrido de hiperparámetros: trials independientes de SimManager repartidos
+    en un pool de procesos, cada uno con su semilla. Las curvas llegan episodio
+    a episodio a la tabla de resultados; con early_stopping se cortan los trials
+    cuya métrica media queda por debajo de la mediana de los demás en el mismo
+    episodio (regla de la mediana, tras `grace_episodes`).
+    """
+
+    def __init__(self, space, search='grid', n_trials=None, episodes=20, steps_per_episode=400,
+                 workers=None, seed=0, metric='policy_agreement', early_stopping=True,
+                 grace_episodes=3, window=3, sim_kwargs=None, on_event=None):
+        if metric not in METRICS:
+            raise ValueError(f"Métrica desconocida: {metric} (válidas: {', '.join(METRICS)})")
+        combos = expand_space(space, search, n_trials, seed)
+        if not combos:
+            raise ValueError("El espacio de búsqueda no genera ningún trial")
+        self.id = uuid.uuid4().hex[:8]
+        self.space = space
+        self.search = search
+        self.episodes = episodes
+        self.steps_per_episode = steps_per_episode
+        self.workers = max(1, min(workers or SWEEP_WORKERS, len(combos)))
+        self.metric = metric
+        self.maximize = metric not in MINIMIZE
+        self.early_stopping = early_stopping
+        self.grace_episodes = grace_episodes
+        self.window = window
+        self.sim_kwargs = sim_kwargs or {}
+        self.on_event = on_event
+        # Semilla de cada trial derivada de la raíz con SeedSequence
+        seeds = spawn_seeds(seed, len(combos))
+        self.trials = [{
+            'trial': i,
+            'params': params,
+            'seed': seeds[i],
+            'status': 'pending',
+            'episodes': 0,
+            'curve': [],
+            'score': None,
+            'stop_reason': None,
+            'error': None
+        } for i, params in enumerate(combos)]
+        self.status = 'pending'
+        self.started_at = None
+        self.finished_at = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self._stop_flags = None
+        self._cancelled = False
+
+    # ---------- ejecución ----------
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        self.status = 'running'
+        self.started_at = time.time()
+        # spawn: los workers no heredan hilos ni estado global del servidor
+        ctx = mp.get_context('spawn')
+        with ctx.Manager() as manager, ProcessPoolExecutor(self.workers, mp_context=ctx) as pool:
+            events = manager.Queue()
+            self._stop_flags = manager.dict()
+            if self._cancelled:
+                for trial in self.trials:
+                    self._stop_flags[trial['trial']] = True
+            futures = {}
+            for trial in self.trials:
+                future = pool.submit(run_trial, trial['trial'], trial['params'], trial['seed'],
+                                     self.episodes, self.steps_per_episode, self.sim_kwargs,
+                                     events, self._stop_flags)
+                futures[future] = trial
+            pending = set(futures)
+            while pending:
+                self._drain(events, timeout=0.2)
+                for future in [f for f in pending if f.done()]:
+                    pending.discard(future)
+                    self._drain(events)
+                    self._finish(futures[future], future)
+            self._drain(events)
+        self.status = 'cancelled' if self._cancelled else 'complete'
+        self.finished_at = time.time()
+
+    def stop(self):
+        """Corta todos los trials en el próximo fin de episodio"""
+        self._cancelled = True
+        if self._stop_flags is not None:
+            for trial in self.trials:
+                if trial['status'] in ('pending', 'running'):
+                    self._stop_flags[trial['trial']] = True
+
+    def _drain(self, events, timeout=None):
+        while True:
+            try:
+                kind, trial_id, data = events.get(timeout=timeout) if timeout else events.get_nowait()
+            except queue.Empty:
+                return
+            timeout = None
+            if kind == 'episode':
+                self._record(self.trials[trial_id], data)
+
+    def _record(self, trial, episode_data):
+        with self.lock:
+            trial['status'] = 'running'
+            trial['episodes'] = int(episode_data['episode'])
+            trial['curve'].append({
+                'episode': int(episode_data['episode']),
+                'reward': float(episode_data['reward']),
+                'steps': int(episode_data['steps']),
+                self.metric: float(episode_data[self.metric])
+            })
+            trial['score'] = self._score(trial)
+            losing = self.early_stopping and self._is_losing(trial)
+            if losing:
+                trial['stop_reason'] = 'median_rule'
+                self._stop_flags[trial['trial']] = True
+        if self.on_event is not None:
+            self.on_event(self, trial)
+
+    def _finish(self, trial, future):
+        with self.lock:
+            error = future.exception()
+            if error is not None:
+                trial['status'] = 'failed'
+                trial['error'] = repr(error)
+            elif trial['stop_reason'] is not None:
+                trial['status'] = 'stopped'
+            elif self._cancelled and trial['episodes'] < self.episodes:
+                trial['status'] = 'cancelled'
+            else:
+                trial['status'] = 'complete'
+        if self.on_event is not None:
+            self.on_event(self, trial)
+
+    # ---------- ranking ----------
+
+    def _values(self, trial, upto=None):
+        curve = trial['curve'] if upto is None else trial['curve'][:upto]
+        return [point[self.metric] for point in curve]
+
+    def _score(self, trial):
+        """Media de la métrica en los últimos `window` episodios"""
+        values = self._values(trial)[-self.window:]
+        return round(float(np.mean(values)), 4) if values else None
+
+    def _is_losing(self, trial):
+        k = len(trial['curve'])
+        if trial['stop_reason'] is not None or k < self.grace_episodes:
+            return False
+        mine = np.mean(self._values(trial, k))
+        peers = [np.mean(self._values(t, k)) for t in self.trials
+                 if t is not trial and len(t['curve']) >= k]
+        if len(peers) < 2:
+            return False
+        median = float(np.median(peers))
+        return mine < median if self.maximize else mine > median
+
+    def leaderboard(self):
+        scored = [t for t in self.trials if t['score'] is not None]
+        scored.sort(key=lambda t: t['score'], reverse=self.maximize)
+        return [{
+            'rank': i + 1,
+            'trial': t['trial'],
+            'params': t['params'],
+            'score': t['score'],
+            'episodes': t['episodes'],
+            'status': t['status']
+        } for i, t in enumerate(scored)]
+
+    def summary(self):
+        board = self.leaderboard()
+        return {
+            'sweep_id': self.id,
+            'status': self.status,
+            'search': self.search,
+            'metric': self.metric,
+            'trials': len(self.trials),
+            'workers': self.workers,
+            'finished': sum(1 for t in self.trials if t['status'] not in ('pending', 'running')),
+            'stopped_early': sum(1 for t in self.trials if t['status'] == 'stopped'),
+            'best': board[0] if board else None,
+            'elapsed_sec': round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else 0.0
+        }
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.summary(),
+                'space': self.space,
+                'episodes': self.episodes,
+                'steps_per_episode': self.steps_per_episode,
+                'leaderboard': self.leaderboard(),
+                'results': [dict(t, curve=list(t['curve'])) for t in self.trials]
+            }
+
+
+# ========== CLI ==========
+
+def _parse_param(text):
+    """alpha=0.1,0.3,0.5 (valores) o alpha=0.1:0.9 (rango para random; :log al final)"""
+    name, _, spec = text.partition('=')
+    if ':' in spec:
+        parts = spec.split(':')
+        return name, {'low': float(parts[0]), 'high': float(parts[1]), 'log': parts[-1] == 'log'}
+    values = []
+    for v in spec.split(','):
+        try:
+            values.append(float(v))
+        except ValueError:
+            values.append(v)
+    return name, values
+
+
+def _print_event(sweep, trial):
+    last = trial['curve'][-1] if trial['curve'] else {}
+    print(f"trial {trial['trial']:3d} | {trial['status']:9s} | ep {trial['episodes']:3d} | "
+          f"{sweep.metric}={last.get(sweep.metric, float('nan')):.4f} | score={trial['score']} | "
+          f"{trial['params']}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app.sweeps',
+                                     description='Barrido de hiperparámetros del entrenamiento')
+    parser.add_argument('--param', action='append', required=True,
+                        help='alpha=0.1,0.3,0.5 o alpha=0.05:0.9[:log] (repetible)')
+    parser.add_argument('--search', choices=('grid', 'random'), default='grid')
+    parser.add_argument('--trials', type=int, default=None, help='Trials (muestras en random)')
+    parser.add_argument('--episodes', type=int, default=20)
+    parser.add_argument('--steps', type=int, default=400, help='Pasos por episodio')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--metric', choices=METRICS, default='policy_agreement')
+    parser.add_argument('--no-early-stopping', action='store_true')
+    parser.add_argument('--grace', type=int, default=3, help='Episodios antes de poder cortar un trial')
+    args = parser.parse_args(argv)
+
+    space = dict(_parse_param(p) for p in args.param)
+    sweep = Sweep(space, search=args.search, n_trials=args.trials, episodes=args.episodes,
+                  steps_per_episode=args.steps, workers=args.workers, seed=args.seed,
+                  metric=args.metric, early_stopping=not args.no_early_stopping,
+                  grace_episodes=args.grace, on_event=_print_event)
+    print(f"Barrido {sweep.id}: {len(sweep.trials)} trials en {sweep.workers} procesos")
+    sweep.run()
+
+    print("\nRANKING")
+    for row in sweep.leaderboard():
+        print(f"  #{row['rank']:<3d} trial {row['trial']:3d} score={row['score']:.4f} "
+              f"eps={row['episodes']:3d} {row['status']:9s} {row['params']}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
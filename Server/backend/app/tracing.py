@@ -0,0 +1,140 @@
+# backend/app/tracing.py
+import json
+import os
+import threading
+import time
+
+from .config import SAVE_DIR
+
+TRACE_DIR = os.path.join(SAVE_DIR, "traces")
+
+# tid 0 = paso completo; tid = id + 1 para cada agente
+STEP_TID = 0
+
+
+class StepTracer:
+    """
+    Trazador opcional de spans por paso y por agente.
+    Graba una ventana de N pasos y la escribe como JSON de Chrome Trace Event
+    (se abre en Perfetto o chrome://tracing).
+    Desactivado, los puntos de traza sólo comprueban `TRACER.active`.
+    """
+
+    def __init__(self, out_dir=TRACE_DIR, max_events=2_000_000):
+        self.out_dir = out_dir
+        self.max_events = max_events
+        self.active = False
+        self.steps_target = 0
+        self.steps_recorded = 0
+        self.events = []
+        self.thread_names = {}
+        self.last_path = None
+        self.dropped = 0
+        # Inicio del paso en curso por hilo: las sesiones pasan en paralelo en su pool
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    @staticmethod
+    def now():
+        return time.perf_counter()
+
+    def start(self, steps=500):
+        with self._lock:
+            self.events = []
+            self.thread_names = {STEP_TID: 'step'}
+            self.steps_target = max(1, int(steps))
+            self.steps_recorded = 0
+            self.dropped = 0
+            self.active = True
+        return self.status()
+
+    def stop(self):
+        """Detiene la grabación y escribe el fichero (si hay eventos)"""
+        with self._lock:
+            if not self.active and not self.events:
+                return None
+            self.active = False
+            events, self.events = self.events, []
+            names = dict(self.thread_names)
+        if not events:
+            return None
+        self.last_path = self._write(events, names)
+        return self.last_path
+
+    def status(self):
+        return {
+            'active': bool(self.active),
+            'steps_target': int(self.steps_target),
+            'steps_recorded': int(self.steps_recorded),
+            'events': int(len(self.events)),
+            'dropped': int(self.dropped),
+            'last_trace': self.last_path
+        }
+
+    # ---------- puntos de traza ----------
+
+    def begin_step(self, step):
+        self._local.step = (step, time.perf_counter())
+
+    def end_step(self):
+        current = getattr(self._local, 'step', None)
+        if current is None:
+            return
+        self._local.step = None
+        self.add('step', STEP_TID, current[1], {'step': int(current[0])})
+        with self._lock:
+            if not self.active:
+                return
+            self.steps_recorded += 1
+            done = self.steps_recorded >= self.steps_target
+        if done:
+            self.stop()
+
+    def add(self, name, tid, t0, args=None, t1=None):
+        """Registra un span completo ('X') desde t0 (perf_counter) hasta t1/ahora"""
+        if t1 is None:
+            t1 = time.perf_counter()
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': t0 * 1e6,
+            'dur': (t1 - t0) * 1e6,
+            'pid': self._pid,
+            'tid': tid
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            if not self.active:
+                return
+            if len(self.events) >= self.max_events:
+                self.dropped += 1
+                return
+            self.events.append(event)
+
+    def agent_tid(self, agent):
+        tid = int(agent.id) + 1
+        if tid not in self.thread_names:
+            with self._lock:
+                self.thread_names[tid] = f"A{agent.id} ({agent.role})"
+        return tid
+
+    # ---------- salida ----------
+
+    def _write(self, events, names):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        meta = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in sorted(names.items())
+        ]
+        meta.append({'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'tid': 0,
+                     'args': {'name': 'farm-sim'}})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': meta + events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Traza guardada: {path} ({len(events)} eventos)")
+        return path
+
+
+TRACER = StepTracer()
@@ -6,12 +6,14 @@ from collections import defaultdict
 import numpy as np
 
 from .config import (
-    GRID_W, GRID_H, N_AGENTS, DEFAULT_ALPHA, DEFAULT_GAMMA, 
-    DEFAULT_EPS, EPS_DECAY, QTABLE_PATH, AGENT_ROLES, AGENT_START_POSITIONS,
-    ROLE_BARNS
+    GRID_W, GRID_H, FLEET, DEFAULT_ALPHA, DEFAULT_GAMMA, 
+    DEFAULT_EPS, EPS_DECAY, QTABLE_PATH, SHARED_Q
 )
 from .env import MultiFieldEnv
 from .agents import FarmAgent
+from .pool import AgentPool, pool_rows, ROLE_CODES
+from .learning import QStore, q_owners, encode_states, actions_from_moves, ACTIONS
+from .seeding import seed_streams
 
 class PhaseState:
     PLANTING = 'planting'
@@ -19,28 +21,47 @@ class PhaseState:
     HARVESTING = 'harvesting'
     CYCLE_COMPLETE = 'cycle_complete'
 
+# Rol que aprende (elige acciones) en cada fase
+PHASE_ROLES = {
+    PhaseState.PLANTING: 'planter',
+    PhaseState.GROWTH: 'irrigator',
+    PhaseState.HARVESTING: 'harvester'
+}
+
 class StateMachineTrainer:
-    def __init__(self, width=GRID_W, height=GRID_H, n_agents=N_AGENTS):
-        self.env = MultiFieldEnv(w=width, h=height, n_agents=n_agents)
+    def __init__(self, width=GRID_W, height=GRID_H, n_agents=None, fleet=None, shared_q=None, seed=None):
+        # Sin flota ni número explícito se usa la flota de config (FLEET)
+        if fleet is None and n_agents is None:
+            fleet = FLEET
+        streams = seed_streams(seed)
+        self.env = MultiFieldEnv(w=width, h=height, n_agents=n_agents or 0, fleet=fleet, rng=streams['env'])
         self.agents = []
-        # Crear agentes con roles específicos
-        for i in range(self.env.n_agents):
-            role = AGENT_ROLES[i] if i < len(AGENT_ROLES) else 'harvester'
-            barn_pos = ROLE_BARNS.get(role, (0, 0))
+        # Crear agentes con los roles y salidas de la flota del entorno (un pool compartido)
+        pool = AgentPool(len(self.env.agent_roles))
+        qstore = QStore()
+        self.shared_q = SHARED_Q if shared_q is None else bool(shared_q)
+        agent_rngs = streams['agents'].spawn(len(self.env.agent_roles))
+        for i, role in enumerate(self.env.agent_roles):
+            barn_pos = self.env._get_barn_for_role(role)
             
             a = FarmAgent(
                 i, 
-                AGENT_START_POSITIONS[i] if i < len(AGENT_START_POSITIONS) else self.env.agents_init[i],
+                self.env.agents_init[i],
                 role=role,
                 barn_pos=barn_pos,
                 alpha=DEFAULT_ALPHA, 
                 gamma=DEFAULT_GAMMA, 
-                eps=DEFAULT_EPS
+                eps=DEFAULT_EPS,
+                pool=pool,
+                qstore=qstore,
+                shared_q=self.shared_q,
+                rng=agent_rngs[i]
             )
             self.agents.append(a)
         self.running = False
         self.train_thread = None
         self.lock = threading.Lock()
+        self.rng = streams['learning']
         
         self.params = {
             'alpha': DEFAULT_ALPHA,
@@ -63,44 +84,55 @@ class StateMachineTrainer:
         }
         
     def _should_transition_phase(self, phase):
+        # Contadores que mantiene el entorno: cada comprobación es O(1)
         if phase == PhaseState.PLANTING:
-            total_buildable = len(self.env.buildable_cells)
-            planted = sum(1 for (x, y) in self.env.buildable_cells 
-                         if self.env.grid[y, x] == 2)  # CROP = 2
-            ratio = planted / max(1, total_buildable)
+            ratio = self.env.active_crops / max(1, self.env.buildable_count)
             return ratio >= self.phase_thresholds[PhaseState.PLANTING]
         
         elif phase == PhaseState.GROWTH:
-            crops = np.sum(self.env.grid == 2)  # CROP
-            if crops == 0:
-                return False
-            mature = np.sum((self.env.grid == 2) & 
-                          (self.env.crop_age >= self.env.MATURITY_STEPS))
-            return mature > 0
+            return self.env.mature_crops > 0
         
         elif phase == PhaseState.HARVESTING:
-            remaining = np.sum(self.env.grid == 2)
-            return remaining == 0
+            return self.env.active_crops == 0
         
         return False
     
     def _reset_phase_for_next_cycle(self):
-        buildable = self.env.buildable_cells
-        for x, y in buildable:
-            self.env.grid[y, x] = 0  # EMPTY
-            self.env.crop_age[y, x] = 0.0
-            self.env.water[y, x] = 0
-            self.env.compaction[y, x] = 0
+        self.env.clear_buildable()
         
-        # Resetear agentes a posiciones iniciales
-        for i, agent in enumerate(self.agents):
-            agent.pos = AGENT_START_POSITIONS[i] if i < len(AGENT_START_POSITIONS) else self.env.agents_init[i]
-            agent.current_capacity = agent.max_capacity
-            agent.is_returning_to_barn = False
-            agent.harvested = 0
-            agent.planted = 0
-            agent.irrigated = 0
+        # Resetear agentes a posiciones iniciales (columnas del pool de una vez)
+        pool, rows = pool_rows(self.agents)
+        init = np.asarray(self.env.agents_init, dtype=np.int64).reshape(-1, 2)
+        pool.x[rows], pool.y[rows] = init[:, 0], init[:, 1]
+        pool.current_capacity[rows] = pool.max_capacity[rows]
+        pool.is_returning_to_barn[rows] = False
+        pool.harvested[rows] = 0
+        pool.planted[rows] = 0
+        pool.irrigated[rows] = 0
+        for agent in self.agents:
             agent.path = []
+        self.env.place_agents(self.agents)
+    
+    def _choose_actions(self, phase, keys):
+        """
+        Acción de cada agente: el rol de la fase sigue su ruta A* si la tiene y si
+        no elige epsilon-greedy (por lotes sobre el QStore); el resto espera.
+        """
+        actions = {i: (0, 0) for i in range(len(self.agents))}
+        role = PHASE_ROLES.get(phase)
+        if role is None:
+            return actions
+        pool, rows = pool_rows(self.agents)
+        active = np.flatnonzero(pool.role_code[rows] == ROLE_CODES[role])
+        if active.size == 0:
+            return actions
+        pool.steps_taken[rows[active]] += 1
+        store, _ = q_owners(self.agents)
+        chosen = store.choose(keys[active], pool.eps[rows[active]], self.rng).tolist()
+        for i, ai in zip(active.tolist(), chosen):
+            planned = self.agents[i].path_action()
+            actions[i] = ACTIONS[ai if planned is None else planned]
+        return actions
     
     def train_background(self, episodes=20, steps_per_episode=500):
         self.running = True
@@ -113,6 +145,12 @@ class StateMachineTrainer:
             self._reset_phase_for_next_cycle()
             phase = PhaseState.PLANTING
             phase_step_count = 0
+            pool, rows = pool_rows(self.agents)
+            store, owners = q_owners(self.agents)
+            alphas = np.array([a.alpha for a in self.agents])
+            gammas = np.array([a.gamma for a in self.agents])
+            keys = None
+            learn = {}
             episode_total_reward = 0.0
             episode_stats = {
                 'episode': ep + 1,
@@ -129,69 +167,32 @@ class StateMachineTrainer:
                 
                 phase_step_count += 1
                 self.env.step_count += 1
-                obs_list = self.env._get_obs()
-                actions = {}
-                states = []
-                for i, agent in enumerate(self.agents):
-                    obs = obs_list[i]
-                    s = agent.obs_to_state(obs)
-                    states.append(s)
-                    
-                    if phase == PhaseState.PLANTING:
-                        if agent.role == 'planter':
-                            ai = agent.choose_action(s, training=True)
-                            actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[ai]
-                        else:
-                            actions[i] = (0, 0)
-                    
-                    elif phase == PhaseState.GROWTH:
-                        if agent.role == 'irrigator':
-                            ai = agent.choose_action(s, training=True)
-                            actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[ai]
-                        elif agent.role == 'planter':
-                            actions[i] = (0, 0)
-                        else:
-                            actions[i] = (0, 0)
-                    
-                    elif phase == PhaseState.HARVESTING:
-                        if agent.role == 'harvester':
-                            ai = agent.choose_action(s, training=True)
-                            actions[i] = {0: (0,0), 1: (1,0), 2: (-1,0), 3: (0,1), 4: (0,-1)}[ai]
-                        else:
-                            actions[i] = (0, 0)
-                    
-                    else:
-                        actions[i] = (0, 0)
+                # Los estados siguientes del paso anterior son los actuales de éste
+                if keys is None:
+                    keys = store.keys(owners, encode_states(
+                        self.env.observe_array(self.agents, fresh=True)))
+                actions = self._choose_actions(phase, keys)
                 
                 proposals = self.env.step(self.agents, actions_by_q=actions)
-                pos_counts = {}
-                for p in proposals:
-                    pos_counts[p] = pos_counts.get(p, 0) + 1
-                
-                finals = []
-                for i, p in enumerate(proposals):
-                    if pos_counts.get(p, 0) > 1:
-                        finals.append(self.agents[i].pos)
-                    else:
-                        finals.append(p)
+                finals = self.env.resolve_collisions(self.agents, proposals)
+                start_x, start_y = pool.x[rows].copy(), pool.y[rows].copy()
                 
                 rewards, infos, done = self.env.apply_final_positions_and_harvest(
                     self.agents, finals
                 )
+                self.env.update_crops()
                 episode_total_reward += sum(rewards)
-                obs2_list = self.env._get_obs()
-                for i, agent in enumerate(self.agents):
-                    s2 = agent.obs_to_state(obs2_list[i])
-                    idx_map = {(0,0): 0, (1,0): 1, (-1,0): 2, (0,1): 3, (0,-1): 4}
-                    final_pos = finals[i]
-                    movement = (final_pos[0] - agent.pos[0], final_pos[1] - agent.pos[1])
-                    ai = idx_map.get(movement, 0)
-                    
-                    agent.update_q(states[i], ai, rewards[i], s2, done=False)
+                
+                # Una sola actualización TD para toda la flota
+                next_keys = store.keys(owners, encode_states(self.env.observe_array(self.agents)))
+                taken = actions_from_moves(pool.x[rows] - start_x, pool.y[rows] - start_y)
+                store.td_update(keys, taken, rewards, next_keys, alphas, gammas, done=False, stats=learn)
+                pool.q_updates[rows] += 1
+                pool.states_discovered[rows] += learn['created']
                 
                 # Decay epsilon
-                for agent in self.agents:
-                    agent.decay_epsilon(self.params['eps_decay'])
+                pool.decay_epsilon(rows, self.params['eps_decay'])
+                keys = next_keys
                 
                 # Verificar transición de fase
                 if self._should_transition_phase(phase):
@@ -0,0 +1,373 @@
+# backend/app/world.py
+import base64
+import os
+import numpy as np
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 64))
+# A partir de este número de celdas el entorno usa capas por bloques
+CHUNKED_MIN_CELLS = int(os.getenv("CHUNKED_MIN_CELLS", 1_000_000))
+
+
+class ChunkedLayer:
+    """
+    Capa 2D dispersa formada por bloques (chunks) cuadrados de CHUNK_SIZE.
+    Sólo se reserva memoria para los bloques en los que se escribe un valor
+    distinto de `fill`. Se indexa como un array de NumPy con [y, x]:
+      - escalares:          layer[y, x] / layer[y, x] = v
+      - arrays de índices:  layer[ys, xs] / layer[ys, xs] = vs
+      - rectángulos:        layer[y0:y1, x0:x1] (copia densa) / = v
+    Cada escritura marca su bloque como sucio; commit() convierte las marcas
+    en versiones para poder serializar sólo lo que cambió.
+    """
+
+    def __init__(self, h, w, dtype=int, fill=0, chunk=CHUNK_SIZE):
+        self.shape = (h, w)
+        self.h = h
+        self.w = w
+        self.dtype = np.dtype(dtype)
+        self.fill = self.dtype.type(fill)
+        self.chunk = chunk
+        self.chunks = {}
+        self.versions = {}
+        self.version = 0
+        self.epoch = 0
+        self._dirty = set()
+
+    # ---------- bloques ----------
+
+    def _block(self, key, create):
+        block = self.chunks.get(key)
+        if block is None and create:
+            block = np.full((self.chunk, self.chunk), self.fill, dtype=self.dtype)
+            self.chunks[key] = block
+        return block
+
+    def active_keys(self):
+        return list(self.chunks.keys())
+
+    def blocks(self):
+        """(clave, y0, x0, bloque) de cada bloque reservado"""
+        c = self.chunk
+        for (cy, cx), block in self.chunks.items():
+            yield (cy, cx), cy * c, cx * c, block
+
+    def block_bounds(self, key):
+        cy, cx = key
+        c = self.chunk
+        return cy * c, min(self.h, (cy + 1) * c), cx * c, min(self.w, (cx + 1) * c)
+
+    @property
+    def nbytes(self):
+        return sum(b.nbytes for b in self.chunks.values())
+
+    # ---------- versiones / bloques sucios ----------
+
+    def commit(self):
+        """Cierra un tick: los bloques sucios reciben la versión nueva"""
+        if self._dirty:
+            self.version += 1
+            for key in self._dirty:
+                self.versions[key] = self.version
+            self._dirty.clear()
+        return self.version
+
+    def changed_since(self, version):
+        return [key for key, v in self.versions.items() if v > version and key in self.chunks]
+
+    # ---------- indexado ----------
+
+    def __getitem__(self, key):
+        y, x = key
+        if isinstance(y, slice) or isinstance(x, slice):
+            return self._get_rect(y, x)
+        if np.ndim(y) == 0 and np.ndim(x) == 0:
+            c = self.chunk
+            block = self.chunks.get((y // c, x // c))
+            if block is None:
+                return self.fill
+            return block[y % c, x % c]
+        return self._gather(np.asarray(y), np.asarray(x))
+
+    def __setitem__(self, key, value):
+        y, x = key
+        if isinstance(y, slice) or isinstance(x, slice):
+            self._set_rect(y, x, value)
+            return
+        if np.ndim(y) == 0 and np.ndim(x) == 0:
+            c = self.chunk
+            k = (y // c, x // c)
+            block = self.chunks.get(k)
+            if block is None:
+                if value == self.fill:
+                    return
+                block = self._block(k, True)
+            block[y % c, x % c] = value
+            self._dirty.add(k)
+            return
+        self._scatter(np.asarray(y), np.asarray(x), value)
+
+    def _groups(self, ys, xs):
+        """(clave de bloque, índices) agrupando las celdas por bloque con una sola ordenación"""
+        c = self.chunk
+        keys = (ys // c) * (self.w // c + 1) + (xs // c)
+        order = np.argsort(keys, kind='stable')
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for idx in np.split(order, bounds):
+            yield (int(ys[idx[0]] // c), int(xs[idx[0]] // c)), idx
+
+    def _gather(self, ys, xs):
+        out = np.full(ys.shape, self.fill, dtype=self.dtype)
+        if ys.size == 0:
+            return out
+        c = self.chunk
+        for key, idx in self._groups(ys, xs):
+            block = self.chunks.get(key)
+            if block is not None:
+                out[idx] = block[ys[idx] % c, xs[idx] % c]
+        return out
+
+    def _scatter(self, ys, xs, value):
+        if ys.size == 0:
+            return
+        values = np.broadcast_to(np.asarray(value, dtype=self.dtype), ys.shape)
+        c = self.chunk
+        for key, idx in self._groups(ys, xs):
+            vals = values[idx]
+            block = self.chunks.get(key)
+            if block is None:
+                if np.all(vals == self.fill):
+                    continue
+                block = self._block(key, True)
+            block[ys[idx] % c, xs[idx] % c] = vals
+            self._dirty.add(key)
+
+    def _rect_bounds(self, ys, xs):
+        y0, y1, _ = ys.indices(self.h) if isinstance(ys, slice) else (ys, ys + 1, 1)
+        x0, x1, _ = xs.indices(self.w) if isinstance(xs, slice) else (xs, xs + 1, 1)
+        return y0, max(y0, y1), x0, max(x0, x1)
+
+    def _rect_blocks(self, y0, y1, x0, x1):
+        c = self.chunk
+        for cy in range(y0 // c, (y1 - 1) // c + 1):
+            for cx in range(x0 // c, (x1 - 1) // c + 1):
+                by0, bx0 = cy * c, cx * c
+                sy0, sy1 = max(y0, by0), min(y1, by0 + c)
+                sx0, sx1 = max(x0, bx0), min(x1, bx0 + c)
+                yield (cy, cx), sy0, sy1, sx0, sx1, by0, bx0
+
+    def _get_rect(self, ys, xs):
+        y0, y1, x0, x1 = self._rect_bounds(ys, xs)
+        out = np.full((y1 - y0, x1 - x0), self.fill, dtype=self.dtype)
+        if y1 <= y0 or x1 <= x0:
+            return out
+        for key, sy0, sy1, sx0, sx1, by0, bx0 in self._rect_blocks(y0, y1, x0, x1):
+            block = self.chunks.get(key)
+            if block is not None:
+                out[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0] = block[sy0 - by0:sy1 - by0, sx0 - bx0:sx1 - bx0]
+        if not isinstance(ys, slice) and not isinstance(xs, slice):
+            return out[0, 0]
+        if not isinstance(ys, slice):
+            return out[0]
+        if not isinstance(xs, slice):
+            return out[:, 0]
+        return out
+
+    def _set_rect(self, ys, xs, value):
+        y0, y1, x0, x1 = self._rect_bounds(ys, xs)
+        if y1 <= y0 or x1 <= x0:
+            return
+        for key, sy0, sy1, sx0, sx1, by0, bx0 in self._rect_blocks(y0, y1, x0, x1):
+            block = self.chunks.get(key)
+            if block is None:
+                if np.all(np.asarray(value) == self.fill):
+                    continue
+                block = self._block(key, True)
+            if np.ndim(value) == 0:
+                block[sy0 - by0:sy1 - by0, sx0 - bx0:sx1 - bx0] = value
+            else:
+                block[sy0 - by0:sy1 - by0, sx0 - bx0:sx1 - bx0] = \
+                    value[sy0 - y0:sy1 - y0, sx0 - x0:sx1 - x0]
+            self._dirty.add(key)
+
+    # ---------- consultas globales (sólo sobre bloques reservados) ----------
+
+    def count(self, value):
+        n = sum(int(np.count_nonzero(self._valid(key, b) == value)) for key, b in self.chunks.items())
+        if value == self.fill:
+            allocated = sum(self._valid(key, b).size for key, b in self.chunks.items())
+            n += self.h * self.w - allocated
+        return n
+
+    def nonzero_eq(self, value):
+        """(ys, xs) globales de las celdas == value, en orden fila-mayor"""
+        ys_all, xs_all = [], []
+        for key, block in self.chunks.items():
+            y0, _, x0, _ = self.block_bounds(key)
+            ys, xs = np.nonzero(self._valid(key, block) == value)
+            if ys.size:
+                ys_all.append(ys + y0)
+                xs_all.append(xs + x0)
+        if not ys_all:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        ys = np.concatenate(ys_all)
+        xs = np.concatenate(xs_all)
+        order = np.lexsort((xs, ys))
+        return ys[order], xs[order]
+
+    def _valid(self, key, block):
+        """Vista del bloque recortada a los límites del mapa"""
+        y0, y1, x0, x1 = self.block_bounds(key)
+        return block[:y1 - y0, :x1 - x0]
+
+    def copy(self):
+        other = ChunkedLayer(self.h, self.w, self.dtype, self.fill, self.chunk)
+        other.chunks = {k: b.copy() for k, b in self.chunks.items()}
+        other.version = self.version
+        other.epoch = self.epoch
+        other._dirty = set(other.chunks)
+        return other
+
+    def to_dense(self):
+        out = np.full(self.shape, self.fill, dtype=self.dtype)
+        for key, block in self.chunks.items():
+            y0, y1, x0, x1 = self.block_bounds(key)
+            out[y0:y1, x0:x1] = block[:y1 - y0, :x1 - x0]
+        return out
+
+
+class OccupancyGrid:
+    """
+    Hash espacial (x, y) -> número de agentes en la celda, mantenido de forma
+    incremental: move() es O(1) y la memoria es O(agentes) también en mapas
+    por bloques. A* lo consulta directamente en lugar de construir un conjunto
+    de posiciones por agente.
+    """
+
+    def __init__(self):
+        self.cells = {}
+        self.total = 0
+
+    def place(self, positions):
+        """Reconstruye la ocupación a partir de las posiciones actuales"""
+        self.cells = {}
+        for pos in positions:
+            self.cells[pos] = self.cells.get(pos, 0) + 1
+        self.total = len(positions)
+
+    def move(self, old, new):
+        if old == new:
+            return
+        n = self.cells.get(old, 0)
+        if n <= 1:
+            self.cells.pop(old, None)
+        else:
+            self.cells[old] = n - 1
+        self.cells[new] = self.cells.get(new, 0) + 1
+
+    def count(self, pos):
+        return self.cells.get(pos, 0)
+
+    def __contains__(self, pos):
+        return pos in self.cells
+
+    def crowded(self, positions):
+        """
+        Lista de bool: True si la celda la reclama más de una posición de la lista.
+        Un recuento en dict sobre las propuestas resulta más rápido que np.unique
+        incluso con cientos de agentes.
+        """
+        claims = {}
+        for pos in positions:
+            claims[pos] = claims.get(pos, 0) + 1
+        return [claims[pos] > 1 for pos in positions]
+
+
+def is_chunked(layer):
+    return isinstance(layer, ChunkedLayer)
+
+
+def new_layer(h, w, dtype=int, fill=0, chunked=False):
+    if chunked:
+        return ChunkedLayer(h, w, dtype=dtype, fill=fill)
+    return np.full((h, w), fill, dtype=dtype)
+
+
+def count_equal(layer, value):
+    if is_chunked(layer):
+        return layer.count(value)
+    return int(np.count_nonzero(layer == value))
+
+
+def cells_equal(layer, value):
+    """(ys, xs) de las celdas == value en orden fila-mayor"""
+    if is_chunked(layer):
+        return layer.nonzero_eq(value)
+    return np.nonzero(layer == value)
+
+
+def _encode(array, encoding):
+    if encoding == 'b64':
+        return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode('ascii')
+    return array.tolist()
+
+
+def serialize_layer(layer, since=None, encoding='list'):
+    """
+    Serializa una capa para JSON. Densa: lista de filas.
+    Por bloques: sólo los bloques reservados (o los cambiados desde `since`).
+    Con encoding='b64' los datos van como bytes crudos del dtype de la capa.
+    """
+    if not is_chunked(layer):
+        if encoding == 'b64':
+            return {
+                'grid': None,
+                'grid_b64': _encode(layer, encoding),
+                'grid_shape': [int(layer.shape[0]), int(layer.shape[1])],
+                'grid_dtype': str(layer.dtype)
+            }
+        return {'grid': layer.tolist()}
+    keys = layer.active_keys() if since is None else layer.changed_since(since)
+    blocks = [((cy, cx), layer._valid((cy, cx), layer.chunks[(cy, cx)])) for cy, cx in keys]
+    return _chunks_payload(layer.h, layer.w, layer.chunk, layer.fill, layer.dtype,
+                           layer.version, layer.epoch, blocks, encoding)
+
+
+def serialize_dense_chunks(grid, versions, chunk, fill, version, epoch, since=None, encoding='list'):
+    """
+    El mismo payload por bloques que serialize_layer, a partir de una copia
+    densa de la capa y de la versión de cada bloque ([cy, cx], -1 = sin reservar).
+    """
+    if since is None:
+        cys, cxs = np.nonzero(versions >= 0)
+    else:
+        cys, cxs = np.nonzero(versions > since)
+    blocks = [((cy, cx), grid[cy * chunk:(cy + 1) * chunk, cx * chunk:(cx + 1) * chunk])
+              for cy, cx in zip(cys.tolist(), cxs.tolist())]
+    return _chunks_payload(grid.shape[0], grid.shape[1], chunk, fill, grid.dtype,
+                           version, epoch, blocks, encoding)
+
+
+def _chunks_payload(h, w, chunk, fill, dtype, version, epoch, blocks, encoding):
+    """Payload 'grid_chunks' con los bloques dados como ((cy, cx), datos recortados)"""
+    return {
+        'grid': None,
+        'grid_chunks': {
+            'chunk_size': int(chunk),
+            'width': int(w),
+            'height': int(h),
+            'fill': int(fill),
+            'dtype': str(dtype),
+            'encoding': encoding,
+            'version': int(version),
+            'epoch': int(epoch),
+            'chunks': [
+                {
+                    'cy': int(cy), 'cx': int(cx),
+                    'shape': list(data.shape),
+                    'data': _encode(data, encoding)
+                }
+                for (cy, cx), data in blocks
+            ]
+        }
+    }
@@ -0,0 +1,8 @@
+"""
+Benchmarks de rendimiento del backend (entorno, agentes y SimManager).
+
+Uso (desde Server/backend):
+    python -m benchmarks run --grids 60x40,120x80 --agents 6,60 --out base.json
+    python -m benchmarks compare base.json nuevo.json --threshold 0.10
+    python -m benchmarks list
+"""
@@ -0,0 +1,102 @@
+import argparse
+import sys
+
+from .compare import compare_files, format_rows
+from .harness import write_results, result_key
+from .suites import SUITES
+
+
+def _parse_grids(value):
+    grids = []
+    for item in value.split(','):
+        w, h = item.lower().split('x')
+        grids.append((int(w), int(h)))
+    return grids
+
+
+def _parse_ints(value):
+    return [int(v) for v in value.split(',')]
+
+
+def cmd_run(args):
+    names = args.suite or list(SUITES)
+    unknown = [n for n in names if n not in SUITES]
+    if unknown:
+        print(f"Suites desconocidas: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    cfg = {
+        'grids': _parse_grids(args.grids),
+        'crops': _parse_ints(args.crops),
+        'agents': _parse_ints(args.agents),
+        'repeat': args.repeat,
+        'steps': args.steps,
+        'episode_steps': args.episode_steps,
+        'episodes': args.episodes,
+        'seed': args.seed
+    }
+
+    results = []
+    for name in names:
+        for result in SUITES[name](cfg):
+            results.append(result)
+            print(f"{result_key(result):<60} median={result['median'] * 1e3:10.3f}ms "
+                  f"ops/s={result['ops_per_sec']:12.1f}")
+
+    config = dict(cfg, suites=names)
+    config['grids'] = [f"{w}x{h}" for w, h in cfg['grids']]
+    write_results(args.out, results, config)
+    print(f"Resultados guardados en {args.out}")
+    return 0
+
+
+def cmd_compare(args):
+    rows, regressions = compare_files(args.base, args.new, args.threshold)
+    print(format_rows(rows))
+    if regressions:
+        print(f"\n{len(regressions)} regresiones (> {args.threshold * 100:.0f}%)")
+        return 1
+    print("\nSin regresiones")
+    return 0
+
+
+def cmd_list(args):
+    for name, fn in SUITES.items():
+        print(f"{name:<12} {(fn.__doc__ or '').strip()}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmarks del simulador de granja')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='Ejecutar benchmarks y guardar JSON')
+    run.add_argument('--suite', action='append', help='Suite a ejecutar (repetible); por defecto todas')
+    run.add_argument('--grids', default='60x40', help='Tamaños de grid, ej. 60x40,120x80')
+    run.add_argument('--crops', default='200', help='Número de cultivos, ej. 200,400')
+    run.add_argument('--agents', default='6', help='Tamaño de la flota, ej. 6,50,500')
+    run.add_argument('--repeat', type=int, default=5)
+    run.add_argument('--steps', type=int, default=100, help='Pasos por medición de env_step')
+    run.add_argument('--episode-steps', type=int, default=500, help='Pasos máximos del episodio completo')
+    run.add_argument('--episodes', type=int, default=10, help='Episodios de entrenamiento (suite shared_q)')
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--out', default='bench_results.json')
+    run.set_defaults(func=cmd_run)
+
+    cmp_ = sub.add_parser('compare', help='Comparar dos ficheros de resultados')
+    cmp_.add_argument('base')
+    cmp_.add_argument('new')
+    cmp_.add_argument('--threshold', type=float, default=0.10,
+                      help='Fracción de empeoramiento de la mediana considerada regresión')
+    cmp_.set_defaults(func=cmd_compare)
+
+    lst = sub.add_parser('list', help='Listar suites disponibles')
+    lst.set_defaults(func=cmd_list)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+from .harness import load_results, result_key
+
+
+def compare_results(base, new, threshold=0.10):
+    """
+    Compara dos ficheros de resultados por mediana.
+    Una entrada es regresión si su mediana crece más que `threshold` (fracción).
+    """
+    base_map = {result_key(r): r for r in base['results']}
+    rows = []
+    for r in new['results']:
+        key = result_key(r)
+        old = base_map.pop(key, None)
+        if old is None:
+            rows.append({'key': key, 'status': 'new', 'base': None, 'new': r['median'], 'change': None})
+            continue
+        change = (r['median'] - old['median']) / old['median'] if old['median'] > 0 else 0.0
+        if change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        else:
+            status = 'same'
+        rows.append({'key': key, 'status': status, 'base': old['median'], 'new': r['median'], 'change': change})
+    for key, old in base_map.items():
+        rows.append({'key': key, 'status': 'missing', 'base': old['median'], 'new': None, 'change': None})
+    return rows
+
+
+def format_rows(rows):
+    lines = []
+    width = max([len(r['key']) for r in rows] + [10])
+    for r in rows:
+        base = f"{r['base'] * 1e3:10.3f}ms" if r['base'] is not None else ' ' * 12
+        new = f"{r['new'] * 1e3:10.3f}ms" if r['new'] is not None else ' ' * 12
+        change = f"{r['change'] * 100:+7.1f}%" if r['change'] is not None else ' ' * 8
+        lines.append(f"{r['key']:<{width}}  {base}  {new}  {change}  {r['status']}")
+    return '\n'.join(lines)
+
+
+def compare_files(base_path, new_path, threshold=0.10):
+    rows = compare_results(load_results(base_path), load_results(new_path), threshold)
+    regressions = [r for r in rows if r['status'] == 'regression']
+    return rows, regressions
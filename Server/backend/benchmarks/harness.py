@@ -0,0 +1,163 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import time
+
+import numpy as np
+
+from app.env import MultiFieldEnv
+from app.agents import FarmAgent
+from app.pool import AgentPool
+from app.learning import QStore
+from app.seeding import seed_streams
+from app.config import (
+    PLANTER_CAPACITY, HARVESTER_CAPACITY, IRRIGATOR_CAPACITY,
+    PLANTER_FUEL, HARVESTER_FUEL, IRRIGATOR_FUEL,
+    DEFAULT_ALPHA, DEFAULT_GAMMA, DEFAULT_EPS
+)
+
+CAPACITIES = {
+    'planter': PLANTER_CAPACITY,
+    'harvester': HARVESTER_CAPACITY,
+    'irrigator': IRRIGATOR_CAPACITY
+}
+
+FUELS = {
+    'planter': PLANTER_FUEL,
+    'harvester': HARVESTER_FUEL,
+    'irrigator': IRRIGATOR_FUEL
+}
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silencia los print del entorno/entrenamiento mientras se mide"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def seed_all(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def scaled_parcels(w, h):
+    """Dos parcelas con la misma proporción que el mapa por defecto (60x40)"""
+    sx = w / 60.0
+    sy = h / 40.0
+    return [
+        {
+            'x_start': int(8 * sx), 'x_end': int(28 * sx),
+            'y_start': int(8 * sy), 'y_end': int(32 * sy),
+            'name': 'Parcela 1'
+        },
+        {
+            'x_start': int(32 * sx), 'x_end': int(52 * sx),
+            'y_start': int(8 * sy), 'y_end': int(32 * sy),
+            'name': 'Parcela 2'
+        }
+    ]
+
+
+def make_env(w, h, crops, obstacles=30, seed=0, agents=6):
+    """Entorno sembrado con una flota de `agents` repartida entre los roles"""
+    seed_all(seed)
+    with quiet():
+        return MultiFieldEnv(w=w, h=h, n_agents=agents, crop_count=crops, obst_count=obstacles,
+                             parcels=scaled_parcels(w, h), rng=np.random.default_rng(seed))
+
+
+def make_agents(env, n=None, shared_q=False, seed=0):
+    """Agentes de la flota del entorno (los `n` primeros si se indica)"""
+    agents = []
+    roles = env.agent_roles if n is None else env.agent_roles[:n]
+    pool = AgentPool(len(roles))
+    qstore = QStore()
+    rngs = seed_streams(seed)['agents'].spawn(len(roles))
+    for i, role in enumerate(roles):
+        agents.append(FarmAgent(
+            aid=i,
+            start_pos=env.agents_init[i],
+            role=role,
+            barn_pos=env._get_barn_for_role(role),
+            alpha=DEFAULT_ALPHA,
+            gamma=DEFAULT_GAMMA,
+            eps=DEFAULT_EPS,
+            capacity=CAPACITIES[role],
+            fuel=FUELS[role],
+            pool=pool,
+            qstore=qstore,
+            shared_q=shared_q,
+            rng=rngs[i]
+        ))
+    return agents
+
+
+def measure(fn, number=1, repeat=5, warmup=1):
+    """
+    Ejecuta fn() `number` veces por repetición y devuelve tiempos por llamada (s).
+    """
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - t0) / number)
+    return samples
+
+
+def summarize(name, params, samples, number, unit='s', extra=None):
+    median = statistics.median(samples)
+    result = {
+        'name': name,
+        'params': params,
+        'unit': unit,
+        'number': int(number),
+        'repeat': len(samples),
+        'min': min(samples),
+        'median': median,
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'ops_per_sec': (1.0 / median) if median > 0 else float('inf')
+    }
+    if extra:
+        result['extra'] = extra
+    return result
+
+
+def result_key(result):
+    params = ','.join(f"{k}={result['params'][k]}" for k in sorted(result['params']))
+    return f"{result['name']}[{params}]"
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def write_results(path, results, config):
+    payload = {
+        'meta': environment_info(),
+        'config': config,
+        'results': results
+    }
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    return payload
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,435 @@
+import json
+import time
+
+import numpy as np
+
+from app.env import astar, CROP, EMPTY
+from app.agents import ACTIONS
+from app.sim_manager import SimManager
+from app.pool import pool_rows
+from app.learning import q_owners, encode_states, actions_from_moves
+
+from .harness import (
+    make_env, make_agents, measure, summarize, quiet, seed_all
+)
+
+SUITES = {}
+
+
+def suite(name):
+    def register(fn):
+        SUITES[name] = fn
+        return fn
+    return register
+
+
+def _grid_params(w, h, crops):
+    return {'w': w, 'h': h, 'crops': crops}
+
+
+@suite('astar')
+def bench_astar(cfg):
+    """Latencia de A* entre graneros y esquinas lejanas de las parcelas"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            env = make_env(w, h, crops, seed=cfg['seed'])
+            obst = set(env.obstacles)
+            starts = [env.planter_barn_pos, env.harvester_barn_pos, env.irrigator_barn_pos]
+            goals = []
+            for p in env.parcels:
+                goals.append((p['x_end'] - 2, p['y_end'] - 2))
+                goals.append((p['x_start'] + 1, p['y_end'] - 2))
+            pairs = [(s, g) for s in starts for g in goals]
+
+            def run():
+                for s, g in pairs:
+                    astar(s, g, obst, env.w, env.h)
+
+            samples = measure(run, number=1, repeat=cfg['repeat'])
+            samples = [s / len(pairs) for s in samples]
+            yield summarize('astar', _grid_params(w, h, crops), samples, len(pairs))
+
+
+@suite('smart_goal')
+def bench_smart_goal(cfg):
+    """Latencia de _get_smart_goal por rol en su fase de trabajo"""
+    phases = {'planter': 'planting', 'irrigator': 'irrigating', 'harvester': 'harvesting'}
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            env = make_env(w, h, crops, seed=cfg['seed'])
+            # Los cosechadores sólo buscan cultivos regados
+            env.water[env.grid == CROP] = 1
+            for role, phase in phases.items():
+                env.cycle_phase = phase
+                pos = env._get_barn_for_role(role)
+                samples = measure(lambda: env._get_smart_goal(pos, role),
+                                  number=5, repeat=cfg['repeat'])
+                params = _grid_params(w, h, crops)
+                params['role'] = role
+                yield summarize('smart_goal', params, samples, 5)
+
+
+@suite('env_step')
+def bench_env_step(cfg):
+    """Throughput de step + resolución de colisiones + apply_final_positions_and_harvest"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                agents = make_agents(env)
+                steps = cfg['steps']
+
+                def run():
+                    with quiet():
+                        for _ in range(steps):
+                            proposals = env.step(agents)
+                            finals = env.resolve_collisions(agents, proposals)
+                            env.apply_final_positions_and_harvest(agents, finals)
+
+                samples = measure(run, number=1, repeat=cfg['repeat'], warmup=0)
+                samples = [s / steps for s in samples]
+                params = _grid_params(w, h, crops)
+                params['agents'] = n_agents
+                yield summarize('env_step', params, samples, steps)
+
+
+@suite('update_q')
+def bench_update_q(cfg):
+    """Tasa de actualizaciones de FarmAgent.update_q sobre estados aleatorios"""
+    env = make_env(60, 40, 200, seed=cfg['seed'])
+    agent = make_agents(env, 1)[0]
+    rng = np.random.RandomState(cfg['seed'])
+    n = 2000
+    states = [tuple(int(v) for v in row) for row in np.column_stack([
+        rng.randint(-8, 9, n), rng.randint(-8, 9, n), rng.randint(0, 16, n),
+        rng.randint(0, 5, n), rng.randint(0, 6, n), rng.randint(0, 5, n),
+        rng.randint(0, 2, n)
+    ])]
+    actions = rng.randint(0, len(ACTIONS), n).tolist()
+    rewards = rng.normal(0, 10, n).tolist()
+
+    def run():
+        for i in range(n - 1):
+            agent.update_q(states[i], actions[i], rewards[i], states[i + 1])
+
+    samples = measure(run, number=1, repeat=cfg['repeat'])
+    samples = [s / (n - 1) for s in samples]
+    yield summarize('update_q', {'updates': n - 1}, samples, n - 1)
+
+
+@suite('get_state')
+def bench_get_state(cfg):
+    """Tiempo de SimManager.get_state + serialización JSON"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                seed_all(cfg['seed'])
+                with quiet():
+                    sim = SimManager(seed=cfg['seed'])
+                sim.env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                sim.agents = make_agents(sim.env, seed=cfg['seed'])
+                samples = measure(lambda: json.dumps(sim.get_state()),
+                                  number=5, repeat=cfg['repeat'])
+                params = _grid_params(w, h, crops)
+                params['agents'] = n_agents
+                yield summarize('get_state', params, samples, 5)
+
+
+@suite('episode')
+def bench_episode(cfg):
+    """Tiempo de pared de un episodio completo de train_background"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                def run():
+                    seed_all(cfg['seed'])
+                    with quiet():
+                        sim = SimManager(seed=cfg['seed'])
+                        sim.env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                        sim.agents = make_agents(sim.env, seed=cfg['seed'])
+                        # El benchmark no debe sobrescribir los modelos guardados
+                        sim.save_qs = lambda *a, **k: None
+                        sim.save_stats = lambda *a, **k: None
+                        sim.train_background(episodes=1, steps_per_episode=cfg['episode_steps'])
+                    return sim
+
+                samples = measure(run, number=1, repeat=max(1, cfg['repeat'] // 2), warmup=0)
+                params = _grid_params(w, h, crops)
+                params['agents'] = n_agents
+                params['max_steps'] = cfg['episode_steps']
+                yield summarize('episode', params, samples, 1)
+
+
+@suite('layers')
+def bench_layers(cfg):
+    """Memoria de las capas del entorno y escaneo vectorizado frente a int64"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            env = make_env(w, h, crops, seed=cfg['seed'])
+            nbytes = env.layer_nbytes()
+            wide = {
+                'grid': env.grid.astype(np.int64),
+                'water': env.water.astype(np.int64)
+            }
+            wide_bytes = sum(a.nbytes for a in wide.values()) + env.compaction.size * 8
+
+            def scan(grid, water):
+                return np.count_nonzero((grid == CROP) & (water < 2))
+
+            params = _grid_params(w, h, crops)
+            compact = measure(lambda: scan(env.grid, env.water), number=20, repeat=cfg['repeat'])
+            yield summarize('layer_scan', dict(params, dtype=str(env.grid.dtype)), compact, 20, extra={
+                'layer_bytes': nbytes,
+                'total_bytes': int(sum(nbytes.values())),
+                'int64_total_bytes': int(wide_bytes),
+                'reduction': round(wide_bytes / max(1, sum(nbytes.values())), 2)
+            })
+            baseline = measure(lambda: scan(wide['grid'], wide['water']), number=20, repeat=cfg['repeat'])
+            yield summarize('layer_scan', dict(params, dtype='int64'), baseline, 20)
+
+
+@suite('env_reset')
+def bench_env_reset(cfg):
+    """Latencia de MultiFieldEnv.reset (plantilla estática + muestreo vectorizado)"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            env = make_env(w, h, crops, seed=cfg['seed'])
+            samples = measure(env.reset, number=10, repeat=cfg['repeat'])
+            params = _grid_params(w, h, crops)
+            params['chunked'] = bool(env.chunked)
+            yield summarize('env_reset', params, samples, 10)
+
+
+@suite('collisions')
+def bench_collisions(cfg):
+    """Latencia de MultiFieldEnv.resolve_collisions con propuestas aleatorias"""
+    for n_agents in cfg['agents']:
+        env = make_env(60, 40, 200, seed=cfg['seed'], agents=n_agents)
+        agents = make_agents(env)
+        rng = np.random.default_rng(cfg['seed'])
+        proposals = list(zip(rng.integers(0, env.w, n_agents).tolist(),
+                             rng.integers(0, env.h, n_agents).tolist()))
+        samples = measure(lambda: env.resolve_collisions(agents, proposals),
+                          number=50, repeat=cfg['repeat'])
+        yield summarize('collisions', {'agents': n_agents}, samples, 50)
+
+
+@suite('apply')
+def bench_apply(cfg):
+    """apply_final_positions_and_harvest por lotes frente al bucle por agente"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                for mode in ('batch', 'sequential'):
+                    env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                    agents = make_agents(env)
+                    apply = env._apply_batch if mode == 'batch' else env._apply_sequential
+                    steps = min(cfg['steps'], 20)
+                    samples = []
+                    # Sólo se cronometra la aplicación; step() y colisiones quedan fuera
+                    for _ in range(cfg['repeat']):
+                        elapsed = 0.0
+                        for _ in range(steps):
+                            with quiet():
+                                proposals = env.step(agents)
+                            finals = env.resolve_collisions(agents, proposals)
+                            t0 = time.perf_counter()
+                            apply(agents, finals)
+                            elapsed += time.perf_counter() - t0
+                            env.commit_layers()
+                        samples.append(elapsed / steps)
+                    params = _grid_params(w, h, crops)
+                    params['agents'] = n_agents
+                    params['mode'] = mode
+                    yield summarize('apply', params, samples, steps)
+
+
+@suite('crops')
+def bench_crops(cfg):
+    """Latencia de update_crops (índice de cultivos activos) según tamaño del mapa"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            env = make_env(w, h, crops, seed=cfg['seed'])
+            samples = measure(env.update_crops, number=20, repeat=cfg['repeat'])
+            params = _grid_params(w, h, crops)
+            params['chunked'] = bool(env.chunked)
+            yield summarize('update_crops', params, samples, 20, extra={'active': len(env.crops)})
+
+
+@suite('observe')
+def bench_observe(cfg):
+    """Estados de toda la flota: tuplas de env.observe frente al array de observe_array"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                agents = make_agents(env)
+                with quiet():
+                    env.step(agents)
+
+                params = _grid_params(w, h, crops)
+                params['agents'] = n_agents
+                for mode, fn in (('observe', lambda: env.observe(agents)),
+                                 ('observe_array', lambda: env.observe_array(agents))):
+                    samples = measure(fn, number=20, repeat=cfg['repeat'])
+                    yield summarize('observe', dict(params, mode=mode), samples, 20)
+
+
+@suite('learning')
+def bench_learning(cfg):
+    """Paso de aprendizaje por paso de entorno: lote sobre el QStore frente a update_q por agente"""
+    for (w, h) in cfg['grids']:
+        for n_agents in cfg['agents']:
+            env = make_env(w, h, cfg['crops'][0], seed=cfg['seed'], agents=n_agents)
+            agents = make_agents(env)
+            with quiet():
+                env.step(agents)
+            pool, rows = pool_rows(agents)
+            store, owners = q_owners(agents)
+            alphas = np.array([a.alpha for a in agents])
+            gammas = np.array([a.gamma for a in agents])
+            finals = [a.pos for a in agents]
+            rewards = np.random.default_rng(cfg['seed']).normal(0, 10, n_agents).tolist()
+            keys = store.keys(owners, encode_states(env.observe_array(agents)))
+            states = env.observe(agents)
+
+            def batch():
+                next_keys = store.keys(owners, encode_states(env.observe_array(agents)))
+                moved = np.asarray(finals, dtype=np.int64).reshape(-1, 2)
+                actions = actions_from_moves(moved[:, 0] - pool.x[rows], moved[:, 1] - pool.y[rows])
+                store.td_update(keys, actions, rewards, next_keys, alphas, gammas)
+
+            def legacy():
+                next_states = env.observe(agents)
+                for i, agent in enumerate(agents):
+                    action_map_inv = {(0,0): 0, (1,0): 1, (-1,0): 2, (0,1): 3, (0,-1): 4}
+                    move = (finals[i][0] - agent.pos[0], finals[i][1] - agent.pos[1])
+                    agent.update_q(states[i], action_map_inv.get(move, 0), rewards[i], next_states[i])
+
+            params = {'w': w, 'h': h, 'agents': n_agents}
+            for mode, fn in (('batch', batch), ('legacy', legacy)):
+                samples = measure(fn, number=20, repeat=cfg['repeat'])
+                yield summarize('learning_step', dict(params, mode=mode), samples, 20)
+
+
+# Convergencia: el episodio deja de añadir más de un 5% de estados nuevos a las tablas
+CONVERGENCE_GROWTH = 0.05
+
+
+def _converged_episode(states):
+    previous = 0
+    for ep, total in enumerate(states, start=1):
+        if previous and (total - previous) <= CONVERGENCE_GROWTH * previous:
+            return ep
+        previous = total
+    return None
+
+
+@suite('shared_q')
+def bench_shared_q(cfg):
+    """Q-tables por agente frente a una por rol: episodios hasta converger y memoria"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                for mode in ('independent', 'shared'):
+                    seed_all(cfg['seed'])
+                    with quiet():
+                        sim = SimManager(seed=cfg['seed'])
+                        sim.env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                        sim.agents = make_agents(sim.env, shared_q=(mode == 'shared'), seed=cfg['seed'])
+                        sim.save_qs = lambda *a, **k: None
+                        sim.save_stats = lambda *a, **k: None
+                        t0 = time.perf_counter()
+                        sim.train_background(episodes=cfg['episodes'],
+                                             steps_per_episode=cfg['episode_steps'])
+                        elapsed = time.perf_counter() - t0
+                    episodes = sim.train_stats['episodes']
+                    states = [e['total_states_learned'] for e in episodes]
+                    params = _grid_params(w, h, crops)
+                    params['agents'] = n_agents
+                    params['mode'] = mode
+                    yield summarize('shared_q', params, [elapsed / max(1, len(episodes))],
+                                    len(episodes), extra={
+                        'episodes_to_converge': _converged_episode(states),
+                        'states': states[-1] if states else 0,
+                        'qtable_bytes': episodes[-1]['qtable_bytes'] if episodes else 0,
+                        'td_error': [e['td_error'] for e in episodes]
+                    })
+
+
+@suite('replay')
+def bench_replay(cfg):
+    """Aprendizaje en línea frente a replay y Dyna-Q: pasos de entorno hasta la misma calidad"""
+    modes = (('online', 0, 0), ('replay', 32, 0), ('dyna', 32, 16))
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                target = None
+                for mode, batch, planning in modes:
+                    seed_all(cfg['seed'])
+                    with quiet():
+                        sim = SimManager(replay_batch=batch, planning_steps=planning, seed=cfg['seed'])
+                        sim.env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                        sim.agents = make_agents(sim.env, seed=cfg['seed'])
+                        sim.save_qs = lambda *a, **k: None
+                        sim.save_stats = lambda *a, **k: None
+                        t0 = time.perf_counter()
+                        sim.train_background(episodes=cfg['episodes'],
+                                             steps_per_episode=cfg['episode_steps'])
+                        elapsed = time.perf_counter() - t0
+                    episodes = sim.train_stats['episodes']
+                    quality = [e['policy_agreement'] for e in episodes]
+                    # Objetivo: la calidad final del aprendizaje en línea
+                    if target is None:
+                        target = quality[-1] if quality else 0.0
+                    steps, reached = 0, None
+                    for e in episodes:
+                        steps += e['steps']
+                        if e['policy_agreement'] >= target:
+                            reached = steps
+                            break
+                    params = _grid_params(w, h, crops)
+                    params['agents'] = n_agents
+                    params['mode'] = mode
+                    total_steps = sum(e['steps'] for e in episodes)
+                    yield summarize('replay', params, [elapsed / max(1, total_steps)],
+                                    total_steps, extra={
+                        'target_agreement': target,
+                        'steps_to_target': reached,
+                        'policy_agreement': quality
+                    })
+
+
+@suite('q_lambda')
+def bench_q_lambda(cfg):
+    """Curvas de aprendizaje: Q-learning de un paso frente a Q(lambda) de Watkins"""
+    for (w, h) in cfg['grids']:
+        for crops in cfg['crops']:
+            for n_agents in cfg['agents']:
+                for learner in ('q', 'q_lambda'):
+                    seed_all(cfg['seed'])
+                    with quiet():
+                        sim = SimManager(replay_batch=0, planning_steps=0, seed=cfg['seed'])
+                        sim.env = make_env(w, h, crops, seed=cfg['seed'], agents=n_agents)
+                        sim.agents = make_agents(sim.env, seed=cfg['seed'])
+                        sim.params['learner'] = learner
+                        sim.save_qs = lambda *a, **k: None
+                        sim.save_stats = lambda *a, **k: None
+                        t0 = time.perf_counter()
+                        sim.train_background(episodes=cfg['episodes'],
+                                             steps_per_episode=cfg['episode_steps'])
+                        elapsed = time.perf_counter() - t0
+                    episodes = sim.train_stats['episodes']
+                    total_steps = sum(e['steps'] for e in episodes)
+                    store = sim.agents[0].qstore
+                    params = _grid_params(w, h, crops)
+                    params['agents'] = n_agents
+                    params['learner'] = learner
+                    yield summarize('q_lambda', params, [elapsed / max(1, total_steps)],
+                                    total_steps, extra={
+                        'policy_agreement': [e['policy_agreement'] for e in episodes],
+                        'td_error': [e['td_error'] for e in episodes],
+                        'reward': [e['reward'] for e in episodes],
+                        # Valor medio del mejor par por estado: crece al propagarse el crédito
+                        'mean_state_value': round(float(store.q[:store.size].max(axis=1).mean()), 3)
+                    })